@@ -0,0 +1,138 @@
+"""
+JSON against MessagePack (codec.py) for every message type the server emits.
+
+A table is played through the dispatcher the way clients drive it (manual,
+automatic and live rounds, wars, undos, registrations, a delta client) and
+every message sent is recorded. For each action the largest recorded
+message is encoded and decoded both ways:
+
+    json     what every client gets by default (orjson when installed)
+    msgpack  integer action codes and card codes, packed with msgpack
+
+    python benchmarks/bench_codec.py --rounds 300
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+from support import FakeResultsCollection, FakeStatsCollection, FakeWebSocket
+
+import casino_war_backend as backend
+import fanout
+from codec import MSGPACK, decode_message, encode_message
+from dispatch import Connection
+from result_writer import ResultWriter
+
+
+class RecordingWebSocket(FakeWebSocket):
+    def __init__(self, name, recorded):
+        super().__init__(name)
+        self.recorded = recorded
+
+    async def send(self, message):
+        await super().send(message)
+        self.recorded.append(message)
+
+
+async def record(rounds):
+    backend.table_manager = backend.TableManager()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    backend.stats_collection = FakeStatsCollection()
+    backend.MESSAGE_RATE_LIMIT = 0
+    table = backend.table_manager.get_table(1)
+    recorded = []
+    conns = {}
+    for name in ["dealer", "display", "player", "delta"]:
+        websocket = RecordingWebSocket(name, recorded)
+        table.add_client(websocket)
+        conns[name] = Connection(websocket, table, rate=0)
+        await table.executor.run(backend.welcome_client, websocket, table, "token")
+
+    async def do(name, **message):
+        await backend.dispatcher.dispatch(conns[name], json.dumps(message))
+
+    await do("dealer", action="register_dealer")
+    await do("display", action="register_display")
+    await do("player", action="register_player", player_id="1")
+    await do("delta", action="subscribe_deltas")
+    await do("player", action="get_all_player_stats")
+    await do("dealer", action="deal_cards")  # error: no players
+    await do("dealer", action="set_game_mode", mode="automatic")
+    await do("dealer", action="shuffle_deck")
+    await do("dealer", action="burn_card")
+    await do("dealer", action="change_bets", min_bet=25, max_bet=500)
+    for pid in range(1, 7):
+        await do("dealer", action="add_player", player_id=str(pid))
+    await do("dealer", action="start_auto_play", round_delay=60)
+    await do("dealer", action="stop_auto_play")
+    for n in range(rounds):
+        if len(table.game_state["deck"]) < 30:
+            await do("dealer", action="shuffle_deck")
+        await do("dealer", action="start_auto_round")
+        tied = [pid for pid, player in table.game_state["players"].items() if player["status"] == "waiting_choice"]
+        for pid in tied:
+            await do("player", action="player_choice", player_id=pid, choice="war" if n % 2 else "surrender")
+        if n % 5 == 0:
+            await do("dealer", action="undo_last_card")
+        await do("dealer", action="clear_round")
+    await do("dealer", action="set_game_mode", mode="live")
+    await do("dealer", action="manual_deal_card", target="player", player_id="1", card="AS")
+    await do("dealer", action="manual_deal_card", target="dealer", card="KD")
+    await do("dealer", action="add_card_manual", card="QH")
+    await do("dealer", action="remove_player", player_id="6")
+    await do("dealer", action="reset_game")
+    await do("delta", action="request_snapshot")
+    for _ in range(3):
+        await asyncio.sleep(0)
+    for conn in conns.values():
+        fanout.detach(conn.websocket)
+    await backend.auto_timers.stop()
+    await backend.result_writer.stop()
+    return recorded
+
+
+def per_call(fn, arg, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=2000, help="encodes and decodes timed per message")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        recorded = asyncio.run(record(args.rounds))
+    largest = {}
+    for payload in recorded:
+        message = decode_message(payload)
+        action = message["action"]
+        if len(payload) > len(largest.get(action, "")):
+            largest[action] = payload
+
+    print(f"{len(recorded)} messages recorded, {len(largest)} types; largest of each type\n")
+    print(f"{'action':<20} {'json B':>7} {'mp B':>6} {'size':>5} {'enc json':>9} {'enc mp':>7} "
+          f"{'dec json':>9} {'dec mp':>7}  (us)")
+    totals = [0, 0]
+    for action, payload in sorted(largest.items()):
+        message = decode_message(payload)
+        packed = encode_message(message, MSGPACK)
+        assert decode_message(packed, MSGPACK) == message, action
+        totals[0] += len(payload)
+        totals[1] += len(packed)
+        print(f"{action:<20} {len(payload):>7} {len(packed):>6} {len(packed) / len(payload):>5.0%} "
+              f"{per_call(encode_message, message, args.repeat):>9.2f} "
+              f"{per_call(lambda m: encode_message(m, MSGPACK), message, args.repeat):>7.2f} "
+              f"{per_call(decode_message, payload, args.repeat):>9.2f} "
+              f"{per_call(lambda p: decode_message(p, MSGPACK), packed, args.repeat):>7.2f}")
+    print(f"\n{'all types':<20} {totals[0]:>7} {totals[1]:>6} {totals[1] / totals[0]:>5.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Cost of a burst of new connections to one busy table: each gets the
+table's game_state_update.
+
+    rebuild  build the state view, copy the session stats and encode them
+             for every connection (the old send_game_state)
+    cached   send_game_state: the encoded snapshot is reused until the state
+             version or the session stats change
+
+    python benchmarks/bench_connect_burst.py --connections 200
+"""
+import argparse
+import asyncio
+import time
+
+from support import FakeResultsCollection, FakeWebSocket
+
+import casino_war_backend as backend
+import fanout
+from result_writer import ResultWriter
+
+
+async def rebuild(websocket, table):
+    fanout.send(websocket, {
+        "action": "game_state_update",
+        "game_state": backend.build_state_view(table),
+        "stats": dict(table.session_stats)
+    })
+
+
+async def busy_table():
+    table = backend.table_manager.get_table(1)
+    for data in [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]:
+        await backend.run_table_action(table, data)
+    for player_id in range(1, 7):
+        await backend.run_table_action(table, {"action": "add_player", "player_id": str(player_id)})
+    for _ in range(20):
+        for data in [{"action": "start_auto_round"}, {"action": "clear_round"}]:
+            await backend.run_table_action(table, data)
+    await backend.run_table_action(table, {"action": "start_auto_round"})
+    return table
+
+
+async def burst(send_state, table, connections):
+    clients = [FakeWebSocket(f"client-{n}") for n in range(connections)]
+    start = time.perf_counter()
+    for websocket in clients:
+        await send_state(websocket, table)
+    elapsed = time.perf_counter() - start
+    for websocket in clients:
+        fanout.detach(websocket)
+    return elapsed
+
+
+async def run(connections, bursts):
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    table = await busy_table()
+    size = len(backend.state_payload(table))
+    rows = []
+    for name, send_state in [("rebuild", rebuild), ("cached", backend.send_game_state)]:
+        best = min([await burst(send_state, table, connections) for _ in range(bursts)])
+        rows.append((name, best))
+    await backend.result_writer.stop()
+    return size, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=20, help="bursts per variant; the fastest is reported")
+    args = parser.parse_args()
+
+    size, rows = asyncio.run(run(args.connections, args.bursts))
+    print(f"{args.connections} connections, game_state_update of {size} bytes\n")
+    print(f"{'variant':<8} {'burst ms':>9} {'us/conn':>8}")
+    for name, elapsed in rows:
+        print(f"{name:<8} {elapsed * 1000:>9.2f} {elapsed / args.connections * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
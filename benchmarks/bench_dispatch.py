@@ -0,0 +1,90 @@
+"""
+Per-message cost of getting from raw websocket text to a handler: the old
+json.loads plus if/elif chain against the dispatcher's accept() (size and
+rate limit, decoding, registry lookup, compiled validation).
+
+The old chain did no validation at all: a missing field surfaced as a
+KeyError in the middle of the handler and closed the connection. It is
+timed here for the first and the last action of the chain; the registry
+costs the same for every action.
+
+    flood    messages over the rate limit, refused before decoding
+    bad      a player_choice with an invalid choice
+    large    a 5000-character message, refused before decoding
+
+    python benchmarks/bench_dispatch.py --messages 200000
+"""
+import argparse
+import json
+import time
+
+import support  # noqa: F401  (puts the backend modules on sys.path)
+
+import casino_war_backend as backend
+from dispatch import Connection, Reject
+from support import FakeWebSocket
+
+# The order of the old handle_connection/apply_table_action chains
+OLD_CHAIN = (
+    "register_dealer", "register_player", "subscribe_deltas", "request_snapshot", "get_shoe_status",
+    "get_all_player_stats", "change_table", "shuffle_deck", "burn_card", "add_player", "remove_player",
+    "deal_cards", "reset_game", "change_bets", "undo_last_card", "add_card_manual", "player_choice",
+    "set_game_mode", "assign_war_card", "evaluate_war_round", "manual_deal_card", "start_auto_round",
+    "clear_round",
+)
+
+
+def old_dispatch(message):
+    data = json.loads(message)
+    action = data["action"]
+    for name in OLD_CHAIN:  # one comparison per elif
+        if action == name:
+            return name
+    return None
+
+
+def new_dispatch(conn, message):
+    try:
+        return backend.dispatcher.accept(conn, message)[0]
+    except Reject:
+        return None
+
+
+def per_message(fn, message, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn(message)
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    args = parser.parse_args()
+
+    unlimited = Connection(FakeWebSocket(), rate=0)
+    flooded = Connection(FakeWebSocket(), rate=1, burst=1)
+    flooded.take_token()
+    messages = {
+        "register_dealer": json.dumps({"action": "register_dealer"}),
+        "clear_round": json.dumps({"action": "clear_round", "table_id": 1}),
+        "player_choice": json.dumps({"action": "player_choice", "player_id": "3", "choice": "war"}),
+        "assign_war_card": json.dumps({"action": "assign_war_card", "target": "player", "card": "10H", "player_id": "3"}),
+    }
+
+    print(f"{'message':<18} {'old ns':>8} {'new ns':>8}")
+    for name, message in messages.items():
+        old = per_message(old_dispatch, message, args.messages)
+        new = per_message(lambda m: new_dispatch(unlimited, m), message, args.messages)
+        print(f"{name:<18} {old:>8.0f} {new:>8.0f}")
+
+    bad = json.dumps({"action": "player_choice", "player_id": "3", "choice": "fold"})
+    large = json.dumps({"action": "add_player", "player_id": "x" * 5000})
+    print()
+    for name, conn, message in (("flood", flooded, messages["player_choice"]), ("bad", unlimited, bad),
+                                ("large", unlimited, large)):
+        print(f"{name:<18} {'-':>8} {per_message(lambda m: new_dispatch(conn, m), message, args.messages):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
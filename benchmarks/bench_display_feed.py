@@ -0,0 +1,89 @@
+"""
+What display screens receive while a dealer works a table fast: deals,
+undos and redeals at a fixed rate, as with rapid shoe scans in live mode.
+
+    events  displays registered as usual get every round, undo and state event
+    feed    displays registered with "feed": true get the latest state at
+            most DISPLAY_FEED_FPS times a second
+
+Reported: messages and KiB delivered per display per second, and the CPU
+time of the run.
+
+    python benchmarks/bench_display_feed.py --displays 20 --rate 200 --seconds 5
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from support import FakeResultsCollection, FakeWebSocket
+
+import casino_war_backend as backend
+import fanout
+from dispatch import Connection
+from result_writer import ResultWriter
+
+PLAYERS = 6
+CYCLE = [{"action": "start_auto_round"}, {"action": "undo_last_card"}, {"action": "clear_round"}]
+
+
+async def run(variant, displays, rate, seconds):
+    backend.table_manager = backend.TableManager()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    table = backend.table_manager.get_table(1)
+    screens = [FakeWebSocket(f"display-{n}") for n in range(displays)]
+    for websocket in screens:
+        table.add_client(websocket)
+        await backend.register_display(Connection(websocket, table),
+                                       {"action": "register_display", "feed": variant == "feed"})
+    for data in [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]:
+        await backend.run_table_action(table, data)
+    for pid in range(1, PLAYERS + 1):
+        await backend.run_table_action(table, {"action": "add_player", "player_id": str(pid)})
+    await asyncio.sleep(0.2)
+    for websocket in screens:
+        websocket.sent = websocket.sent_bytes = 0
+
+    loop = asyncio.get_running_loop()
+    cpu = time.process_time()
+    start = loop.time()
+    actions = 0
+    while loop.time() - start < seconds:
+        if len(table.game_state["deck"]) < 4 * PLAYERS:
+            await backend.run_table_action(table, {"action": "shuffle_deck"})
+        await backend.run_table_action(table, CYCLE[actions % len(CYCLE)])
+        actions += 1
+        await asyncio.sleep(max(0.0, start + actions / rate - loop.time()))
+    await asyncio.sleep(0.2)
+    cpu = time.process_time() - cpu
+    for websocket in screens:
+        fanout.detach(websocket)
+    await backend.auto_timers.stop()
+    await backend.result_writer.stop()
+    return {
+        "actions": actions / seconds,
+        "messages": sum(websocket.sent for websocket in screens) / displays / seconds,
+        "kib": sum(websocket.sent_bytes for websocket in screens) / displays / seconds / 1024,
+        "cpu": cpu / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--displays", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=200, help="dealer actions per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.displays} displays, {args.rate:.0f} dealer actions/s, "
+          f"feed at {backend.DISPLAY_FEED_FPS:.0f} frames/s\n")
+    print(f"{'variant':<8} {'actions/s':>10} {'msgs/s per display':>19} {'KiB/s per display':>18} {'cpu':>6}")
+    for variant in ["events", "feed"]:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            row = asyncio.run(run(variant, args.displays, args.rate, args.seconds))
+        print(f"{variant:<8} {row['actions']:>10.0f} {row['messages']:>19.1f} {row['kib']:>18.1f} {row['cpu']:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Broadcast throughput against the number of connected clients.
+
+Starts a real websocket server on localhost, connects N clients to one table
+and pushes a round_dealt sized message through two fan-out strategies:
+
+    legacy     json.dumps per client + asyncio.gather(client.send(...))
+    broadcast  encode once + websockets.broadcast (fanout.broadcast)
+
+Reported: messages per second completed on the server side and the time until
+every client has received every message.
+
+    python benchmarks/bench_fanout.py --clients 1 10 50 200 --messages 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import websockets
+
+import support  # noqa: F401  (puts the backend modules on sys.path)
+import casino_war_backend as backend
+import codec
+import fanout
+
+PORT = 6797
+
+
+def sample_message():
+    players = {
+        str(pid): {"card": "QH", "status": "finished", "result": "win", "war_card": None}
+        for pid in range(1, 7)
+    }
+    return {
+        "action": "round_dealt",
+        "round_number": 42,
+        "dealer_card": "TS",
+        "players": players,
+        "tie_players": [],
+        "deck_count": 250,
+        "player_results": {pid: "win" for pid in players},
+    }
+
+
+async def legacy_broadcast(clients, message):
+    await asyncio.gather(*[client.send(json.dumps(message)) for client in clients], return_exceptions=True)
+
+
+async def new_broadcast(clients, message):
+    fanout.broadcast(clients, message)
+
+
+async def drain(ws, expected, done):
+    received = 0
+    while received < expected:
+        await ws.recv()
+        received += 1
+    done.set_result(time.perf_counter())
+
+
+async def measure(strategy, num_clients, num_messages):
+    backend.table_manager = backend.TableManager()
+    table = backend.table_manager.get_table(1)
+    async with websockets.serve(backend.handle_connection, "localhost", PORT):
+        clients = [await websockets.connect(f"ws://localhost:{PORT}/?table=1") for _ in range(num_clients)]
+        for ws in clients:
+            await ws.recv()  # initial game_state_update
+            await ws.recv()  # session token
+        loop = asyncio.get_running_loop()
+        finished = [loop.create_future() for _ in clients]
+        readers = [asyncio.create_task(drain(ws, num_messages, done)) for ws, done in zip(clients, finished)]
+        message = sample_message()
+        server_clients = set(table.connected_clients)
+
+        start = time.perf_counter()
+        for _ in range(num_messages):
+            await strategy(server_clients, message)
+        sent = time.perf_counter() - start
+        received = max(await asyncio.gather(*finished)) - start
+
+        await asyncio.gather(*readers)
+        for ws in clients:
+            await ws.close()
+    for table in backend.table_manager:
+        await table.executor.stop()
+    return num_messages / sent, received * 1000
+
+
+async def run(args):
+    rows = []
+    for num_clients in args.clients:
+        legacy = await measure(legacy_broadcast, num_clients, args.messages)
+        new = await measure(new_broadcast, num_clients, args.messages)
+        rows.append((num_clients, legacy, new))
+    await backend.auto_timers.stop()
+    await backend.result_writer.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+    # The backend prints every connection; keep that out of the measurement output
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows = asyncio.run(run(args))
+    print(f"encoder: {'orjson' if codec.orjson else 'json'}")
+    print(f"{'clients':>8} {'legacy msg/s':>13} {'legacy all-recv ms':>19} {'broadcast msg/s':>16} {'broadcast all-recv ms':>22}")
+    for num_clients, legacy, new in rows:
+        print(f"{num_clients:>8} {legacy[0]:>13.0f} {legacy[1]:>19.1f} {new[0]:>16.0f} {new[1]:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
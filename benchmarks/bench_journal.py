@@ -0,0 +1,153 @@
+"""
+Action journal cost and recovery time.
+
+Plays automatic-mode rounds on a few tables (6 players each, ties surrendered,
+a new shoe when one runs low), handling every action the way
+handle_connection does (inside journal.action()).
+
+    overhead   time per action with the journal off and on
+    recovery   restart time against journal length, replaying the whole
+               journal (no snapshots) or a snapshot plus the entries after it
+
+Every recovery is checked against the state the tables had when the "crash"
+happened (the journal is abandoned without close()).
+
+    python benchmarks/bench_journal.py --actions 20000 --lengths 1000 10000 50000
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+
+from support import FakeResultsCollection
+
+import casino_war_backend as backend
+from journal import Journal
+from result_writer import ResultWriter
+
+TABLES = 4
+PLAYERS = 6
+
+
+def fresh_backend(directory, snapshot_every):
+    backend.table_manager = backend.TableManager()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    backend.journal = Journal(directory, snapshot_every=snapshot_every)
+    backend.journal.snapshot_source = backend.snapshot_tables
+    return backend.journal
+
+
+async def act(table, data):
+    async with backend.journal.action(table.table_id, data):
+        await backend.apply_table_action(table, data)
+
+
+async def play(num_actions):
+    """Plays rounds round-robin over the tables until num_actions actions were handled."""
+    tables = [backend.table_manager.open_table(table_id) for table_id in range(1, TABLES + 1)]
+    actions = 0
+    for table in tables:
+        await act(table, {"action": "set_game_mode", "mode": "automatic"})
+        for player_id in range(1, PLAYERS + 1):
+            await act(table, {"action": "add_player", "player_id": str(player_id)})
+        await act(table, {"action": "shuffle_deck"})
+        actions += PLAYERS + 2
+    while actions < num_actions:
+        for table in tables:
+            if len(table.game_state["deck"]) < PLAYERS + 2:
+                await act(table, {"action": "shuffle_deck"})
+                actions += 1
+            await act(table, {"action": "start_auto_round"})
+            actions += 1
+            for player_id, player in list(table.game_state["players"].items()):
+                if player["status"] == "waiting_choice":
+                    await act(table, {"action": "player_choice", "player_id": player_id, "choice": "surrender"})
+                    actions += 1
+            await act(table, {"action": "clear_round"})
+            actions += 1
+    return actions
+
+
+def table_states():
+    states = {}
+    for table in backend.table_manager:
+        state = backend.build_state_view(table)
+        state["deck"] = table.game_state["deck"].to_codes()
+        state["session_stats"] = table.session_stats
+        states[table.table_id] = state
+    return states
+
+
+async def crash(journal):
+    """Stops the journal the way a killed process would: no final fsync, no close."""
+    if journal._snapshotting is not None:
+        await journal._snapshotting
+    if journal._flusher is not None:
+        journal._flusher.cancel()
+
+
+async def measure_overhead(num_actions, workdir):
+    rows = []
+    for label, enabled in (("off", False), ("on", True)):
+        journal = fresh_backend(os.path.join(workdir, f"overhead-{label}"), snapshot_every=1000)
+        if enabled:
+            journal.load()
+            journal.open()
+        start = time.perf_counter()
+        actions = await play(num_actions)
+        elapsed = time.perf_counter() - start
+        if enabled:
+            await journal.close()
+        rows.append((label, actions, elapsed / actions * 1e6))
+        await backend.result_writer.stop()
+    return rows
+
+
+async def measure_recovery(length, snapshot_every, workdir):
+    journal = fresh_backend(workdir, snapshot_every)
+    journal.load()
+    journal.open()
+    await play(length)
+    expected = table_states()
+    await crash(journal)
+    await backend.result_writer.stop()
+
+    fresh_backend(workdir, snapshot_every)
+    start = time.perf_counter()
+    await backend.recover_tables()
+    elapsed = time.perf_counter() - start
+    replayed = backend.journal.entries_since_snapshot
+    if table_states() != expected:
+        raise RuntimeError(f"Recovered state differs ({length} actions, snapshot every {snapshot_every})")
+    return replayed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, default=20000, help="actions for the overhead measurement")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--snapshot-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The backend prints every action and broadcast; keep that out of the measurement output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            overhead = asyncio.run(measure_overhead(args.actions, workdir))
+        print(f"{'journal':<8} {'actions':>8} {'us/action':>10}")
+        for label, actions, micros in overhead:
+            print(f"{label:<8} {actions:>8} {micros:>10.1f}")
+
+        print(f"\n{'actions':>8} {'snapshots':>10} {'replayed':>9} {'recovery s':>11}")
+        for length in args.lengths:
+            for snapshot_every in (length * 2, args.snapshot_every):
+                directory = os.path.join(workdir, f"recovery-{length}-{snapshot_every}")
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    replayed, elapsed = asyncio.run(measure_recovery(length, snapshot_every, directory))
+                label = "no" if snapshot_every > length else f"/{snapshot_every}"
+                print(f"{length:>8} {label:>10} {replayed:>9} {elapsed:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Event-loop time spent logging a broadcast: the old print against log.py.
+
+Each variant "logs" the same encoded game_state_update payload (a 6-player
+table mid-shoe) --messages times, writing to a temporary file:
+
+    print          print(f"[BROADCAST_TO_ALL] {payload}"), as the server used to
+    info level     broadcast_log.debug() with the category at INFO (the default)
+    debug          broadcast_log.debug() enabled; the queue's writer thread does the rest
+    debug 1%       enabled with LOG_SAMPLE="broadcast=0.01"
+
+Only the time on the calling thread is measured; the log file is then
+checked to hold the expected number of records.
+
+    python benchmarks/bench_logging.py --messages 100000
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+
+import support  # noqa: F401  (puts the backend modules on sys.path)
+
+import casino_war_backend as backend
+import log
+from codec import encode_message
+
+
+async def sample_payload():
+    table = backend.table_manager.get_table(1)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        await backend.handle_shuffle_deck(table)
+        for player_id in range(1, 7):
+            await backend.handle_add_player(table, str(player_id))
+        await backend.handle_deal_cards(table)
+    return encode_message({"action": "game_state_update", "game_state": backend.build_state_view(table)})
+
+
+def run(variant, payload, messages, path):
+    logger = log.get_logger("broadcast")
+    with open(path, "w") as out:
+        if variant == "print":
+            with contextlib.redirect_stdout(out):
+                start = time.perf_counter()
+                for _ in range(messages):
+                    print(f"[BROADCAST_TO_ALL] {payload}")
+                elapsed = time.perf_counter() - start
+        else:
+            level = "INFO" if variant == "info level" else "DEBUG"
+            sample = {"broadcast": 0.01} if variant == "debug 1%" else {"broadcast": 1.0}
+            log.configure(levels={"broadcast": level}, sample=sample, stream=out)
+            start = time.perf_counter()
+            for _ in range(messages):
+                logger.debug("To all", extra={"table": 1, "payload": payload})
+            elapsed = time.perf_counter() - start
+            log.shutdown()
+    with open(path) as f:
+        lines = sum(1 for _ in f)
+    return elapsed, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    payload = asyncio.run(sample_payload())
+    print(f"payload: {len(payload)} bytes\n")
+    print(f"{'variant':<12} {'us/message':>11} {'records written':>16} {'dropped':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for variant in ("print", "info level", "debug", "debug 1%"):
+            elapsed, lines = run(variant, payload, args.messages, os.path.join(workdir, "out.log"))
+            dropped = log.dropped() if variant != "print" else 0  # each configure() starts a new count
+            print(f"{variant:<12} {elapsed / args.messages * 1e6:>11.2f} {lines:>16} {dropped:>8}")
+
+
+if __name__ == "__main__":
+    main()
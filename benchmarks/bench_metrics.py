@@ -0,0 +1,105 @@
+"""
+Cost of the metrics: recording on the hot path, and rendering a scrape.
+
+Recording is timed per call (Histogram.observe with and without labels,
+Counter.inc, metrics.timer); a handled action records one action latency plus
+two observations per broadcast it sends. Rendering is timed for a registry
+with --series label combinations per histogram, next to the server's own
+metrics after a few thousand actions.
+
+    python benchmarks/bench_metrics.py --calls 1000000 --series 100
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from support import FakeResultsCollection, FakeWebSocket
+
+import casino_war_backend as backend
+import fanout
+import metrics
+from result_writer import ResultWriter
+
+
+def per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def recording_costs(calls):
+    histogram = metrics.Histogram("bench_seconds", "benchmark histogram")
+    labelled = metrics.Histogram("bench_labelled_seconds", "benchmark histogram", labels=("action",))
+    counter = metrics.Counter("bench_total", "benchmark counter", labels=("action",))
+
+    def timed():
+        with metrics.timer(histogram):
+            pass
+
+    return [
+        ("baseline (empty call)", per_call(lambda: None, calls)),
+        ("Histogram.observe", per_call(lambda: histogram.observe(0.0012), calls)),
+        ("Histogram.observe(label)", per_call(lambda: labelled.observe(0.0012, "deal_cards"), calls)),
+        ("Counter.inc(label)", per_call(lambda: counter.inc("deal_cards"), calls)),
+        ("metrics.timer", per_call(timed, calls)),
+    ]
+
+
+async def play_actions(rounds):
+    """Automatic-mode rounds on one table with a display attached, the way handle_connection handles them."""
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    table = backend.table_manager.get_table(1)
+    table.add_client(FakeWebSocket())
+    actions = [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]
+    actions += [{"action": "add_player", "player_id": str(player_id)} for player_id in range(1, 7)]
+    actions += [{"action": "start_auto_round"}, {"action": "clear_round"}] * rounds
+    start = time.perf_counter()
+    for data in actions:
+        action_start = time.perf_counter()
+        if data["action"] == "start_auto_round" and len(table.game_state["deck"]) < 10:
+            await backend.handle_shuffle_deck(table)
+        await backend.apply_table_action(table, data)
+        await backend.publish_state(table)
+        backend.ACTION_SECONDS.observe(time.perf_counter() - action_start, data["action"])
+        await asyncio.sleep(0)  # let the display's writer task send, as between two messages on the server
+    elapsed = time.perf_counter() - start
+    await backend.result_writer.stop()
+    return len(actions), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--series", type=int, default=100, help="label combinations per histogram when rendering")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'recording':<28} {'ns/call':>8}")
+    costs = dict(recording_costs(args.calls))
+    for name, nanos in costs.items():
+        print(f"{name:<28} {nanos:>8.0f}")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        actions, elapsed = asyncio.run(play_actions(args.rounds))
+    broadcasts = fanout.BROADCAST_RECIPIENTS.count()
+    per_action = elapsed / actions * 1e9
+    recorded = costs["Histogram.observe(label)"] + 2 * broadcasts / actions * costs["Histogram.observe"]
+    print(f"\n{actions} actions, {broadcasts / actions:.1f} broadcasts each: {per_action / 1000:.1f} us per action, "
+          f"of which ~{recorded / 1000:.2f} us ({recorded / per_action:.2%}) recording metrics")
+
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"\nrender, server metrics:  {(time.perf_counter() - start) * 1000:>7.2f} ms, {len(text)} bytes")
+    wide = metrics.Histogram("bench_wide_seconds", "benchmark histogram", labels=("series",))
+    for index in range(args.series):
+        wide.observe(0.001 * index, str(index))
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"render, +{args.series} series:     {(time.perf_counter() - start) * 1000:>7.2f} ms, {len(text)} bytes")
+
+
+if __name__ == "__main__":
+    main()
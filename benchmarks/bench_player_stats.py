@@ -0,0 +1,95 @@
+"""
+Stats for a set of players: the old per-player aggregation loop against the
+single $in lookup on player_stats. Needs a running MongoDB; it only touches
+the scratch database given by --db.
+
+    python benchmarks/bench_player_stats.py --mongo-uri mongodb://localhost:27017 --players 6 60 600
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import motor.motor_asyncio
+
+import support  # noqa: F401  (puts the backend modules on sys.path)
+from player_stats import get_bulk_player_stats, get_player_stats, rebuild_player_stats
+
+
+async def aggregate_one(results_collection, player_id):
+    """The pre-materialization read path: a $match/$group over the player's history."""
+    pipeline = [
+        {"$match": {"player_id": player_id}},
+        {"$group": {
+            "_id": "$player_id",
+            "wins": {"$sum": {"$cond": [{"$eq": ["$result", "win"]}, 1, 0]}},
+            "losses": {"$sum": {"$cond": [{"$eq": ["$result", "lose"]}, 1, 0]}},
+            "ties": {"$sum": {"$cond": [{"$eq": ["$result", "tie"]}, 1, 0]}},
+            "surrenders": {"$sum": {"$cond": [{"$eq": ["$result", "surrender"]}, 1, 0]}},
+            "total_games": {"$sum": 1}
+        }}
+    ]
+    return await results_collection.aggregate(pipeline).to_list(length=1)
+
+
+async def timed(repeat, fn):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def run(args):
+    client = motor.motor_asyncio.AsyncIOMotorClient(args.mongo_uri)
+    db = client[args.db]
+    results_collection = db["game_results"]
+    stats_collection = db["player_stats"]
+    await results_collection.drop()
+    await results_collection.create_index("player_id")
+
+    max_players = max(args.players)
+    player_ids = [str(pid) for pid in range(1, max_players + 1)]
+    docs = [
+        {"player_id": pid, "result": random.choice(["win", "lose", "tie", "surrender"]), "round_number": n}
+        for pid in player_ids for n in range(args.history)
+    ]
+    for start in range(0, len(docs), 10000):
+        await results_collection.insert_many(docs[start:start + 10000])
+    await rebuild_player_stats(results_collection, stats_collection)
+
+    print(f"history: {args.history} results per player")
+    print(f"{'players':>8} {'aggregate loop ms':>18} {'find_one loop ms':>17} {'bulk $in ms':>12}")
+    for count in args.players:
+        ids = player_ids[:count]
+
+        async def aggregate_loop():
+            for pid in ids:
+                await aggregate_one(results_collection, pid)
+
+        async def lookup_loop():
+            for pid in ids:
+                await get_player_stats(stats_collection, pid)
+
+        async def bulk():
+            await get_bulk_player_stats(stats_collection, ids)
+
+        row = [await timed(args.repeat, fn) for fn in (aggregate_loop, lookup_loop, bulk)]
+        print(f"{count:>8} {row[0]:>18.2f} {row[1]:>17.2f} {row[2]:>12.2f}")
+
+    if not args.keep:
+        await client.drop_database(args.db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="casino_war_bench")
+    parser.add_argument("--players", type=int, nargs="+", default=[6, 60, 600])
+    parser.add_argument("--history", type=int, default=200, help="stored results per player")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database afterwards")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Reconnect storm: every client of a busy table drops at once, the table plays
+on for a few rounds, then all of them come back together.
+
+    fresh   connect again, take the full game_state_update, register_player
+            (a player_stats lookup, MONGO_LATENCY each) like a new client
+    resume  connect with ?resume=TOKEN&seq=N and get only the missed events
+            (sessions.py)
+
+Reported per variant: time until a client is caught up (p50/p99), until the
+last one is, and the bytes the server sent for the storm.
+
+    python benchmarks/bench_resume.py --clients 200 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import websockets
+
+from support import FakeResultsCollection, FakeStatsCollection, percentile
+
+import casino_war_backend as backend
+from result_writer import ResultWriter
+
+PORT = 6798
+URL = f"ws://localhost:{PORT}/"
+
+
+async def read_until(ws, action, client):
+    """Reads messages until one with this action; returns it. Remembers the last event_seq seen."""
+    while True:
+        message = await ws.recv()
+        client["bytes"] += len(message)
+        data = json.loads(message)
+        client["seq"] = data.get("event_seq", client["seq"])
+        if data.get("action") == action:
+            return data
+
+
+async def connect_fresh(client):
+    ws = await websockets.connect(f"{URL}?table=1")
+    session = await read_until(ws, "session", client)
+    client["token"] = session["token"]
+    client["seq"] = session["event_seq"]
+    await ws.send(json.dumps({"action": "register_player", "player_id": client["player_id"]}))
+    await read_until(ws, "player_registered", client)
+    return ws
+
+
+async def connect_resume(client):
+    ws = await websockets.connect(f"{URL}?resume={client['token']}&seq={client['seq']}")
+    await read_until(ws, "session", client)
+    return ws
+
+
+async def play_rounds(table, rounds):
+    for _ in range(rounds):
+        for data in [{"action": "deal_cards"}, {"action": "reset_game"}]:
+            await table.executor.run(backend.run_table_action, table, data)
+
+
+async def storm(variant, num_clients, rounds, mongo_latency):
+    backend.table_manager = backend.TableManager()
+    backend.sessions = backend.SessionStore()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    backend.stats_collection = FakeStatsCollection(latency=mongo_latency)
+    backend.MESSAGE_RATE_LIMIT = 0
+    table = backend.table_manager.get_table(1)
+    for data in [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]:
+        await table.executor.run(backend.run_table_action, table, data)
+    clients = [{"player_id": str(pid), "token": None, "seq": 0, "bytes": 0} for pid in range(1, num_clients + 1)]
+    for client in clients[:6]:
+        await table.executor.run(backend.run_table_action, table, {"action": "add_player", "player_id": client["player_id"]})
+
+    async with websockets.serve(backend.handle_connection, "localhost", PORT, max_size=backend.MAX_FRAME_SIZE):
+        sockets = [await connect_fresh(client) for client in clients]
+        await play_rounds(table, 1)
+        await asyncio.sleep(0.2)
+        for ws, client in zip(sockets, clients):
+            await ws.close()
+            # What this client has seen before dropping
+            client["seq"] = table.events.seq
+        await asyncio.sleep(0.2)
+        await play_rounds(table, rounds)
+
+        for client in clients:
+            client["bytes"] = 0
+        connect = connect_resume if variant == "resume" else connect_fresh
+        caught_up = []
+
+        async def reconnect(client):
+            ws = await connect(client)
+            caught_up.append(time.perf_counter() - start)
+            return ws
+
+        cpu = time.process_time()
+        start = time.perf_counter()
+        sockets = await asyncio.gather(*[reconnect(client) for client in clients])
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        for ws in sockets:
+            await ws.close()
+    await backend.result_writer.stop()
+    caught_up.sort()
+    return {
+        "p50_ms": percentile(caught_up, 50) * 1000,
+        "p99_ms": percentile(caught_up, 99) * 1000,
+        "all_ms": elapsed * 1000,
+        "cpu_ms": cpu * 1000,
+        "kib": sum(client["bytes"] for client in clients) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3, help="rounds played while the clients are away")
+    parser.add_argument("--mongo-latency", type=float, default=0.002, help="seconds per player_stats lookup")
+    parser.add_argument("--variants", nargs="+", default=["fresh", "resume"], choices=["fresh", "resume"])
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.rounds} rounds missed, "
+          f"stats lookup {args.mongo_latency * 1000:.1f} ms\n")
+    print(f"{'variant':<8} {'p50 ms':>8} {'p99 ms':>8} {'all ms':>8} {'cpu ms':>8} {'KiB sent':>9}")
+    for variant in args.variants:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            row = asyncio.run(storm(variant, args.clients, args.rounds, args.mongo_latency))
+        print(f"{variant:<8} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['all_ms']:>8.1f} "
+              f"{row['cpu_ms']:>8.1f} {row['kib']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
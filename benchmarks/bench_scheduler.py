@@ -0,0 +1,128 @@
+"""
+Timing accuracy of automatic play with many tables on one event loop.
+
+Every table gets 6 players and a display screen and is put on auto_play
+with short delays, so each table takes a step every few hundred
+milliseconds (deal, surrender the ties at the choice deadline, clear and
+deal again). Tables are started evenly over one round delay, as if their
+dealers had switched them on one after the other. The lateness of every step, from its deadline to the moment
+auto_step starts on the table's executor, is recorded, with the CPU time
+the process used.
+
+    wheel   the server's timer wheel (scheduler.py), one task for all deadlines
+    tasks   one sleeping task per pending deadline, for comparison
+
+    python benchmarks/bench_scheduler.py --tables 500 --seconds 10
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from support import FakeResultsCollection, FakeWebSocket, percentile
+
+import casino_war_backend as backend
+from result_writer import ResultWriter
+from scheduler import TimerWheel
+
+
+class SleepingTask:
+    """The 'tasks' variant of a pending step: a task that sleeps until the deadline."""
+
+    def __init__(self, delay, table):
+        loop = asyncio.get_running_loop()
+        self.deadline = loop.time() + delay
+        self.task = asyncio.create_task(self._sleep(delay, table))
+
+    async def _sleep(self, delay, table):
+        await asyncio.sleep(delay)
+        table.executor.submit(backend.auto_step, table)
+
+    def cancel(self):
+        self.task.cancel()
+
+
+def schedule_with_tasks(table, delay):
+    game_state = table.game_state
+    if game_state.get("auto_task"):
+        game_state["auto_task"].cancel()
+    game_state["auto_task"] = SleepingTask(delay, table)
+
+
+async def run(variant, num_tables, seconds, round_delay, choice_delay, tick):
+    backend.MAX_TABLES = max(backend.MAX_TABLES, num_tables)
+    backend.auto_timers = TimerWheel(tick=tick)
+    backend.table_manager = backend.TableManager()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    schedule_auto_step, auto_step = backend.schedule_auto_step, backend.auto_step
+    if variant == "tasks":
+        backend.schedule_auto_step = schedule_with_tasks
+
+    lateness = []
+
+    async def timed_auto_step(table):
+        timer = table.game_state["auto_task"]
+        if timer is not None:
+            lateness.append(asyncio.get_running_loop().time() - timer.deadline)
+        await auto_step(table)
+
+    backend.auto_step = timed_auto_step
+
+    tables = []
+    for table_id in range(1, num_tables + 1):
+        table = backend.table_manager.open_table(table_id)
+        table.add_client(FakeWebSocket(f"display-{table_id}"))
+        for data in [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]:
+            await backend.run_table_action(table, data)
+        for player_id in range(1, 7):
+            await backend.run_table_action(table, {"action": "add_player", "player_id": str(player_id)})
+        tables.append(table)
+
+    cpu = time.process_time()
+    for table in tables:
+        await backend.run_table_action(table, {"action": "start_auto_play", "round_delay": round_delay,
+                                               "choice_delay": choice_delay})
+        await asyncio.sleep(round_delay / num_tables)
+    start_rounds = sum(table.game_state["round_number"] for table in tables)
+    await asyncio.sleep(seconds)
+    cpu = time.process_time() - cpu
+    rounds = sum(table.game_state["round_number"] for table in tables) - start_rounds
+    for table in tables:
+        backend.stop_auto_play(table)
+    await backend.auto_timers.stop()
+    await backend.result_writer.stop()
+    backend.schedule_auto_step, backend.auto_step = schedule_auto_step, auto_step
+    lateness.sort()
+    return {
+        "steps": len(lateness),
+        "rounds": rounds,
+        "p50_ms": percentile(lateness, 50) * 1000,
+        "p99_ms": percentile(lateness, 99) * 1000,
+        "max_ms": lateness[-1] * 1000 if lateness else 0.0,
+        "cpu": cpu / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--round-delay", type=float, default=0.5, help="auto_round_delay of every table")
+    parser.add_argument("--choice-delay", type=float, default=0.25, help="auto_choice_delay of every table")
+    parser.add_argument("--tick", type=float, default=backend.TIMER_TICK, help="timer wheel tick in seconds")
+    parser.add_argument("--variants", nargs="+", default=["wheel", "tasks"], choices=["wheel", "tasks"])
+    args = parser.parse_args()
+
+    print(f"{args.tables} tables, round delay {args.round_delay}s, choice delay {args.choice_delay}s, "
+          f"timer wheel tick {args.tick * 1000:g} ms\n")
+    print(f"{'variant':<8} {'steps':>7} {'rounds/s':>9} {'late p50 ms':>12} {'p99 ms':>8} {'max ms':>8} {'cpu':>6}")
+    for variant in args.variants:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            row = asyncio.run(run(variant, args.tables, args.seconds, args.round_delay, args.choice_delay, args.tick))
+        print(f"{variant:<8} {row['steps']:>7} {row['rounds'] / args.seconds:>9.0f} {row['p50_ms']:>12.2f} "
+              f"{row['p99_ms']:>8.2f} {row['max_ms']:>8.2f} {row['cpu']:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+A full shoe's lifecycle with the old list-based deck against shoe.Shoe.
+
+Each round burns a card and deals six players and the dealer. A share of
+rounds (--live) are live-mode rounds, where scanned cards are checked and
+removed by value.
+Some deals are undone, with the card put back on top and dealt again. Rounds
+continue until the shoe is nearly empty. Both implementations replay the
+same operation script; each is timed --repeat times and the best run counts.
+
+    python benchmarks/bench_shoe.py --shoes 2000 --live 0 0.3 1
+"""
+import argparse
+import random
+import time
+
+import support  # noqa: F401  (puts the backend modules on sys.path)
+from shoe import CARD_NAMES, DECKS_PER_SHOE, Shoe
+
+
+def legacy_create_deck(rng):
+    """The original create_deck: a list of 312 strings."""
+    ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K"]
+    suits = ["S", "D", "C", "H"]
+    deck = []
+    for _ in range(DECKS_PER_SHOE):
+        for rank in ranks:
+            for suit in suits:
+                deck.append(rank + suit)
+    rng.shuffle(deck)
+    return deck
+
+
+def make_script(seed, live_fraction, players=6):
+    """Operations for one shoe: ('draw',), ('scan', card) or ('undo',)."""
+    rng = random.Random(seed)
+    script = []
+    remaining = 52 * DECKS_PER_SHOE
+    while remaining > 2 * (players + 2):
+        script.append(("draw",))  # burn
+        live = rng.random() < live_fraction
+        for _ in range(players + 1):
+            script.append(("scan", rng.choice(CARD_NAMES)) if live else ("draw",))
+            if rng.random() < 0.05:
+                script.append(("undo",))
+                script.append(("draw",))
+        remaining -= players + 2
+    return script
+
+
+def run_list(script, rng):
+    deck = legacy_create_deck(rng)
+    dealt = []
+    for op in script:
+        if op[0] == "draw":
+            dealt.append(deck.pop(0))
+        elif op[0] == "scan":
+            if op[1] in deck:
+                deck.remove(op[1])
+                dealt.append(op[1])
+        elif dealt:
+            deck.insert(0, dealt.pop())
+    return len(deck)
+
+
+def run_shoe(script, rng):
+    deck = Shoe.shuffled(rng=rng)
+    dealt = []
+    for op in script:
+        if op[0] == "draw":
+            dealt.append(deck.draw())
+        elif op[0] == "scan":
+            if op[1] in deck:
+                deck.remove(op[1])
+                dealt.append(op[1])
+        elif dealt:
+            deck.put_back(dealt.pop())
+    return len(deck)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shoes", type=int, default=2000)
+    parser.add_argument("--live", type=float, nargs="+", default=[0.0, 0.3, 1.0], help="share of live-mode rounds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'live':>5} {'ops/shoe':>9} {'list us/shoe':>13} {'Shoe us/shoe':>13} {'speedup':>8}")
+    for live_fraction in args.live:
+        scripts = [make_script(seed, live_fraction) for seed in range(args.shoes)]
+        ops = sum(len(script) for script in scripts)
+        results = {}
+        for _ in range(args.repeat):
+            for name, runner in (("list", run_list), ("Shoe", run_shoe)):
+                rng = random.Random(1)
+                start = time.perf_counter()
+                for script in scripts:
+                    runner(script, rng)
+                elapsed = (time.perf_counter() - start) / args.shoes * 1e6
+                results[name] = min(results.get(name, elapsed), elapsed)
+        print(f"{live_fraction:>5.2f} {ops / args.shoes:>9.0f} {results['list']:>13.1f} {results['Shoe']:>13.1f} "
+              f"{results['list'] / results['Shoe']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
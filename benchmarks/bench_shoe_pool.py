@@ -0,0 +1,55 @@
+"""
+Cost of a new shoe at shuffle_deck: the old Mersenne Twister shuffle, the
+SHAKE-256 shuffle done inline, and a take() from a filled ShoePool (the
+audit log written to a temporary file).
+
+    python benchmarks/bench_shoe_pool.py --shoes 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import support  # noqa: F401  (puts the backend modules on sys.path)
+
+from shoe import Shoe
+from shoe_pool import ShoePool, new_seed, shuffled_codes
+
+
+def per_shoe(fn, shoes):
+    start = time.perf_counter()
+    for _ in range(shoes):
+        fn()
+    return (time.perf_counter() - start) / shoes * 1e6
+
+
+async def pool_take(shoes, audit_path):
+    pool = ShoePool(size=shoes, audit_path=audit_path)
+    pool.start()
+    while pool.ready() < shoes:
+        await asyncio.sleep(0.01)
+    await pool.close()  # stop refilling, so only take() is timed
+    elapsed = per_shoe(pool.take, shoes)
+    await pool.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rows = [
+            ("Shoe.shuffled (random)", per_shoe(Shoe.shuffled, args.shoes)),
+            ("SHAKE-256 inline", per_shoe(lambda: Shoe.from_codes(shuffled_codes(new_seed())), args.shoes)),
+            ("ShoePool.take", asyncio.run(pool_take(args.shoes, os.path.join(workdir, "audit.jsonl")))),
+        ]
+    print(f"{'new shoe':<24} {'us/shoe':>8}")
+    for name, micros in rows:
+        print(f"{name:<24} {micros:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Shoe reader latency: the old 100 ms polling loop against the threaded ShoeReader.
+
+A pseudo-terminal ShoeSimulator sends cards at random moments; for each card
+we record the time from the write to the moment the handler gets the card.
+Some frames are sent in two halves with a pause in between (a slow line),
+and a ticker task measures how long the event loop was blocked meanwhile.
+
+    python benchmarks/bench_shoe_reader.py --cards 200 --split-pause-ms 30
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from support import percentile
+
+from shoe_reader import READ_TIMEOUT, ShoeReader, ShoeSimulator, format_frame, open_serial
+import casino_war_backend as backend
+
+
+async def legacy_reader(ser, on_card):
+    """read_from_serial as it was: poll in_waiting every 100 ms, then a blocking readline on the loop."""
+    while True:
+        if ser.in_waiting > 0:
+            raw_data = ser.readline().decode("utf-8").strip()
+            card = backend.extract_card_value(raw_data)
+            if card:
+                on_card(card)
+        await asyncio.sleep(0.1)
+
+
+async def threaded_reader(ser, on_card):
+    queue = asyncio.Queue()
+    reader = ShoeReader(ser, queue)
+    reader.start()
+    try:
+        while True:
+            on_card((await queue.get()).card)
+    finally:
+        reader.stop()
+
+
+def write_split(simulator, frame, pause):
+    simulator.write(frame[:10])
+    time.sleep(pause)
+    simulator.write(frame[10:])
+
+
+async def ticker(stalls, interval=0.001):
+    while True:
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - before - interval)
+
+
+async def measure(reader, args):
+    simulator = ShoeSimulator()
+    ser = open_serial(simulator.port)
+    ser.timeout = READ_TIMEOUT
+    latencies = []
+    stalls = []
+    arrived = asyncio.Queue()
+    task = asyncio.create_task(reader(ser, lambda card: arrived.put_nowait(time.perf_counter())))
+    tick = asyncio.create_task(ticker(stalls))
+    rng = random.Random(args.seed)
+    try:
+        for index in range(args.cards):
+            await asyncio.sleep(rng.uniform(0, args.max_gap_ms / 1000))
+            frame = format_frame(rng.choice(["AS", "KH", "7D", "TC"]))
+            start = time.perf_counter()
+            if args.split_every and index % args.split_every == 0:
+                # Written from a thread, like real hardware: a blocked event loop must not delay the second half
+                await asyncio.to_thread(write_split, simulator, frame, args.split_pause_ms / 1000)
+            else:
+                simulator.write(frame)
+            latencies.append(await asyncio.wait_for(arrived.get(), 5) - start)
+    finally:
+        task.cancel()
+        tick.cancel()
+        await asyncio.gather(task, tick, return_exceptions=True)
+        ser.close()
+        simulator.close()
+    latencies.sort()
+    stalls.sort()
+    return latencies, stalls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--max-gap-ms", type=float, default=50.0, help="random pause between cards")
+    parser.add_argument("--split-every", type=int, default=10, help="send every Nth frame in two halves (0: never)")
+    parser.add_argument("--split-pause-ms", type=float, default=30.0, help="pause between the two halves")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'reader':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'max loop stall ms':>18}")
+    for name, reader in (("polling", legacy_reader), ("threaded", threaded_reader)):
+        latencies, stalls = asyncio.run(measure(reader, args))
+        print(f"{name:<10} {percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 95) * 1000:>8.2f} "
+              f"{percentile(latencies, 99) * 1000:>8.2f} {latencies[-1] * 1000:>8.2f} {stalls[-1] * 1000:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
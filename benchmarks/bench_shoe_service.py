@@ -0,0 +1,121 @@
+"""
+Shoe ingestion with many devices: per-card latency as the number of shoes grows.
+
+Every device is a pseudo-terminal ShoeSimulator mapped to its own table (live
+mode, 6 players). Each shoe deals a card every --interval seconds (with
+jitter); cards go through ShoeService into the server's live-mode assignment
+path, and settle_live_round plays the dealer's part (evaluate, war, clear).
+Latency is measured from the simulator write to the end of the handler.
+
+With --unplug, a third of the devices are unplugged halfway through and
+plugged back in a second later, to check that they reconnect and that the
+other shoes are unaffected.
+
+    python benchmarks/bench_shoe_service.py --devices 1 10 50 100 --cards 100
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import tempfile
+import time
+from collections import deque
+
+from support import FakeResultsCollection, percentile
+
+import casino_war_backend as backend
+from result_writer import ResultWriter
+from shoe import Shoe
+from shoe_reader import ShoeSimulator
+from shoe_recording import settle_live_round
+from shoe_service import ShoeService
+
+
+async def run(num_devices, args, workdir):
+    backend.MAX_TABLES = max(backend.MAX_TABLES, num_devices)
+    backend.table_manager = backend.TableManager()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    simulators = {}
+    written = {}
+    latencies = []
+    for table_id in range(1, num_devices + 1):
+        simulator = ShoeSimulator(link=os.path.join(workdir, f"shoe{table_id}"))
+        simulators[table_id] = simulator
+        written[simulator.port] = deque()
+        table = backend.table_manager.open_table(table_id)
+        await backend.handle_set_game_mode(table, "live")
+        for player_id in range(1, 7):
+            await backend.handle_add_player(table, str(player_id))
+
+    ports = {simulator.port: table_id for table_id, simulator in simulators.items()}
+
+    async def on_card(table_id, card):
+        table = backend.table_manager.open_table(table_id)
+        if card not in table.game_state["deck"]:
+            await backend.handle_shuffle_deck(table)
+        await backend.handle_shoe_card(table, card)
+        await settle_live_round(backend, table)
+        latencies.append(time.perf_counter() - written[simulators[table_id].port].popleft())
+
+    service = ShoeService(ports, on_card, initial_backoff=0.2)
+    service.start()
+    await asyncio.sleep(0.5)  # let every device connect
+
+    async def deal(table_id, simulator):
+        shoe = Shoe.shuffled()
+        rng = random.Random(table_id)
+        for index in range(args.cards):
+            if args.unplug and table_id % 3 == 0 and index == args.cards // 2:
+                simulator.unplug()
+                await asyncio.sleep(1.0)
+                simulator.replug()
+                await asyncio.sleep(1.0)  # give the service time to reconnect
+            written[simulator.port].append(time.perf_counter())
+            simulator.send_card(shoe.draw())
+            await asyncio.sleep(args.interval * rng.uniform(0.5, 1.5))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[deal(table_id, simulator) for table_id, simulator in simulators.items()])
+    await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - start
+    status = service.status()
+    await service.stop()
+    for simulator in simulators.values():
+        simulator.close()
+    await backend.result_writer.stop()
+    latencies.sort()
+    return {
+        "devices": num_devices,
+        "cards": len(latencies),
+        "cards_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        "reconnects": sum(device["reconnects"] for device in status),
+        "parse_errors": sum(device["parse_errors"] for device in status),
+        "connected": sum(device["state"] == "connected" for device in status),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--cards", type=int, default=100, help="cards dealt per shoe")
+    parser.add_argument("--interval", type=float, default=0.02, help="mean seconds between cards of one shoe")
+    parser.add_argument("--unplug", action="store_true", help="unplug and replug every third device halfway")
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'cards':>7} {'cards/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'reconnects':>11} {'connected':>10}")
+    for num_devices in args.devices:
+        with tempfile.TemporaryDirectory() as workdir:
+            # The backend prints every card and broadcast; keep that out of the measurement output
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                row = asyncio.run(run(num_devices, args, workdir))
+        print(f"{row['devices']:>8} {row['cards']:>7} {row['cards_per_sec']:>8.0f} {row['p50_ms']:>8.2f} "
+              f"{row['p99_ms']:>8.2f} {row['max_ms']:>8.2f} {row['reconnects']:>11} {row['connected']:>10}")
+
+
+if __name__ == "__main__":
+    main()
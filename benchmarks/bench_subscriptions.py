@@ -0,0 +1,100 @@
+"""
+Fan-out work and bytes per table event with and without topic subscriptions.
+
+One table with 6 players, a dealer console, a number of display screens and
+a tablet per player plays automatic rounds with an undo and a redeal in each:
+
+    all     nobody registers a role, so every client gets every event
+    topics  the dealer, displays and player tablets register; displays skip
+            choices and deck chatter, tablets get per-player views
+
+Reported: messages and KiB delivered to the clients, and the CPU time of the
+run (table logic, encoding and queueing included).
+
+    python benchmarks/bench_subscriptions.py --displays 4 --rounds 500
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from support import FakeResultsCollection, FakeStatsCollection, FakeWebSocket
+
+import casino_war_backend as backend
+import fanout
+from dispatch import Connection
+from result_writer import ResultWriter
+
+PLAYERS = 6
+
+
+async def drain():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def run(variant, displays, rounds):
+    backend.table_manager = backend.TableManager()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    backend.stats_collection = FakeStatsCollection()
+    table = backend.table_manager.get_table(1)
+    dealer = FakeWebSocket("dealer")
+    screens = [FakeWebSocket(f"display-{n}") for n in range(displays)]
+    tablets = [FakeWebSocket(f"tablet-{pid}") for pid in range(1, PLAYERS + 1)]
+    clients = [dealer] + screens + tablets
+    for websocket in clients:
+        table.add_client(websocket)
+    if variant == "topics":
+        await backend.register_dealer(Connection(dealer, table), {"action": "register_dealer"})
+        for websocket in screens:
+            await backend.register_display(Connection(websocket, table), {"action": "register_display"})
+        for pid, websocket in enumerate(tablets, 1):
+            await backend.register_player(Connection(websocket, table),
+                                          {"action": "register_player", "player_id": str(pid)})
+    for data in [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]:
+        await backend.run_table_action(table, data)
+    for pid in range(1, PLAYERS + 1):
+        await backend.run_table_action(table, {"action": "add_player", "player_id": str(pid)})
+    await drain()
+    for websocket in clients:
+        websocket.sent = websocket.sent_bytes = 0
+
+    cpu = time.process_time()
+    for _ in range(rounds):
+        if len(table.game_state["deck"]) < 4 * PLAYERS:
+            await backend.run_table_action(table, {"action": "shuffle_deck"})
+        for data in [{"action": "start_auto_round"}, {"action": "undo_last_card"}, {"action": "clear_round"},
+                     {"action": "start_auto_round"}, {"action": "clear_round"}]:
+            await backend.run_table_action(table, data)
+            await drain()
+    cpu = time.process_time() - cpu
+    for websocket in clients:
+        fanout.detach(websocket)
+    await backend.result_writer.stop()
+    return {
+        "messages": sum(websocket.sent for websocket in clients),
+        "kib": sum(websocket.sent_bytes for websocket in clients) / 1024,
+        "display_kib": sum(websocket.sent_bytes for websocket in screens) / 1024,
+        "tablet_kib": sum(websocket.sent_bytes for websocket in tablets) / 1024,
+        "cpu": cpu,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--displays", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{PLAYERS} players, 1 dealer, {args.displays} displays, {PLAYERS} tablets, {args.rounds} rounds\n")
+    print(f"{'variant':<8} {'messages':>9} {'KiB':>8} {'displays':>9} {'tablets':>8} {'cpu s':>6}")
+    for variant in ["all", "topics"]:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            row = asyncio.run(run(variant, args.displays, args.rounds))
+        print(f"{variant:<8} {row['messages']:>9} {row['kib']:>8.0f} {row['display_kib']:>9.0f} "
+              f"{row['tablet_kib']:>8.0f} {row['cpu']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
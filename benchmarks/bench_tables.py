@@ -0,0 +1,90 @@
+"""
+Per-round latency as the number of tables served by one process grows.
+
+Every table gets 6 players and a few display screens, then all tables play
+rounds concurrently on one event loop (ties are surrendered). The time from
+deal to round completion is recorded for every round.
+
+    python benchmarks/bench_tables.py --tables 1 10 50 100 500 --rounds 50
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+from support import FakeResultsCollection, FakeWebSocket, percentile
+
+import casino_war_backend as backend
+from result_writer import ResultWriter
+
+
+async def play_rounds(table, rounds, latencies):
+    game_state = table.game_state
+    for _ in range(rounds):
+        if len(game_state["deck"]) < 2 * (len(game_state["players"]) + 1):
+            await backend.handle_shuffle_deck(table)
+        start = time.perf_counter()
+        await backend.handle_deal_cards(table)
+        for player_id, player in list(game_state["players"].items()):
+            if player["status"] == "waiting_choice":
+                await backend.handle_player_choice(table, player_id, "surrender")
+        latencies.append(time.perf_counter() - start)
+        # Let the other tables run between rounds, like a real dealer would
+        await asyncio.sleep(0)
+
+
+async def run(num_tables, rounds, displays, mongo_latency):
+    backend.MAX_TABLES = max(backend.MAX_TABLES, num_tables)
+    backend.table_manager = backend.TableManager()
+    collection = FakeResultsCollection(latency=mongo_latency)
+    backend.result_writer = ResultWriter(collection)
+    tables = []
+    for table_id in range(1, num_tables + 1):
+        table = backend.table_manager.open_table(table_id)
+        for index in range(displays):
+            table.add_client(FakeWebSocket(f"display-{table_id}-{index}"))
+        dealer = FakeWebSocket(f"dealer-{table_id}")
+        table.add_client(dealer)
+        table.dealer_clients.add(dealer)
+        await backend.handle_shuffle_deck(table)
+        for player_id in range(1, 7):
+            await backend.handle_add_player(table, str(player_id))
+        tables.append(table)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[play_rounds(table, rounds, latencies) for table in tables])
+    elapsed = time.perf_counter() - start
+    await backend.result_writer.stop()
+    latencies.sort()
+    return {
+        "tables": num_tables,
+        "rounds": len(latencies),
+        "rounds_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "inserts": collection.calls,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, nargs="+", default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument("--rounds", type=int, default=50, help="rounds per table")
+    parser.add_argument("--displays", type=int, default=2, help="display screens per table")
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0, help="simulated MongoDB round trip")
+    args = parser.parse_args()
+
+    print(f"{'tables':>7} {'rounds':>8} {'rounds/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'inserts':>8}")
+    for num_tables in args.tables:
+        # The backend prints every broadcast; keep that out of the measurement output
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            row = asyncio.run(run(num_tables, args.rounds, args.displays, args.mongo_latency_ms / 1000))
+        print(f"{row['tables']:>7} {row['rounds']:>8} {row['rounds_per_sec']:>10.0f} "
+              f"{row['p50_ms']:>8.3f} {row['p95_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['inserts']:>8}")
+
+
+if __name__ == "__main__":
+    main()
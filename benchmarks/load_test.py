@@ -0,0 +1,370 @@
+"""
+Load generation and latency for the websocket server.
+
+Starts casino_war_backend in a subprocess on a local port, with in-memory
+stand-ins for game_results and player_stats (no MongoDB needed), then
+connects a dealer, players and display screens to each table. They speak the
+real protocol: the dealer opens the table by registering there, then players
+and displays join it (?table=N); the dealer sets the mode, adds players, shuffles,
+deals (deal_cards, or start_auto_round + clear_round in automatic mode),
+assigns war cards and sends evaluate_war_round; players answer ties with
+player_choice; displays only listen.
+
+Latency is measured from the moment a client sends an action to the moment
+each client on the table receives the broadcast it causes:
+
+    deal     deal_cards / start_auto_round -> round_dealt       (every client)
+    choice   player_choice                 -> player_choice_made (every client)
+    war      evaluate_war_round            -> war_round_evaluated (every client)
+    round    deal sent                     -> round_completed at the dealer
+
+    python benchmarks/load_test.py --tables 10 --players 6 --displays 3 --rounds 100 --output run.json
+    python benchmarks/load_test.py --tables 10 --compare before.json --output after.json
+
+--url points the clients at a server that is already running instead. All
+clients share this process; with many hundreds of connections check that it
+is not the bottleneck (top) before blaming the server.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import websockets
+
+from support import FakeResultsCollection, FakeStatsCollection, percentile
+
+from shoe import CARD_NAMES
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BROADCAST_KEYS = {
+    "round_dealt": lambda data: "deal",
+    "player_choice_made": lambda data: ("choice", data.get("player_id")),
+    "war_round_evaluated": lambda data: "war",
+}
+
+
+class Recorder:
+    """Latency samples per metric plus error counts, shared by every simulated client."""
+
+    def __init__(self):
+        self.samples = {"deal": [], "choice": [], "war": [], "round": []}
+        self.errors = {}
+        self.rounds = 0
+
+    def add(self, metric, seconds):
+        self.samples[metric].append(seconds)
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self):
+        metrics = {}
+        for metric, values in self.samples.items():
+            values = sorted(values)
+            metrics[metric] = {
+                "count": len(values),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": (values[-1] if values else 0.0) * 1000,
+                "mean_ms": (sum(values) / len(values) if values else 0.0) * 1000,
+            }
+        return metrics
+
+
+class TableRun:
+    """Send times of the actions in flight on one table, keyed like BROADCAST_KEYS."""
+
+    def __init__(self, table_id):
+        self.table_id = table_id
+        self.sent = {}
+
+    def mark(self, key):
+        self.sent[key] = time.perf_counter()
+
+
+async def listen(ws, run, recorder, inbox=None, on_message=None):
+    """Reads one client's messages, timing every broadcast that answers a marked action."""
+    try:
+        async for message in ws:
+            received = time.perf_counter()
+            data = json.loads(message)
+            key_of = BROADCAST_KEYS.get(data.get("action"))
+            if key_of is not None:
+                key = key_of(data)
+                sent = run.sent.get(key)
+                if sent is not None:
+                    recorder.add(key if isinstance(key, str) else key[0], received - sent)
+            if inbox is not None:
+                inbox.put_nowait(data)
+            if on_message is not None:
+                await on_message(data)
+    except websockets.ConnectionClosed:
+        recorder.error("disconnected")
+
+
+async def expect(inbox, actions, timeout):
+    """Waits for the next message whose action is in actions, skipping everything else."""
+    async def wait():
+        while True:
+            data = await inbox.get()
+            if data.get("action") in actions:
+                return data
+    return await asyncio.wait_for(wait(), timeout)
+
+
+async def send(ws, message):
+    await ws.send(json.dumps(message))
+
+
+async def player_client(url, run, recorder, player_id, war_probability, opened, ready):
+    await opened
+    async with websockets.connect(url) as ws:
+        async def on_message(data):
+            if data.get("action") == "round_dealt" and player_id in data.get("tie_players", []):
+                choice = "war" if random.random() < war_probability else "surrender"
+                run.mark(("choice", player_id))
+                await send(ws, {"action": "player_choice", "player_id": player_id, "choice": choice})
+
+        await send(ws, {"action": "register_player", "player_id": player_id})
+        reader = asyncio.create_task(listen(ws, run, recorder, on_message=on_message))
+        ready.set_result(None)
+        await reader
+
+
+async def display_client(url, run, recorder, opened, ready):
+    await opened
+    async with websockets.connect(url) as ws:
+        reader = asyncio.create_task(listen(ws, run, recorder))
+        ready.set_result(None)
+        await reader
+
+
+async def assign_war_cards(ws, inbox, targets, timeout):
+    """Assigns a war card to each (target, player_id); picks random cards until the server accepts one."""
+    for target, player_id in targets:
+        while True:
+            card = random.choice(CARD_NAMES)
+            await send(ws, {"action": "assign_war_card", "target": target, "card": card, "player_id": player_id})
+            reply = await expect(inbox, {"war_card_assigned", "error"}, timeout)
+            if reply["action"] == "war_card_assigned":
+                break
+
+
+async def dealer_client(url, run, recorder, args, opened, players_ready):
+    player_ids = [str(pid) for pid in range(1, args.players + 1)]
+    min_cards = 2 * (args.players + 1) + 1
+    inbox = asyncio.Queue()
+    async with websockets.connect(url) as ws:
+        reader = asyncio.create_task(listen(ws, run, recorder, inbox=inbox))
+        # Only a dealer may open a table: register there, then the others can join it
+        await send(ws, {"action": "register_dealer", "table_id": run.table_id})
+        await expect(inbox, {"dealer_registered"}, args.timeout)
+        opened.set_result(None)
+        await send(ws, {"action": "reset_game"})
+        await send(ws, {"action": "set_game_mode", "mode": args.mode})
+        for player_id in player_ids:
+            await send(ws, {"action": "add_player", "player_id": player_id})
+        await send(ws, {"action": "shuffle_deck"})
+        await expect(inbox, {"deck_shuffled"}, args.timeout)
+        await players_ready
+
+        deck_count = len(CARD_NAMES) * 6
+        try:
+            for _ in range(args.rounds):
+                if deck_count < min_cards:
+                    await send(ws, {"action": "shuffle_deck"})
+                    deck_count = (await expect(inbox, {"deck_shuffled"}, args.timeout))["deck_count"]
+                start = time.perf_counter()
+                run.mark("deal")
+                if args.mode == "automatic":
+                    await send(ws, {"action": "start_auto_round"})
+                else:
+                    await send(ws, {"action": "deal_cards"})
+                dealt = await expect(inbox, {"round_dealt", "error"}, args.timeout)
+                if dealt["action"] == "error":
+                    recorder.error("deal_rejected")
+                    deck_count = 0
+                    continue
+                deck_count = dealt["deck_count"]
+                while True:
+                    data = await expect(inbox, {"round_completed", "war_round_started"}, args.timeout)
+                    if data["action"] == "round_completed":
+                        break
+                    # Manual mode war: the dealer places the war cards, then evaluates
+                    targets = [("player", pid) for pid in data["players"]] + [("dealer", None)]
+                    await assign_war_cards(ws, inbox, targets, args.timeout)
+                    deck_count -= len(targets)
+                    run.mark("war")
+                    await send(ws, {"action": "evaluate_war_round"})
+                recorder.add("round", time.perf_counter() - start)
+                recorder.rounds += 1
+                if args.mode == "automatic":
+                    await send(ws, {"action": "clear_round"})
+        except asyncio.TimeoutError:
+            recorder.error("timeout")
+            print(f"table {run.table_id}: no reply within {args.timeout}s, stopping this table", file=sys.stderr)
+        reader.cancel()
+
+
+async def run_clients(url, args):
+    recorder = Recorder()
+    loop = asyncio.get_running_loop()
+    background = []
+    dealers = []
+    for table_id in range(1, args.tables + 1):
+        run = TableRun(table_id)
+        table_url = f"{url}/?table={table_id}"
+        opened = loop.create_future()
+        ready = [loop.create_future() for _ in range(args.players + args.displays)]
+        for index in range(args.players):
+            background.append(asyncio.create_task(
+                player_client(table_url, run, recorder, str(index + 1), args.war_probability, opened, ready[index])))
+        for index in range(args.displays):
+            background.append(asyncio.create_task(
+                display_client(table_url, run, recorder, opened, ready[args.players + index])))
+        dealers.append(dealer_client(f"{url}/", run, recorder, args, opened, asyncio.gather(*ready)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*dealers)
+    elapsed = time.perf_counter() - start
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    return recorder, elapsed
+
+
+def serve(port):
+    """Runs the backend on localhost:port with in-memory stores (the --serve child process)."""
+    import casino_war_backend as backend
+    from result_writer import ResultWriter
+
+    backend.stats_collection = FakeStatsCollection()
+    backend.result_writer = ResultWriter(FakeResultsCollection())
+    backend.result_writer.on_written.append(backend.update_stored_player_stats)
+    backend.MESSAGE_RATE_LIMIT = 0  # the simulated dealers send faster than a person would
+
+    async def main():
+        async with websockets.serve(backend.handle_connection, "localhost", port):
+            await asyncio.Future()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(main())
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(url, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(url):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    print(f"{report['rounds']} rounds on {report['config']['tables']} tables in {report['elapsed_s']:.1f}s: "
+          f"{report['rounds_per_sec']:.1f} rounds/s")
+    if report["errors"]:
+        print(f"errors: {report['errors']}")
+    print(f"{'latency':<8} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for metric, row in report["latency"].items():
+        print(f"{metric:<8} {row['count']:>8} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['max_ms']:>9.2f}")
+
+
+def print_comparison(before, after):
+    print(f"\nagainst {before.get('commit') or 'baseline'} ({before['timestamp']}):")
+    print(f"{'':<12} {'before':>10} {'after':>10} {'change':>8}")
+    rows = [("rounds/s", before["rounds_per_sec"], after["rounds_per_sec"])]
+    for metric in after["latency"]:
+        for pct in ("p50_ms", "p99_ms"):
+            if before["latency"].get(metric, {}).get("count") and after["latency"][metric]["count"]:
+                rows.append((f"{metric} {pct[:3]}", before["latency"][metric][pct], after["latency"][metric][pct]))
+    for label, old, new in rows:
+        change = f"{(new - old) / old * 100:+.0f}%" if old else "-"
+        print(f"{label:<12} {old:>10.2f} {new:>10.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--players", type=int, default=6, help="players per table (1-6)")
+    parser.add_argument("--displays", type=int, default=2, help="display screens per table")
+    parser.add_argument("--rounds", type=int, default=100, help="rounds per table")
+    parser.add_argument("--mode", choices=["manual", "automatic"], default="manual")
+    parser.add_argument("--war-probability", type=float, default=0.5, help="chance a tied player goes to war")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for any expected reply")
+    parser.add_argument("--url", help="use a running server (e.g. ws://localhost:6790) instead of starting one")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="print the change against a previous --output file")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+    random.seed(args.seed)
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f"ws://localhost:{port}"
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port)], cwd=REPO_DIR,
+                                  env={**os.environ, "MAX_TABLES": str(max(args.tables, 1))})
+    try:
+        asyncio.run(wait_for_server(url))
+        recorder, elapsed = asyncio.run(run_clients(url, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "serve")},
+        "elapsed_s": elapsed,
+        "rounds": recorder.rounds,
+        "rounds_per_sec": recorder.rounds / elapsed if elapsed else 0.0,
+        "errors": recorder.errors,
+        "latency": recorder.summary(),
+    }
+    print_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Stress test for per-table command serialization: several dealers per table
+fire conflicting commands (start_auto_round, player_choice, clear_round,
+undo_last_card, shuffle_deck) at the same time while MongoDB is slow and the
+result writer's queue is tiny, so complete_round keeps waiting in the middle
+of a round.
+
+Every command is either run on the table's executor, the way the server
+runs it, or (--direct) awaited straight from the dealer task, the way it
+used to be. After every command, and at the end, the table is checked:
+
+    players      a finished player has a result; a player facing a choice has a card and no result
+    completed    a round being completed is still the table's round when its round_completed goes out
+    results      session stats count exactly the results stored for the table
+    rounds       no player has two stored results for the same round
+
+    python benchmarks/stress_tables.py --tables 20 --dealers 4 --commands 300
+    python benchmarks/stress_tables.py --direct
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import os
+import random
+import time
+
+from support import FakeResultsCollection, FakeWebSocket
+
+import casino_war_backend as backend
+from result_writer import ResultWriter
+
+
+def check_players(table):
+    for player in table.game_state["players"].values():
+        if player["status"] == "finished" and player["result"] is None:
+            return False
+        if player["status"] == "waiting_choice" and (player["card"] is None or player["result"] is not None):
+            return False
+    return True
+
+
+def check_results(table, docs):
+    stored = collections.Counter()
+    rounds = collections.Counter()
+    for doc in docs:
+        if doc["table_number"] == table.table_id:
+            stored[doc["player_id"], doc["result"]] += 1
+            rounds[doc["player_id"], doc["round_number"]] += 1
+    counted = collections.Counter()
+    for player_id, stats in table.session_stats.items():
+        for result, key in (("win", "wins"), ("lose", "losses"), ("tie", "ties"), ("surrender", "surrenders")):
+            if stats[key]:
+                counted[player_id, result] = stats[key]
+    violations = []
+    if counted != stored:
+        violations.append(f"results: session stats {sum(counted.values())}, stored {sum(stored.values())}")
+    duplicated = sum(1 for count in rounds.values() if count > 1)
+    if duplicated:
+        violations.append(f"rounds: {duplicated} player rounds stored more than once")
+    return violations
+
+
+def watch_completions(violations):
+    """Wraps complete_round to check that no other command changes the table while it waits for the writer."""
+    complete_round = backend.complete_round
+
+    async def checked_complete_round(table):
+        round_number = table.game_state["round_number"]
+        await complete_round(table)
+        if table.game_state["round_number"] != round_number:
+            violations["completed"] += 1
+
+    backend.complete_round = checked_complete_round
+
+
+async def dealer(table, commands, direct, rng, violations):
+    async def command(data):
+        await backend.apply_table_action(table, data)
+        if not check_players(table):
+            violations["players"] += 1
+
+    for _ in range(commands):
+        game_state = table.game_state
+        if len(game_state["deck"]) < 20:
+            data = {"action": "shuffle_deck"}
+        else:
+            waiting = [pid for pid, player in game_state["players"].items() if player["status"] == "waiting_choice"]
+            roll = rng.random()
+            if waiting and roll < 0.5:
+                data = {"action": "player_choice", "player_id": rng.choice(waiting),
+                        "choice": rng.choice(("war", "surrender"))}
+            elif roll < 0.75:
+                data = {"action": "start_auto_round"}
+            elif roll < 0.95:
+                data = {"action": "clear_round"}
+            else:
+                data = {"action": "undo_last_card"}
+        if direct:
+            await command(data)
+        else:
+            await table.executor.run(command, data)
+        await asyncio.sleep(0)
+
+
+async def run(num_tables, dealers, commands, direct, mongo_latency, seed):
+    backend.MAX_TABLES = max(backend.MAX_TABLES, num_tables)
+    backend.table_manager = backend.TableManager()
+    collection = FakeResultsCollection(latency=mongo_latency)
+    backend.result_writer = ResultWriter(collection, batch_size=4, flush_interval=0.001, max_queue=4)
+    rng = random.Random(seed)
+    tables = []
+    for table_id in range(1, num_tables + 1):
+        table = backend.table_manager.open_table(table_id)
+        table.add_client(FakeWebSocket(f"display-{table_id}"))
+        for data in [{"action": "set_game_mode", "mode": "automatic"}, {"action": "shuffle_deck"}]:
+            await backend.apply_table_action(table, data)
+        for player_id in range(1, 7):
+            await backend.apply_table_action(table, {"action": "add_player", "player_id": str(player_id)})
+        tables.append(table)
+
+    violations = collections.Counter()
+    watch_completions(violations)
+    start = time.perf_counter()
+    await asyncio.gather(*[dealer(table, commands, direct, random.Random(rng.random()), violations)
+                           for table in tables for _ in range(dealers)])
+    elapsed = time.perf_counter() - start
+    for table in tables:
+        await table.executor.stop()
+    await backend.result_writer.stop()
+    for table in tables:
+        for violation in check_results(table, collection.docs):
+            violations[violation.split(":")[0]] += 1
+    return elapsed, len(collection.docs), violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--dealers", type=int, default=4, help="concurrent dealers per table")
+    parser.add_argument("--commands", type=int, default=300, help="commands per dealer")
+    parser.add_argument("--direct", action="store_true", help="run commands without the table executors")
+    parser.add_argument("--mongo-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        elapsed, stored, violations = asyncio.run(run(args.tables, args.dealers, args.commands, args.direct,
+                                                      args.mongo_latency_ms / 1000, args.seed))
+    total = args.tables * args.dealers * args.commands
+    print(f"{'direct' if args.direct else 'executor'}: {total} commands on {args.tables} tables in {elapsed:.2f}s "
+          f"({total / elapsed:.0f}/s), {stored} results stored")
+    if not violations:
+        print("all invariants held")
+    for name, count in sorted(violations.items()):
+        print(f"  {name}: {count} violations")
+    raise SystemExit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Shared stand-ins for the benchmark scripts (no MongoDB or real sockets needed)."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeWebSocket:
+    """Looks enough like a websockets connection for the fan-out queues (fanout.py)."""
+
+    def __init__(self, name="bench"):
+        self.remote_address = (name, 0)
+        self.sent = 0
+        self.sent_bytes = 0
+
+    async def send(self, message):
+        self.sent += 1
+        self.sent_bytes += len(message)
+
+
+class FakeInsertResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class FakeResultsCollection:
+    """In-memory stand-in for the motor game_results collection, with optional per-call latency."""
+
+    def __init__(self, latency=0.0):
+        self.docs = []
+        self.latency = latency
+        self.calls = 0
+
+    def with_options(self, **kwargs):
+        return self
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        start = len(self.docs)
+        self.docs.extend(docs)
+        return FakeInsertResult(list(range(start, len(self.docs))))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeStatsCollection:
+    """In-memory stand-in for the motor player_stats collection (just what player_stats.py uses), with optional per-lookup latency."""
+
+    def __init__(self, latency=0.0):
+        self.docs = {}
+        self.latency = latency
+
+    async def find_one(self, query):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.docs.get(query["_id"])
+
+    def find(self, query):
+        ids = query["_id"]["$in"]
+        return FakeCursor([self.docs[pid] for pid in ids if pid in self.docs])
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            update = request._doc
+            doc = self.docs.setdefault(request._filter["_id"], {"_id": request._filter["_id"]})
+            for field, delta in update["$inc"].items():
+                doc[field] = doc.get(field, 0) + delta
+
+    async def delete_many(self, query):
+        self.docs.clear()
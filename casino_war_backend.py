@@ -1,13 +1,33 @@
 import asyncio
+import copy
+import os
 import websockets
-import json
 import motor.motor_asyncio
 from datetime import datetime
-import random
 import time
 import re
 import urllib.parse
 import serial
+from pymongo import WriteConcern
+
+from fanout import broadcast, client_queue, codec_of, detach, send, set_codec
+from codec import JSON, decode_message, encode_message, negotiate, transcode
+from dispatch import Connection, Dispatcher, Reject
+from state_sync import diff_state, merge_deltas
+from result_writer import ResultWriter
+from journal import Journal
+from executor import TableExecutor
+from scheduler import TimerWheel
+from sessions import EVENTS_REPLAYED, SESSION_RESUMES, EventLog, SessionStore
+from subscriptions import FEED, Subscriptions, delta_view, event_topic, has_seats, parse_topics, player_view
+import metrics
+import log
+from shoe import DECKS_PER_SHOE, Shoe
+from shoe_pool import ShoePool
+from rules import compare_cards
+from shoe_reader import FrameError, ShoeReader, decode_frame
+from shoe_service import ShoeService, parse_device_map
+from player_stats import get_bulk_player_stats, get_player_stats, increment_player_stats
 
 # ser = serial.Serial("COM1", 9600, timeout=0.1)  # Adjust baud rate if necessary
 
@@ -15,123 +35,269 @@ import serial
 MONGO_URI = "mongodb://localhost:27017"
 DB_NAME = "casino_war_db"
 COLLECTION_NAME = "game_results"
+STATS_COLLECTION_NAME = "player_stats"  # materialized counters, see player_stats.py
 
 client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
 db = client[DB_NAME] 
 results_collection = db[COLLECTION_NAME]
+stats_collection = db[STATS_COLLECTION_NAME]
+
+# Write-behind persistence of round results (see result_writer.py)
+RESULTS_BATCH_SIZE = 100  # insert_many once this many results are queued...
+RESULTS_FLUSH_INTERVAL = 0.25  # ...or this many seconds after the first one was queued
+RESULTS_MAX_QUEUE = 5000  # complete_round waits for room beyond this (backpressure)
+RESULTS_WRITE_CONCERN = WriteConcern(w=1)  # e.g. WriteConcern(w="majority", j=True) for durability
+
+result_writer = ResultWriter(
+    results_collection,
+    batch_size=RESULTS_BATCH_SIZE,
+    flush_interval=RESULTS_FLUSH_INTERVAL,
+    max_queue=RESULTS_MAX_QUEUE,
+    write_concern=RESULTS_WRITE_CONCERN,
+)
+
+async def update_stored_player_stats(docs):
+    """Keeps the player_stats counters in step with every batch of persisted results."""
+    await increment_player_stats(stats_collection, docs)
+
+result_writer.on_written.append(update_stored_player_stats)
+
+SHOE_RECORDING_DIR = os.environ.get("SHOE_RECORDING_DIR")  # record raw shoe frames here (see shoe_recording.py)
+# Every shoe put in play, with the seed that reproduces it (see shoe_pool.py); SHOE_AUDIT_LOG="" turns it off
+SHOE_AUDIT_LOG = os.environ.get("SHOE_AUDIT_LOG", "shoe_audit.jsonl")
+SHOE_POOL_SIZE = 4  # shoes kept shuffled ahead of time
+
+# Action journal for crash recovery (see journal.py); JOURNAL_DIR="" turns it off
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR", "journal")
+JOURNAL_FSYNC_INTERVAL = 0.05  # seconds of journal a power cut can lose
+JOURNAL_SNAPSHOT_EVERY = 1000  # entries between snapshots; bounds replay time on startup
+
+journal = Journal(JOURNAL_DIR, fsync_interval=JOURNAL_FSYNC_INTERVAL, snapshot_every=JOURNAL_SNAPSHOT_EVERY)
+
+# Prometheus-style metrics endpoint (see metrics.py); METRICS_PORT=0 turns it off
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))
+
+# Logging (see log.py). Every received message and broadcast is logged at DEBUG in the "messages" and
+# "broadcast" categories, e.g. LOG_LEVELS="broadcast=DEBUG" LOG_SAMPLE="broadcast=0.01" for 1 in 100.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")  # per category: "messages=DEBUG,mongodb=WARNING"
+LOG_SAMPLE = os.environ.get("LOG_SAMPLE", "")  # per category share of sub-WARNING records kept
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")  # text or json
+
+# Limits on what a client may send (see dispatch.py); over the limits messages are refused, not the connection
+MAX_MESSAGE_SIZE = 4096  # larger messages get an error reply
+MAX_FRAME_SIZE = 64 * 1024  # larger frames close the connection (websockets max_size)
+MESSAGE_RATE_LIMIT = float(os.environ.get("MESSAGE_RATE_LIMIT", "100"))  # messages/s per connection; 0: no limit
+MESSAGE_BURST = 200
+TIMER_TICK = float(os.environ.get("TIMER_TICK", "0.01"))  # timer wheel bucket width, seconds; not its precision (see scheduler.py)
+DISPLAY_FEED_FPS = float(os.environ.get("DISPLAY_FEED_FPS", "10"))  # frames/s at most per table for feed displays
+SESSION_TAKEN_OVER_CLOSE_CODE = 4000  # closes a connection whose session was resumed on a newer one
+REPLAY_CACHE_SIZE = 4096  # filtered or re-encoded events kept per table for a reconnect storm
+TABLE_NOT_OPEN_CLOSE_CODE = 4004  # closes a connection that asked for a table nobody opened (?table=N)
+# Tables are numbered 1..MAX_TABLES. Clients join open tables; only a dealer opens one (see TableManager).
+MAX_TABLES = int(os.environ.get("MAX_TABLES", "32"))
+TABLE_IDLE_TIMEOUT = float(os.environ.get("TABLE_IDLE_TIMEOUT", "600"))  # seconds without clients before a table closes; 0: never
+# With REQUIRE_DEALER_REGISTRATION=1 only registered dealers may change a table (players may still choose)
+REQUIRE_DEALER_REGISTRATION = os.environ.get("REQUIRE_DEALER_REGISTRATION") == "1"
+
+client_log = log.get_logger("clients")
+message_log = log.get_logger("messages")
+broadcast_log = log.get_logger("broadcast")
+mongo_log = log.get_logger("mongodb")
+shoe_log = log.get_logger("shoe")
+journal_log = log.get_logger("journal")
+server_log = log.get_logger("server")
+
+DEFAULT_TABLE_ID = 1
+
+def new_game_state(table_number):
+    """Returns a fresh game state dict for one table."""
+    return {
+        "deck": Shoe(),
+        "burned_cards": [],
+        "dealer_card": None,
+        "players": {},  # {player_id: {card: None, status: 'active/war/surrender', result: None}}
+        "round_active": False,
+        "round_number": 1,  # Start from 1, not 0
+        "game_mode": "manual",  # manual, automatic, live
+        "table_number": table_number,
+        "min_bet": 10,
+        "max_bet": 1000,
+        "player_results": {},  # {player_id: last_result} for display screen
+        "auto_task": None,  # For automatic mode task
+        "auto_play": False,  # Automatic mode deals its own rounds (see auto_step)
+        "auto_round_delay": 5,  # Seconds between automatic rounds
+        "auto_choice_delay": 3,  # Seconds to wait for player choices before auto-surrender
+        "shoe_first_card_burned": False,  # Flag to track if first card from shoe reader is burned
+    }
 
-connected_clients = set()
-dealer_clients = set()
-player_clients = {}  # {player_id: websocket}
-
-# Card values for comparison (Ace is highest)
-CARD_VALUES = {
-    'A': 14, 'K': 13, 'Q': 12, 'J': 11, 'T': 10,
-    '9': 9, '8': 8, '7': 7, '6': 6, '5': 5, '4': 4, '3': 3, '2': 2
-}
-
-# Global game state
-game_state = {
-    "deck": [],
-    "burned_cards": [],
-    "dealer_card": None,
-    "players": {},  # {player_id: {card: None, status: 'active/war/surrender', result: None}}
-    "round_active": False,
-    "round_number": 1,  # Start from 1, not 0
-    "game_mode": "manual",  # manual, automatic, live
-    "table_number": 1,
-    "min_bet": 10,
-    "max_bet": 1000,
-    "player_results": {},  # {player_id: last_result} for display screen    
-    "auto_task": None,  # For automatic mode task
-    "auto_round_delay": 5,  # Seconds between automatic rounds
-    "auto_choice_delay": 3,  # Seconds to wait for player choices before auto-surrender
-    "shoe_first_card_burned": False,  # Flag to track if first card from shoe reader is burned
-}
-
-# In-memory session stats (not MongoDB)
-session_stats = {}
-
-def create_deck():
-    """Creates 6 standard 52-card decks and shuffles them."""
-    ranks = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K"]
-    suits = ["S", "D", "C", "H"]
-    deck = []
-    
-    # Create 6 decks
-    for _ in range(6):
-        for rank in ranks:
-            for suit in suits:
-                deck.append(rank + suit)
-    
-    random.shuffle(deck)
-    return deck
-
-def get_card_value(card):
-    """Returns the numerical value of a card for comparison."""
-    if not card or len(card) < 2:
-        return 0
-    return CARD_VALUES.get(card[0], 0)
-
-def compare_cards(player_card, dealer_card):
-    """Compares two cards and returns result."""
-    player_val = get_card_value(player_card)
-    dealer_val = get_card_value(dealer_card)
-    
-    if player_val > dealer_val:
-        return "win"
-    elif player_val < dealer_val:
-        return "lose"
-    else:
-        return "tie"
+class Table:
+    """Everything that belongs to one physical table: its game state, session stats and clients."""
+
+    def __init__(self, table_id):
+        self.table_id = table_id
+        self.game_state = new_game_state(table_id)
+        # In-memory session stats (not MongoDB); bump stats_version whenever they change
+        self.session_stats = {}
+        self.stats_version = 0
+        self.connected_clients = set()
+        self.dealer_clients = set()
+        self.player_clients = {}  # {player_id: websocket}
+        # Clients that asked for state_delta messages instead of full game_state_update snapshots
+        self.delta_clients = set()
+        # Every executor command ends with publish_state, so between commands this is the current view
+        self.state_version = 0
+        self.published_state = copy.deepcopy(build_state_view(self))  # state view as of state_version
+        self.snapshot_cache = {}  # (action, codec) -> ((state_version, stats_version), encoded state_message)
+        # Anything that reads or changes game_state goes through here, one command at a time
+        self.executor = TableExecutor(table_id)
+        # Recent broadcasts, numbered, for clients that reconnect (see sessions.py)
+        self.events = EventLog()
+        self.replay_cache = {}  # (event_seq, player view, codec) -> event as replay_payload() made it
+        # Which topics of table events each client receives (see subscriptions.py)
+        self.subscriptions = Subscriptions()
+        self.frame_timer = None  # pending display_frame
+        self.frame_sent_at = None  # loop time of the last display feed frame
+        self.frame_versions = None  # (state_version, stats_version) it showed
+        self.idle_timer = None  # pending close_idle_table, while nobody is connected
+
+    def add_client(self, websocket):
+        self.connected_clients.add(websocket)
+        self.subscriptions.subscribe(websocket)  # every topic until it registers
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+            self.idle_timer = None
+
+    def remove_client(self, websocket):
+        """Drops a websocket from every client set of this table."""
+        self.connected_clients.discard(websocket)
+        self.subscriptions.unsubscribe(websocket)
+        self.dealer_clients.discard(websocket)
+        self.delta_clients.discard(websocket)
+        # Remove from player clients if exists
+        for player_id, client in list(self.player_clients.items()):
+            if client == websocket:
+                del self.player_clients[player_id]
+                break
+        if not self.connected_clients:
+            close_when_idle(self)
+
+    def is_idle(self):
+        """No clients, no round or automatic play in progress and no commands queued."""
+        game_state = self.game_state
+        return not (self.connected_clients or game_state["round_active"] or game_state.get("war_round_active")
+                    or game_state.get("auto_play") or self.executor.pending())
+
+class TableManager:
+    """
+    Owns every open table of this process, keyed by table number. get_table() only finds open tables
+    (the default table is always open); open_table() creates one and is for dealers, shoe devices and
+    recovery. Tables nobody uses close again after TABLE_IDLE_TIMEOUT (see close_idle_table).
+    """
+
+    def __init__(self):
+        self.tables = {}  # {table_id: Table}
+
+    def get_table(self, table_id=None):
+        """Returns the open table for table_id, or None; ValueError if table_id is not a table number."""
+        table_id = normalize_table_id(table_id)
+        if table_id == DEFAULT_TABLE_ID:
+            return self.open_table(table_id)
+        return self.tables.get(table_id)
+
+    def open_table(self, table_id):
+        """Returns the table for table_id, creating it if it is not open; ValueError if table_id is not a table number."""
+        table_id = normalize_table_id(table_id)
+        table = self.tables.get(table_id)
+        if table is None:
+            table = Table(table_id)
+            self.tables[table_id] = table
+        return table
+
+    def close_table(self, table):
+        """Forgets a table and stops its executor once the commands already queued have run."""
+        if self.tables.get(table.table_id) is table:
+            del self.tables[table.table_id]
+        if table.frame_timer is not None:
+            table.frame_timer.cancel()
+            table.frame_timer = None
+        asyncio.create_task(table.executor.stop())
+
+    def __iter__(self):
+        return iter(list(self.tables.values()))
+
+    def __len__(self):
+        return len(self.tables)
+
+def normalize_table_id(table_id):
+    """Table ids are table numbers 1..MAX_TABLES, as ints or numeric strings; none means the default table."""
+    if table_id is None or table_id == "":
+        return DEFAULT_TABLE_ID
+    try:
+        number = int(table_id) if not isinstance(table_id, bool) else None
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not 1 <= number <= MAX_TABLES:
+        raise ValueError(f"Table must be a number from 1 to {MAX_TABLES}, not {table_id!r}")
+    return number
+
+# Shoe readers: serial port -> table number, e.g. {"/dev/ttyUSB0": 1, "COM7": 2} (see shoe_service.py).
+# The SHOE_DEVICES environment variable ("/dev/ttyUSB0=1,COM7=2") overrides this; the server does not start
+# with an entry that is not a table number.
+SHOE_DEVICES = parse_device_map(os.environ.get("SHOE_DEVICES", ""), normalize_table_id)
+SHOE_TABLES = frozenset(SHOE_DEVICES.values())  # tables fed by a shoe reader, kept open while it runs
+
+def close_when_idle(table):
+    """Arms the timer that closes a table nobody is connected to (never the default table)."""
+    if table.table_id == DEFAULT_TABLE_ID or not TABLE_IDLE_TIMEOUT or table.idle_timer is not None:
+        return
+    table.idle_timer = auto_timers.call_later(TABLE_IDLE_TIMEOUT, close_idle_table, table)
+
+def close_idle_table(table):
+    """Closes the table if it is still idle, so abandoned tables do not pile up in memory and the journal."""
+    table.idle_timer = None
+    if table.connected_clients:
+        return
+    if not table.is_idle() or table.table_id in SHOE_TABLES:
+        close_when_idle(table)  # look again later
+        return
+    table_manager.close_table(table)
+    journal.record(table.table_id, {"action": "close_table"})  # so recovery does not bring it back
+    server_log.info("Closed idle table %s", table.table_id)
+
+table_manager = TableManager()
+sessions = SessionStore()  # resume tokens of connected and recently dropped clients
+
+shoe_pool = ShoePool(SHOE_POOL_SIZE, DECKS_PER_SHOE)  # main() turns on the audit log
+
+def create_deck(table):
+    """Takes a shuffled 6-deck Shoe for the table from the pool (the journal keeps the order for replay)."""
+    return journal.deck(lambda: shoe_pool.take(table.table_id))
 
 # Simple stats retrieval for player registration/refresh
 async def get_player_stats_simple(player_id=None):
-    """Fetches win/loss/tie/surrender/total_games for a player from MongoDB."""
+    """Fetches win/loss/tie/surrender/total_games for a player from the player_stats counters."""
     try:
         if player_id:
-            pipeline = [
-                {"$match": {"player_id": player_id}},
-                {"$group": {
-                    "_id": "$player_id",
-                    "wins": {"$sum": {"$cond": [{"$eq": ["$result", "win"]}, 1, 0]}},
-                    "losses": {"$sum": {"$cond": [{"$eq": ["$result", "lose"]}, 1, 0]}},
-                    "ties": {"$sum": {"$cond": [{"$eq": ["$result", "tie"]}, 1, 0]}},
-                    "surrenders": {"$sum": {"$cond": [{"$eq": ["$result", "surrender"]}, 1, 0]}},
-                    "total_games": {"$sum": 1}
-                }}
-            ]
-            cursor = results_collection.aggregate(pipeline)
-            result = await cursor.to_list(length=1)
-            if result:
-                doc = result[0]
-                return {
-                    "wins": doc["wins"],
-                    "losses": doc["losses"],
-                    "ties": doc["ties"],
-                    "surrenders": doc["surrenders"],
-                    "total_games": doc["total_games"]
-                }
+            return await get_player_stats(stats_collection, player_id)
         return {"wins": 0, "losses": 0, "ties": 0, "surrenders": 0, "total_games": 0}
     except Exception as e:
-        print(f"[MONGODB ERROR] Failed to retrieve player stats: {e}")
+        mongo_log.error("Failed to retrieve player stats: %s", e)
         return {"wins": 0, "losses": 0, "ties": 0, "surrenders": 0, "total_games": 0}
 
-async def get_all_player_stats():
-    """Fetches stats for all players in the current game from MongoDB."""
+async def get_all_player_stats(table):
+    """Fetches stats for all players in the current game from MongoDB (one query for the whole table)."""
+    game_state = table.game_state
     stats = {}
     try:
-        player_ids = list(game_state["players"].keys())
-        for pid in player_ids:
-            stats[pid] = await get_player_stats_simple(pid)
+        stats = await get_bulk_player_stats(stats_collection, game_state["players"].keys())
     except Exception as e:
-        print(f"[MONGODB ERROR] Failed to retrieve all player stats: {e}")
+        mongo_log.error("Failed to retrieve all player stats: %s", e)
     return stats
 
-async def get_session_stats():
-    return dict(session_stats)
-
-async def update_session_stats(player_results):
+async def update_session_stats(table, player_results):
+    session_stats = table.session_stats
+    table.stats_version += 1
     for player_id, result in player_results.items():
         if player_id not in session_stats:
             session_stats[player_id] = {"wins": 0, "losses": 0, "ties": 0, "surrenders": 0}
@@ -144,16 +310,25 @@ async def update_session_stats(player_results):
         elif result == "tie":
             session_stats[player_id]["ties"] += 1
 
-async def clear_session_stats():
-    session_stats.clear()
-
-async def handle_connection(websocket, path=None):
-    """Handles new client connections."""
-    connected_clients.add(websocket)
-    print(f"Client connected: {websocket.remote_address}")
-    
-    # Send current game state to new client (INCLUDE WAR ROUND STATE IF ACTIVE)
-    stats = await get_session_stats()
+async def clear_session_stats(table):
+    table.session_stats.clear()
+    table.stats_version += 1
+
+def get_connection_query(websocket, path=None):
+    """The connection URL's query parameters, e.g. {"table": "3"} for ws://localhost:6790/?table=3."""
+    if path is None:
+        request = getattr(websocket, "request", None)
+        path = getattr(request, "path", None) or getattr(websocket, "path", "")
+    query = urllib.parse.urlparse(path or "").query
+    return {key: values[0] for key, values in urllib.parse.parse_qs(query).items()}
+
+def get_requested_table_id(websocket, path=None):
+    """Reads the table id from the connection URL, e.g. ws://localhost:6790/?table=3."""
+    return get_connection_query(websocket, path).get("table")
+
+def build_state_view(table):
+    """The client-facing view of a table's game state (no deck contents)."""
+    game_state = table.game_state
     game_state_update = {
         "deck_count": len(game_state["deck"]),
         "burned_cards_count": len(game_state["burned_cards"]),
@@ -165,150 +340,488 @@ async def handle_connection(websocket, path=None):
         "table_number": game_state["table_number"],
         "min_bet": game_state["min_bet"],
         "max_bet": game_state["max_bet"],
-        "player_results": game_state["player_results"]
+        "player_results": game_state["player_results"],
+        "auto_play": game_state.get("auto_play", False)
     }
     # PATCH: Always include war round state if present
     if game_state.get("war_round_active") or (game_state.get("war_round") and game_state["war_round"]):
         game_state_update["war_round_active"] = game_state.get("war_round_active", False)
         game_state_update["war_round"] = game_state.get("war_round", None)
-    await websocket.send(json.dumps({
-        "action": "game_state_update",
-        "game_state": game_state_update,
-        "stats": stats
-    }))
+    return game_state_update
+
+DISPLAY_FRAMES = metrics.Counter("casino_war_display_frames_total", "Display feed frames sent (one per table and frame interval at most)")
+
+SNAPSHOT_ENCODES = metrics.Counter("casino_war_snapshot_encodes_total",
+                                   "State snapshots sent to single clients, by whether they had to be encoded",
+                                   labels=("cache",))
+
+def state_message(table, action="game_state_update"):
+    """
+    The published state view with the session stats: a game_state_update, or a
+    state_snapshot carrying the version it corresponds to (for delta clients).
+    """
+    message = {
+        "action": action,
+        "game_state": table.published_state,
+        "stats": dict(table.session_stats)
+    }
+    if action == "state_snapshot":
+        message["seq"] = table.state_version
+    return message
+
+def state_payload(table, action="game_state_update", codec=JSON):
+    """state_message() encoded in codec, reused until the state version or the session stats change."""
+    versions = (table.state_version, table.stats_version)
+    cached = table.snapshot_cache.get((action, codec))
+    if cached is not None and cached[0] == versions:
+        SNAPSHOT_ENCODES.inc("hit")
+        return cached[1]
+    SNAPSHOT_ENCODES.inc("miss")
+    payload = encode_message(state_message(table, action), codec)
+    table.snapshot_cache[action, codec] = (versions, payload)
+    return payload
+
+def client_state_payload(table, websocket, action="game_state_update"):
+    """state_payload() for one client: the shared encoding, or its per-player view (see subscriptions.py)."""
+    view = table.subscriptions.get(websocket)[1]
+    if view is None:
+        return state_payload(table, action, codec_of(websocket))
+    return encode_message(player_view(state_message(table, action), view), codec_of(websocket))
+
+async def send_game_state(websocket, table):
+    """Sends the table's current game state to a single client (a connect burst encodes it once)."""
+    if websocket in table.delta_clients:
+        await send_state_snapshot(websocket, table)
+        return
+    client_queue(websocket).push(client_state_payload(table, websocket))
+
+async def send_state_snapshot(websocket, table):
+    """Sends a delta client the full state view together with the version it corresponds to."""
+    await publish_state(table)
+    client_queue(websocket).push(client_state_payload(table, websocket, "state_snapshot"))
+
+async def publish_state(table):
+    """Bumps the table's state version and sends delta clients what changed since the last one."""
+    # Copy first: ops reference the view, and queued deltas may be merged after the live state moved on
+    view = copy.deepcopy(build_state_view(table))
+    ops = diff_state(table.published_state, view)
+    if not ops:
+        return
+    table.state_version += 1
+    table.published_state = view
+    if table.subscriptions.full[FEED]:
+        schedule_display_frame(table)
+    delta = {
+        "action": "state_delta",
+        "base": table.state_version - 1,
+        "seq": table.state_version,
+        "ops": ops
+    }
+    full, views = table.subscriptions.split(table.delta_clients)
+    # Logged even with no delta client connected, for the ones that resume
+    broadcast_event(table, "delta", full, delta, coalesce_key="state_delta", merge=merge_deltas)
+    for player_ids, clients in views.items():
+        broadcast(clients, delta_view(delta, player_ids), "state_delta", merge_deltas)
+
+def client_registrations(table, websocket):
+    """(dealer, player ids, wants deltas, (topics, player view, role)) of a connection at table."""
+    return (
+        websocket in table.dealer_clients,
+        [pid for pid, client in table.player_clients.items() if client == websocket],
+        websocket in table.delta_clients,
+        table.subscriptions.get(websocket),
+    )
+
+def register_client(table, websocket, registrations):
+    """Adds a connection to table with the registrations from client_registrations."""
+    dealer, player_ids, deltas, subscription = registrations
+    table.add_client(websocket)
+    table.subscriptions.subscribe(websocket, *subscription)
+    if dealer:
+        table.dealer_clients.add(websocket)
+    if deltas:
+        table.delta_clients.add(websocket)
+    for player_id in player_ids:
+        table.player_clients[player_id] = websocket
+
+async def move_client(websocket, table, table_id, open_table=False):
+    """
+    Moves a connection, with its dealer/player registration, to another table and returns that table.
+    Only with open_table (dealers) may the table be one that is not open yet.
+    """
+    try:
+        new_table = table_manager.open_table(table_id) if open_table else table_manager.get_table(table_id)
+    except ValueError as e:
+        raise Reject("invalid_table", str(e))
+    if new_table is None:
+        raise Reject("table_not_open", f"Table {table_id} is not open; a dealer has to open it first")
+    if new_table is table:
+        return table
+    registrations = client_registrations(table, websocket)
+    table.remove_client(websocket)
+    register_client(new_table, websocket, registrations)
+    await new_table.executor.run(send_game_state, websocket, new_table)
+    return new_table
+
+# Every message goes through the dispatcher (see dispatch.py): size and rate limits, a schema check per
+# action, hooks, then its handler. Any message may carry "table_id", which moves the connection first.
+dispatcher = Dispatcher(common_fields={"table_id?": (int, str)}, max_message_size=MAX_MESSAGE_SIZE)
+
+# Handlers of the actions that change table state, {action: handler(table, data)}; they are journaled
+# (see journal.py) and replayed on startup
+TABLE_ACTIONS = {}
+
+def table_action(name, handler, **fields):
+    """Registers a state-changing action; handler(table, data) is also what journal replay calls."""
+    TABLE_ACTIONS[name] = handler
+
+    async def handle(conn, data):
+        await conn.table.executor.run(run_table_action, conn.table, data)
+
+    dispatcher.register(name, handle, options={"dealer_only": name != "player_choice"}, **fields)
+
+def client_action(name, handler, serialized=False, **fields):
+    """
+    Registers an action that only concerns the sending connection; handler(conn, data). Handlers that
+    read the table's state run on its executor (serialized=True); the others must not touch game_state.
+    """
+    async def handle(conn, data):
+        if serialized:
+            await conn.table.executor.run(handler, conn, data)
+        else:
+            await handler(conn, data)
+        await conn.table.executor.run(publish_state, conn.table)
+
+    dispatcher.register(name, handle, **fields)
+
+async def apply_table_action(table, data):
+    """Applies one of the TABLE_ACTIONS messages to table (from a client, or from the journal on startup)."""
+    await TABLE_ACTIONS[data["action"]](table, data)
+
+async def run_table_action(table, data):
+    """Applies, journals and publishes one TABLE_ACTIONS message; runs on the table's executor."""
+    async with journal.action(table.table_id, data):
+        await apply_table_action(table, data)
+    game_state = table.game_state
+    if data["action"] == "player_choice" and game_state.get("auto_play") and not game_state["round_active"]:
+        # The last choice finished the round: show it for the full pause from now on
+        schedule_auto_step(table, game_state["auto_round_delay"])
+    # Delta clients get whatever this action changed as one versioned update
+    await publish_state(table)
+
+async def apply_manual_deal_card(table, data):
+    game_state = table.game_state
+    await handle_manual_deal_card(table, data["target"], data["card"], data.get("player_id"))
+#new handle connection for manual evalatuation            elif action == "evaluate_round":
+    # Check that every active (added) player has a card assigned AND dealer has a card.
+    incomplete = [pid for pid, pdata in game_state["players"].items() if pdata.get("card") is None]
+    dealer_missing = game_state["dealer_card"] is None
+    if incomplete or dealer_missing:
+        missing_msg = ""
+        if incomplete:
+            missing_msg += f"Players {', '.join(incomplete)} have not been assigned a card. "
+        if dealer_missing:
+            missing_msg += "Dealer has not been assigned a card."
+        await broadcast_to_dealers(table, {
+            "action": "error",
+            "message": missing_msg.strip()
+        })
+    else:
+        await evaluate_round(table)
+
+WAR_TARGETS = {"player", "dealer"}
+
+table_action("shuffle_deck", lambda table, data: handle_shuffle_deck(table))
+table_action("burn_card", lambda table, data: handle_burn_card(table))
+table_action("add_player", lambda table, data: handle_add_player(table, data["player_id"]), player_id=str)
+table_action("remove_player", lambda table, data: handle_remove_player(table, data["player_id"]), player_id=str)
+table_action("deal_cards", lambda table, data: handle_deal_cards(table))
+table_action("reset_game", lambda table, data: handle_reset_game(table))
+table_action("change_bets", lambda table, data: handle_change_bets(table, data["min_bet"], data["max_bet"]),
+             min_bet=(int, float), max_bet=(int, float))
+table_action("undo_last_card", lambda table, data: handle_undo_last_card(table))
+table_action("add_card_manual", lambda table, data: handle_add_card_manual(table, data["card"]), card=str)
+table_action("player_choice",  # war or surrender
+             lambda table, data: handle_player_choice(table, data["player_id"], data["choice"]),
+             player_id=str, choice={"war", "surrender"})
+table_action("set_game_mode", lambda table, data: handle_set_game_mode(table, data["mode"]),
+             mode={"manual", "automatic", "live"})
+# table_action("live_card_scanned", lambda table, data: handle_live_card_scan(data["card"]), card=str)
+# table_action("live_war_card_scanned", lambda table, data: handle_live_war_card_scan(data["card"]), card=str)
+table_action("assign_war_card",
+             lambda table, data: handle_assign_war_card(table, data["target"], data["card"], data.get("player_id")),
+             target=WAR_TARGETS, card=str, **{"player_id?": str})
+table_action("evaluate_war_round", lambda table, data: evaluate_war_round(table))
+table_action("manual_deal_card", apply_manual_deal_card, target=WAR_TARGETS, card=str, **{"player_id?": str})
+table_action("start_auto_round", lambda table, data: handle_start_auto_round(table))
+table_action("clear_round", lambda table, data: handle_clear_round(table))
+table_action("start_auto_play",
+             lambda table, data: handle_start_auto_play(table, data.get("round_delay"), data.get("choice_delay")),
+             **{"round_delay?": (int, float), "choice_delay?": (int, float)})
+table_action("stop_auto_play", lambda table, data: handle_stop_auto_play(table))
+
+def subscribe_client(conn, data, role, view=None):
+    """Subscribes the connection to the topics it registered for (see subscriptions.py)."""
+    try:
+        if data.get("feed"):
+            # Frames instead of events, plus whatever topics it asked for explicitly
+            topics = parse_topics(data.get("topics", []), role) | {FEED}
+        else:
+            topics = parse_topics(data.get("topics"), role)
+    except ValueError as e:
+        raise Reject("invalid_fields", f"{data['action']}: {e}")
+    if FEED in topics and role != "display":
+        raise Reject("invalid_fields", f"{data['action']}: only displays can take the display feed")
+    conn.table.subscriptions.subscribe(conn.websocket, topics, view, role)
+    return sorted(topics)
+
+async def register_dealer(conn, data):
+    topics = subscribe_client(conn, data, "dealer")
+    conn.table.dealer_clients.add(conn.websocket)
+    send(conn.websocket, {"action": "dealer_registered", "topics": topics})
+
+async def register_display(conn, data):
+    topics = subscribe_client(conn, data, "display")
+    send(conn.websocket, {"action": "display_registered", "topics": topics})
+    if FEED in topics:
+        # Its first frame
+        client_queue(conn.websocket).push(state_payload(conn.table, codec=conn.codec), "game_state_update")
+
+async def register_player(conn, data):
+    player_id = data["player_id"]
+    table = conn.table
+    # A tablet may seat several players; its view covers all of them
+    view = table.subscriptions.get(conn.websocket)[1]
+    view = (view or frozenset()) | {player_id} if data.get("view", True) else None
+    topics = subscribe_client(conn, data, "player", view)
+    table.player_clients[player_id] = conn.websocket
+    player_stats = await get_player_stats_simple(player_id)
+    send(conn.websocket, {
+        "action": "player_registered",
+        "player_id": player_id,
+        "stats": player_stats,
+        "topics": topics
+    })
+
+async def subscribe_deltas(conn, data):
+    # Switch this client from full game_state_update snapshots to versioned state_delta messages
+    await publish_state(conn.table)
+    conn.table.delta_clients.add(conn.websocket)
+    await send_state_snapshot(conn.websocket, conn.table)
+
+async def send_all_player_stats(conn, data):
+    send(conn.websocket, {
+        "action": "all_player_stats",
+        "stats": await get_all_player_stats(conn.table)
+    })
+
+async def change_table(conn, data):
+    conn.table = await handle_change_table(conn.websocket, conn.table, data["table_number"],
+                                           open_table=conn.websocket in conn.table.dealer_clients)
+
+async def send_shoe_status(conn, data):
+    send(conn.websocket, {"action": "shoe_status", "devices": shoe_service.status()})
+
+client_action("register_dealer", register_dealer, **{"topics?": list})
+client_action("register_display", register_display, **{"topics?": list, "feed?": bool})
+client_action("register_player", register_player, player_id=str, **{"topics?": list, "view?": bool})
+client_action("subscribe_deltas", subscribe_deltas, serialized=True)
+client_action("request_snapshot", lambda conn, data: send_state_snapshot(conn.websocket, conn.table), serialized=True)
+client_action("get_shoe_status", send_shoe_status)
+client_action("get_all_player_stats", send_all_player_stats)
+client_action("change_table", change_table, table_number=(int, str))
+
+async def route_to_table(conn, spec, data):
+    # Route messages by table id; a connection follows the table it talks to. Dealers (and a dealer
+    # registering there) may open the table.
+    if "table_id" in data:
+        dealer = spec.name == "register_dealer" or conn.websocket in conn.table.dealer_clients
+        conn.table = await move_client(conn.websocket, conn.table, data["table_id"], open_table=dealer)
+
+async def require_dealer(conn, spec, data):
+    """Authorization: table actions other than player choices only from a registered dealer."""
+    if spec.options.get("dealer_only") and conn.websocket not in conn.table.dealer_clients:
+        raise Reject("not_dealer", f"{spec.name}: only a registered dealer may do this")
+
+dispatcher.before.append(route_to_table)
+if REQUIRE_DEALER_REGISTRATION:
+    dispatcher.before.append(require_dealer)
+
+ACTION_SECONDS = metrics.Histogram("casino_war_action_seconds",
+                                   "Time to handle one websocket message, including publishing its state change",
+                                   labels=("action",))
+dispatcher.after.append(lambda conn, action, seconds, rejected: ACTION_SECONDS.observe(seconds, action))
+
+def count_clients():
+    """Connected clients per role across all tables, for the metrics endpoint."""
+    counts = {("all",): 0, ("dealer",): 0, ("player",): 0, ("display",): 0, ("feed",): 0, ("delta",): 0}
+    for table in table_manager:
+        counts[("all",)] += len(table.connected_clients)
+        counts[("dealer",)] += len(table.dealer_clients)
+        counts[("player",)] += len(table.player_clients)
+        counts[("display",)] += table.subscriptions.count("display")
+        counts[("feed",)] += len(table.subscriptions.full[FEED])
+        counts[("delta",)] += len(table.delta_clients)
+    return counts
+
+metrics.Gauge("casino_war_clients", "Connected websocket clients by role", count_clients, labels=("role",))
+metrics.Gauge("casino_war_tables", "Tables in memory", lambda: len(table_manager))
+metrics.Gauge("casino_war_sessions", "Resumable sessions, connected or recently dropped", lambda: len(sessions))
+metrics.Gauge("casino_war_results_pending", "Round results waiting to be written", lambda: result_writer.pending())
+metrics.Gauge("casino_war_log_records_dropped", "Log records dropped because the log writer fell behind", log.dropped)
+
+def send_session(websocket, table, token, resumed, snapshot):
+    send(websocket, {
+        "action": "session",
+        "token": token,
+        "event_seq": table.events.seq,
+        "resumed": resumed,
+        "snapshot": snapshot,
+        "codec": codec_of(websocket)
+    })
+
+async def welcome_client(websocket, table, token):
+    """A new connection's first messages: the table state and its session token."""
+    await send_game_state(websocket, table)
+    send_session(websocket, table, token, resumed=False, snapshot=True)
+
+def replay_payload(table, seq, payload, view, codec):
+    """
+    A logged event (JSON, unfiltered) as a resumed client gets it: in its codec, and its player view if it
+    has one. Kept in table.replay_cache, so clients resuming together share the work.
+    """
+    if view is None and codec == JSON:
+        return payload
+    key = (seq, view, codec)
+    replayed = table.replay_cache.get(key)
+    if replayed is None:
+        if view is None:
+            replayed = transcode(payload, codec)
+        else:
+            message = decode_message(payload)
+            if message["action"] == "state_delta":
+                message = delta_view(message, view)
+            elif has_seats(message):
+                message = player_view(message, view)
+            replayed = encode_message(message, codec)
+        if len(table.replay_cache) >= REPLAY_CACHE_SIZE:
+            table.replay_cache.clear()  # events past this are rarely asked for again
+        table.replay_cache[key] = replayed
+    return replayed
+
+async def resume_client(websocket, table, token, registrations, seq):
+    """Reattaches a resumed session's connection and sends it what it missed (see sessions.py)."""
+    register_client(table, websocket, registrations)
+    dealer, player_ids, deltas, (topics, view, _) = registrations
+    audiences = set(topics) | ({"dealers"} if dealer else set()) | ({"delta"} if deltas else set())
+    if "state" in topics and not deltas:
+        audiences.add("snapshot")
+    # Feed displays only ever get the latest state
+    missed = table.events.since(seq, audiences) if seq is not None and FEED not in topics else None
+    if missed is not None and sum(len(payload) for _, payload in missed) > len(state_payload(table)):
+        missed = None  # a long gap: the state it leads to is cheaper to send than the events
+    if missed is None:
+        SESSION_RESUMES.inc("snapshot")
+        await send_game_state(websocket, table)
+    else:
+        SESSION_RESUMES.inc("replayed")
+        EVENTS_REPLAYED.inc(amount=len(missed))
+        queue = client_queue(websocket)
+        codec = codec_of(websocket)
+        for event_seq, payload in missed:
+            queue.push(replay_payload(table, event_seq, payload, view, codec))
+    send_session(websocket, table, token, resumed=True, snapshot=missed is None)
+
+async def handle_connection(websocket, path=None):
+    """Handles new client connections, and reconnects that resume a session (see sessions.py)."""
+    query = get_connection_query(websocket, path)
+    codec = negotiate(query.get("codec"))  # ?codec=msgpack (see codec.py)
+    set_codec(websocket, codec)
+    conn = Connection(websocket, rate=MESSAGE_RATE_LIMIT, burst=MESSAGE_BURST, codec=codec)
+    session, previous = sessions.claim(query["resume"], conn) if "resume" in query else (None, None)
+    if session is None:
+        if "resume" in query:
+            SESSION_RESUMES.inc("unknown")
+        try:
+            table = table_manager.get_table(query.get("table"))
+            reason = f"Table {query.get('table')} is not open"
+        except ValueError as e:
+            table, reason = None, str(e)
+        if table is None:
+            detach(websocket)
+            await websocket.close(code=TABLE_NOT_OPEN_CLOSE_CODE, reason=reason)
+            return
+        conn.table = table
+        table.add_client(websocket)
+        session = sessions.create(conn)
+        client_log.info("Client connected", extra={"address": websocket.remote_address, "table": table.table_id,
+                                                   "codec": codec})
+        await table.executor.run(welcome_client, websocket, table, session.token)
+    else:
+        if previous is not None:
+            # The old connection has not noticed the drop yet: take its place
+            table = previous.table
+            registrations = client_registrations(table, previous.websocket)
+            table.remove_client(previous.websocket)
+            detach(previous.websocket)
+            asyncio.create_task(previous.websocket.close(code=SESSION_TAKEN_OVER_CLOSE_CODE, reason="session resumed"))
+        else:
+            table = table_manager.open_table(session.table_id)  # it was open when the session dropped
+            registrations = session.registrations
+        conn.table = table
+        try:
+            seq = int(query["seq"])
+        except (KeyError, ValueError):
+            seq = None
+        client_log.info("Client resumed", extra={"address": websocket.remote_address, "table": table.table_id, "seq": seq})
+        await table.executor.run(resume_client, websocket, table, session.token, registrations, seq)
 
     try:
         async for message in websocket:
-            data = json.loads(message)
-            print(f"Received: {data}")
-              # Route messages based on action
-            if data["action"] == "register_dealer":
-                dealer_clients.add(websocket)
-                await websocket.send(json.dumps({"action": "dealer_registered"}))
-                
-            elif data["action"] == "register_player":
-                player_id = data["player_id"]
-                player_clients[player_id] = websocket
-                player_stats = await get_player_stats_simple(player_id)
-                await websocket.send(json.dumps({
-                    "action": "player_registered",
-                    "player_id": player_id,
-                    "stats": player_stats
-                }))
-                
-            elif data["action"] == "shuffle_deck":
-                await handle_shuffle_deck()
-                
-            elif data["action"] == "burn_card":
-                await handle_burn_card()
-                
-            elif data["action"] == "add_player":
-                await handle_add_player(data["player_id"])
-                
-            elif data["action"] == "remove_player":
-                await handle_remove_player(data["player_id"])
-                
-            elif data["action"] == "deal_cards":
-                await handle_deal_cards()
-                
-            elif data["action"] == "reset_game":
-                await handle_reset_game()
-                
-            elif data["action"] == "change_bets":
-                await handle_change_bets(data["min_bet"], data["max_bet"])
-                
-            elif data["action"] == "change_table":
-                await handle_change_table(data["table_number"])
-                
-            elif data["action"] == "undo_last_card":
-                await handle_undo_last_card()
-                
-            elif data["action"] == "add_card_manual":
-                await handle_add_card_manual(data["card"])
-                
-            elif data["action"] == "player_choice":
-                await handle_player_choice(data["player_id"], data["choice"])  # war or surrender
-                
-            elif data["action"] == "set_game_mode":
-                await handle_set_game_mode(data["mode"])
-                
-            # elif data["action"] == "live_card_scanned":
-            #     await handle_live_card_scan(data["card"])
-
-            # elif data["action"] == "live_war_card_scanned": 
-            #     await handle_live_war_card_scan(data["card"])
-            
-            elif data["action"] == "assign_war_card":
-                await handle_assign_war_card(data["target"], data["card"], data.get("player_id"))
-            elif data["action"] == "evaluate_war_round":
-                await evaluate_war_round()
-                
-            elif data["action"] == "manual_deal_card":
-                await handle_manual_deal_card(data["target"], data["card"], data.get("player_id"))
-#new handle connection for manual evalatuation            elif data["action"] == "evaluate_round":
-                # Check that every active (added) player has a card assigned AND dealer has a card.
-                incomplete = [pid for pid, pdata in game_state["players"].items() if pdata.get("card") is None]
-                dealer_missing = game_state["dealer_card"] is None
-                if incomplete or dealer_missing:
-                    missing_msg = ""
-                    if incomplete:
-                        missing_msg += f"Players {', '.join(incomplete)} have not been assigned a card. "
-                    if dealer_missing:
-                        missing_msg += "Dealer has not been assigned a card."
-                    await broadcast_to_dealers({
-                        "action": "error",
-                        "message": missing_msg.strip()
-                    })
-                else:
-                    await evaluate_round()
-            elif data["action"] == "start_auto_round":
-                await handle_start_auto_round()
-            elif data["action"] == "clear_round":
-                await handle_clear_round()
+            message_log.debug("Received", extra={"table": conn.table.table_id, "payload": message})
+            await dispatcher.dispatch(conn, message)
                 
     except websockets.ConnectionClosed:
-        print(f"Client disconnected: {websocket.remote_address}")
+        client_log.info("Client disconnected", extra={"address": websocket.remote_address, "table": conn.table.table_id})
     finally:
-        connected_clients.remove(websocket)
-        if websocket in dealer_clients:
-            dealer_clients.remove(websocket)
-        # Remove from player clients if exists
-        for player_id, client in list(player_clients.items()):
-            if client == websocket:
-                del player_clients[player_id]
-                break
+        sessions.detach(session, conn, conn.table.table_id, client_registrations(conn.table, websocket))
+        conn.table.remove_client(websocket)
+        detach(websocket)
 
-async def handle_shuffle_deck():
+async def handle_shuffle_deck(table):
     """Shuffles the deck."""
-    game_state["deck"] = create_deck()
+    game_state = table.game_state
+    game_state["deck"] = create_deck(table)
     game_state["burned_cards"] = []
     
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "deck_shuffled",
         "deck_count": len(game_state["deck"]),
         "burned_cards_count": len(game_state["burned_cards"])
     })
 
-async def handle_burn_card():
+async def handle_burn_card(table):
     """Burns the top card from the deck."""
+    game_state = table.game_state
     if not game_state["deck"]:
-        await broadcast_to_dealers({"action": "error", "message": "No cards left to burn"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No cards left to burn"})
         return
     
-    burned_card = game_state["deck"].pop(0)
+    burned_card = game_state["deck"].draw()
     game_state["burned_cards"].append(burned_card)
     
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "card_burned",
         "burned_card": burned_card,
         "deck_count": len(game_state["deck"]),
         "burned_cards_count": len(game_state["burned_cards"])
     })
 
-async def handle_add_player(player_id):
+async def handle_add_player(table, player_id):
     """Adds a new player to the game."""
+    game_state = table.game_state
     if len(game_state["players"]) >= 6:
-        await broadcast_to_dealers({"action": "error", "message": "Maximum 6 players allowed"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Maximum 6 players allowed"})
         return
     
     game_state["players"][player_id] = {
@@ -318,47 +831,50 @@ async def handle_add_player(player_id):
         "war_card": None
     }
     
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "player_added",
         "player_id": player_id,
         "players": game_state["players"]
     })
 
-async def handle_remove_player(player_id):
+async def handle_remove_player(table, player_id):
     """Removes a player from the game."""
+    game_state = table.game_state
     if player_id in game_state["players"]:
         del game_state["players"][player_id]
         
         if player_id in game_state["player_results"]:
             del game_state["player_results"][player_id]
     
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "player_removed",
         "player_id": player_id,
         "players": game_state["players"],
         "player_results": game_state["player_results"]
     })
 
-async def handle_deal_cards():
+async def handle_deal_cards(table):
     """Deals one card to each player and dealer."""
+    game_state = table.game_state
     # Only allow manual dealing in manual mode
     if game_state["game_mode"] != "manual":
-        await broadcast_to_dealers({
+        await broadcast_to_dealers(table, {
             "action": "error", 
             "message": f"Cannot manually deal cards in {game_state['game_mode']} mode"
         })
         return
     
-    await deal_cards_internal()
+    await deal_cards_internal(table)
 
-async def deal_cards_internal(increment_round=True):
+async def deal_cards_internal(table, increment_round=True):
     """Internal function to deal cards (used by all modes)."""
+    game_state = table.game_state
     if not game_state["deck"]:
-        await broadcast_to_dealers({"action": "error", "message": "No cards left in deck"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No cards left in deck"})
         return False
     
     if len(game_state["deck"]) < len(game_state["players"]) + 1:
-        await broadcast_to_dealers({"action": "error", "message": "Not enough cards for all players and dealer"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Not enough cards for all players and dealer"})
         return False
     
     if increment_round:
@@ -368,7 +884,7 @@ async def deal_cards_internal(increment_round=True):
     # Deal cards to players
     for player_id in game_state["players"]:
         if game_state["deck"]:
-            card = game_state["deck"].pop(0)
+            card = game_state["deck"].draw()
             game_state["players"][player_id]["card"] = card
             game_state["players"][player_id]["status"] = "active"
             game_state["players"][player_id]["result"] = None
@@ -377,16 +893,17 @@ async def deal_cards_internal(increment_round=True):
             game_state.setdefault("assignment_order", []).append({"player_id": player_id, "card": card, "type": "player"})
     # Deal card to dealer
     if game_state["deck"]:
-        game_state["dealer_card"] = game_state["deck"].pop(0)
+        game_state["dealer_card"] = game_state["deck"].draw()
         # Track the card assignment order
         game_state["assignment_order"].append({"card": game_state["dealer_card"], "type": "dealer"})
     
     # Evaluate results
-    await evaluate_round()
+    await evaluate_round(table)
     return True
 
-async def evaluate_round():
+async def evaluate_round(table):
     """Evaluates the round results and handles ties."""
+    game_state = table.game_state
     tie_players = []
     for player_id, player_data in game_state["players"].items():
         player_card = player_data["card"]
@@ -398,7 +915,7 @@ async def evaluate_round():
             player_data["result"] = result
             player_data["status"] = "finished"
             game_state["player_results"][player_id] = result
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "round_dealt",
         "round_number": game_state["round_number"],
         "dealer_card": game_state["dealer_card"],
@@ -410,14 +927,20 @@ async def evaluate_round():
     # In automatic mode, do NOT auto-surrender ties. Wait for manual choice.
     # If no ties, round is complete
     if not tie_players:
-        await complete_round()
+        await complete_round(table)
 
-async def handle_player_choice(player_id, choice):
+async def handle_player_choice(table, player_id, choice):
     """Handles player's choice for war or surrender."""
+    game_state = table.game_state
     if player_id not in game_state["players"]:
         return
     
     player = game_state["players"][player_id]
+    if player["status"] != "waiting_choice":
+        # Already decided, or the round moved on (a second screen's stale click); applying it would
+        # finish the round again
+        await broadcast_to_dealers(table, {"action": "error", "message": f"Player {player_id} has no choice to make"})
+        return
     
     if choice == "surrender":
         player["result"] = "surrender"
@@ -428,7 +951,7 @@ async def handle_player_choice(player_id, choice):
         # Do NOT set player["card"] = None; keep original card for UI
         # player["card"] remains as the original card
         # war_card will be set later
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "player_choice_made",
         "player_id": player_id,
         "choice": choice,
@@ -437,7 +960,7 @@ async def handle_player_choice(player_id, choice):
         "deck_count": len(game_state["deck"])
     })
     # NEW: Always broadcast full game state update so dealer sees status change
-    await broadcast_game_state_update()
+    await broadcast_game_state_update(table)
     # In all modes, as soon as all non-war players have finished, proceed automatically
     all_non_war_finished = all(
         p["status"] != "waiting_choice" for p in game_state["players"].values() if p["status"] != "war"
@@ -447,14 +970,15 @@ async def handle_player_choice(player_id, choice):
         if war_players:
             if game_state["game_mode"] == "automatic":
                 # In automatic mode, assign war cards and evaluate automatically
-                await assign_and_evaluate_war_round(war_players)
+                await assign_and_evaluate_war_round(table, war_players)
             else:
-                await start_war_round(war_players)
+                await start_war_round(table, war_players)
         else:
-            await complete_round()
+            await complete_round(table)
 
-async def start_war_round(war_players):
+async def start_war_round(table, war_players):
     """Starts a war round for the given players."""
+    game_state = table.game_state
     game_state["war_round_active"] = True
     game_state["war_round"] = {
         "dealer_card": None,
@@ -464,23 +988,24 @@ async def start_war_round(war_players):
             "players": {pid: game_state["players"][pid]["card"] for pid in game_state["players"]}
         }
     }
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "war_round_started",
         "players": war_players,
         "war_round": game_state["war_round"]
     })
 
-async def assign_and_evaluate_war_round(war_players):
+async def assign_and_evaluate_war_round(table, war_players):
     """Automatically assign war cards to dealer and war players, then evaluate only new cards for war participants."""
+    game_state = table.game_state
     # Assign war cards to all war players
     for player_id in war_players:
         if game_state["deck"]:
-            card = game_state["deck"].pop(0)
+            card = game_state["deck"].draw()
             game_state["players"][player_id]["war_card"] = card
     # Assign new war card to dealer
     dealer_war_card = None
     if game_state["deck"]:
-        dealer_war_card = game_state["deck"].pop(0)
+        dealer_war_card = game_state["deck"].draw()
     # Prepare war_round structure for evaluation (only war players)
     war_round = {
         "dealer_card": dealer_war_card,
@@ -497,9 +1022,10 @@ async def assign_and_evaluate_war_round(war_players):
         }
     }
     # Evaluate war round (only war players)
-    await evaluate_war_round_auto(war_round, war_players)
+    await evaluate_war_round_auto(table, war_round, war_players)
 
-async def evaluate_war_round_auto(war_round, war_players):
+async def evaluate_war_round_auto(table, war_round, war_players):
+    game_state = table.game_state
     dealer_war_card = war_round["dealer_card"]
     war_players_cards = war_round["players"]
     # Evaluate results for players in war round (only war players)
@@ -512,7 +1038,7 @@ async def evaluate_war_round_auto(war_round, war_players):
         game_state["player_results"][player_id] = result
     # Ensure that only war players' results are updated; others remain unchanged
     # Broadcast war round evaluated (only war players updated, others remain for UI)
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "war_round_evaluated",
         "dealer_card": dealer_war_card,
         "players": { pid: game_state["players"][pid] for pid in war_players },
@@ -522,16 +1048,17 @@ async def evaluate_war_round_auto(war_round, war_players):
     # Complete round if all finished
     all_finished = all(p["status"] == "finished" for p in game_state["players"].values())
     if all_finished:
-        await complete_round()
+        await complete_round(table)
 
-async def handle_assign_war_card(target, card, player_id=None):
+async def handle_assign_war_card(table, target, card, player_id=None):
     """Assigns a war card to a player or dealer during a war round."""
+    game_state = table.game_state
     war = game_state.get("war_round")
     if not war or not game_state.get("war_round_active"):
-        await broadcast_to_dealers({"action": "error", "message": "No active war round."})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No active war round."})
         return
     if card not in game_state["deck"]:
-        await broadcast_to_dealers({"action": "error", "message": f"Card {card} not available in deck."})
+        await broadcast_to_dealers(table, {"action": "error", "message": f"Card {card} not available in deck."})
         return
     game_state["deck"].remove(card)
     if target == "dealer":
@@ -539,26 +1066,27 @@ async def handle_assign_war_card(target, card, player_id=None):
     elif target == "player" and player_id:
         war["players"][player_id] = card
     else:
-        await broadcast_to_dealers({"action": "error", "message": "Invalid war card assignment target."})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Invalid war card assignment target."})
         return
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "war_card_assigned",
         "target": target,
         "card": card,
         "player_id": player_id
     })
 
-async def evaluate_war_round():
+async def evaluate_war_round(table):
     """Evaluates the war round using assigned war cards."""
+    game_state = table.game_state
     war = game_state.get("war_round")
     if not war or not game_state.get("war_round_active"):
-        await broadcast_to_dealers({"action": "error", "message": "No active war round to evaluate."})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No active war round to evaluate."})
         return
     dealer_card = war.get("dealer_card")
     player_cards = war.get("players", {})
     # PATCH: Check for missing war cards (None) after undo
     if not dealer_card or any(card is None for card in player_cards.values()):
-        await broadcast_to_dealers({"action": "error", "message": "Not all war cards assigned."})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Not all war cards assigned."})
         return
     # Evaluate results for each war player
     for pid, card in player_cards.items():
@@ -576,7 +1104,7 @@ async def evaluate_war_round():
         "original_cards": original_cards  # Always preserve
     }
     # Broadcast war round evaluated
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "war_round_evaluated",
         "dealer_card": dealer_card,
         "players": {pid: game_state["players"][pid] for pid in player_cards},
@@ -587,16 +1115,18 @@ async def evaluate_war_round():
     # Complete round if all finished
     all_finished = all(p["status"] == "finished" for p in game_state["players"].values())
     if all_finished:
-        await complete_round()
+        await complete_round(table)
 
 # PATCH: In complete_round, do not overwrite results for players who already have a result
-async def complete_round():
+async def complete_round(table):
     """Completes the current round and saves results."""
+    game_state = table.game_state
     game_state["round_active"] = False
-    # Save results to MONGODB
+    # Save results to MONGODB (write-behind: the broadcast below does not wait for the insert)
+    result_records = []
     for player_id, player_data in game_state["players"].items():
         if player_data["result"]:
-            result_record = {
+            result_records.append({
                 "round_number": game_state["round_number"],
                 "player_id": player_id,
                 "player_card": player_data["card"],
@@ -608,38 +1138,37 @@ async def complete_round():
                 "min_bet": game_state["min_bet"],
                 "max_bet": game_state["max_bet"],
                 "game_mode": game_state["game_mode"]
-            }
-            try:
-                print(f"[MONGODB] Attempting to insert: {result_record}")
-                insert_result = await results_collection.insert_one(result_record)
-                print(f"[MONGODB] Inserted document with _id: {insert_result.inserted_id}")
-            except Exception as e:
-                print(f"[MONGODB ERROR] Failed to insert result for player {player_id}: {e}")
-    # Only update session stats for players whose result was just finalized
-    await update_session_stats(game_state["player_results"])
-    await broadcast_to_all({
+            })
+    # Only update session stats for players whose result was just finalized (player_results also keeps
+    # the last result of players whose card was undone)
+    finalized = {record["player_id"]: record["result"] for record in result_records}
+    if not journal.replaying:  # replayed rounds were stored when they were first played
+        await result_writer.submit(result_records)
+    await update_session_stats(table, finalized)
+    await broadcast_to_all(table, {
         "action": "round_completed",
         "round_number": game_state["round_number"],
         "player_results": dict(game_state["player_results"]),
-        "stats": dict(session_stats)  # Always include updated session stats
+        "stats": dict(table.session_stats)  # Always include updated session stats
     })
     
-async def handle_start_auto_round():
+async def handle_start_auto_round(table):
     """Starts an automatic round: burns one card first, then assigns cards to all players and evaluates the round, but only if all players and dealer have no cards assigned. Does NOT increment round number."""
+    game_state = table.game_state
     if game_state["game_mode"] != "automatic":
-        await broadcast_to_dealers({"action": "error", "message": "Not in automatic mode"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Not in automatic mode"})
         return
     if game_state["round_active"]:
-        await broadcast_to_dealers({"action": "error", "message": "Round already active"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Round already active"})
         return
     if not game_state["players"]:
-        await broadcast_to_dealers({"action": "error", "message": "No players to start round"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No players to start round"})
         return
     # Only allow if all players and dealer have no cards assigned
     players_have_cards = any(p["card"] is not None for p in game_state["players"].values())
     dealer_has_card = game_state["dealer_card"] is not None
     if players_have_cards or dealer_has_card:
-        await broadcast_to_dealers({
+        await broadcast_to_dealers(table, {
             "action": "error",
             "message": "Cannot start: Some players or dealer already have cards assigned. Use 'NEW GAME' to reset first."
         })
@@ -647,16 +1176,16 @@ async def handle_start_auto_round():
     # Check if we have enough cards (1 burn + 1 per player + 1 dealer)
     needed_cards = 1 + len(game_state["players"]) + 1
     if len(game_state["deck"]) < needed_cards:
-        await broadcast_to_dealers({
+        await broadcast_to_dealers(table, {
             "action": "error", 
             "message": f"Not enough cards in deck. Need {needed_cards} cards (1 burn + {len(game_state['players'])} players + 1 dealer), but only {len(game_state['deck'])} available."
         })
         return
     # Burn one card first (the first card in automatic mode)
     if game_state["deck"]:
-        burned_card = game_state["deck"].pop(0)
+        burned_card = game_state["deck"].draw()
         game_state["burned_cards"].append(burned_card)
-        await broadcast_to_all({
+        await broadcast_to_all(table, {
             "action": "card_burned",
             "burned_card": burned_card,
             "deck_count": len(game_state["deck"]),
@@ -664,38 +1193,40 @@ async def handle_start_auto_round():
             "message": f"Card {burned_card} burned before automatic deal"
         })
     # Now assign cards and evaluate (do NOT increment round number)
-    await deal_cards_internal(increment_round=False)
+    await deal_cards_internal(table, increment_round=False)
 
 # Patch deal_cards_internal to allow skipping round number increment
-async def deal_cards_internal(increment_round=True):
+async def deal_cards_internal(table, increment_round=True):
     """Internal function to deal cards (used by all modes)."""
+    game_state = table.game_state
     if not game_state["deck"]:
-        await broadcast_to_dealers({"action": "error", "message": "No cards left in deck"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No cards left in deck"})
         return False
     if len(game_state["deck"]) < len(game_state["players"]) + 1:
-        await broadcast_to_dealers({"action": "error", "message": "Not enough cards for all players and dealer"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Not enough cards for all players and dealer"})
         return False
     if increment_round:
         game_state["round_number"] += 1
     game_state["round_active"] = True
     for player_id in game_state["players"]:
         if game_state["deck"]:
-            card = game_state["deck"].pop(0)
+            card = game_state["deck"].draw()
             game_state["players"][player_id]["card"] = card
             game_state["players"][player_id]["status"] = "active"
             game_state["players"][player_id]["result"] = None
             game_state["players"][player_id]["war_card"] = None
             game_state.setdefault("assignment_order", []).append({"player_id": player_id, "card": card, "type": "player"})
     if game_state["deck"]:
-        game_state["dealer_card"] = game_state["deck"].pop(0)
+        game_state["dealer_card"] = game_state["deck"].draw()
         game_state["assignment_order"].append({"card": game_state["dealer_card"], "type": "dealer"})
-    await evaluate_round()
+    await evaluate_round(table)
     return True
 
-async def handle_clear_round():
+async def handle_clear_round(table):
     """Resets the round for the next auto round, keeps players but clears cards/statuses/results, and increments round number."""
+    game_state = table.game_state
     if game_state["game_mode"] != "automatic" and game_state["game_mode"] != "live":
-        await broadcast_to_dealers({"action": "error", "message": "Not in automatic or live mode"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Not in automatic or live mode"})
         return
     # Always allow reset, regardless of round_active or player statuses
     for player in game_state["players"].values():
@@ -709,27 +1240,88 @@ async def handle_clear_round():
     game_state["round_active"] = False
     game_state["round_number"] = max(1, game_state["round_number"] + 1)  # Never below 1
     game_state["shoe_first_card_burned"] = False  # Reset shoe reader flag
-    await broadcast_to_all({
-        "action": "game_state_update",
-        "game_state": {
-            "deck_count": len(game_state["deck"]),
-            "burned_cards_count": len(game_state["burned_cards"]),
-            "dealer_card": game_state["dealer_card"],
-            "players": game_state["players"],
-            "round_active": game_state["round_active"],
-            "round_number": game_state["round_number"],
-            "game_mode": game_state["game_mode"],
-            "table_number": game_state["table_number"],
-            "min_bet": game_state["min_bet"],
-            "max_bet": game_state["max_bet"],
-            "player_results": game_state["player_results"]
-        }
+    await broadcast_game_state_update(table)
+
+# --- AUTOMATIC PLAY ---
+# With auto_play on, an automatic table runs itself: burn and deal, give tied players auto_choice_delay
+# seconds to choose (then surrender them), show the result for auto_round_delay seconds, clear, deal
+# again. Every step is an ordinary journaled table action on the table's executor; the waiting is done
+# by one timer wheel for all tables (see scheduler.py).
+auto_timers = TimerWheel(tick=TIMER_TICK)
+
+async def handle_start_auto_play(table, round_delay=None, choice_delay=None):
+    """Starts automatic play, optionally with new delays (seconds)."""
+    game_state = table.game_state
+    if game_state["game_mode"] != "automatic":
+        await broadcast_to_dealers(table, {"action": "error", "message": "Not in automatic mode"})
+        return
+    if round_delay is not None:
+        game_state["auto_round_delay"] = max(0, round_delay)
+    if choice_delay is not None:
+        game_state["auto_choice_delay"] = max(0, choice_delay)
+    game_state["auto_play"] = True
+    schedule_auto_step(table, 0)
+    await broadcast_to_all(table, {
+        "action": "auto_play_changed",
+        "auto_play": True,
+        "auto_round_delay": game_state["auto_round_delay"],
+        "auto_choice_delay": game_state["auto_choice_delay"]
     })
 
-async def handle_reset_game():
+async def handle_stop_auto_play(table):
+    """Stops automatic play; the current round stays as it is."""
+    stop_auto_play(table)
+    await broadcast_to_all(table, {"action": "auto_play_changed", "auto_play": False})
+
+def stop_auto_play(table):
+    game_state = table.game_state
+    game_state["auto_play"] = False
+    if game_state.get("auto_task"):
+        game_state["auto_task"].cancel()
+        game_state["auto_task"] = None
+
+def schedule_auto_step(table, delay):
+    """Arms the table's next automatic step, replacing a pending one (not while replaying the journal)."""
+    if journal.replaying:
+        return
+    game_state = table.game_state
+    if game_state.get("auto_task"):
+        game_state["auto_task"].cancel()
+    game_state["auto_task"] = auto_timers.call_later(delay, table.executor.submit, auto_step, table)
+
+async def auto_step(table):
+    """The next step of automatic play; runs on the table's executor when the table's timer fires."""
+    game_state = table.game_state
+    game_state["auto_task"] = None
+    if not game_state.get("auto_play") or game_state["game_mode"] != "automatic":
+        return
+    waiting = [pid for pid, player in game_state["players"].items() if player["status"] == "waiting_choice"]
+    if game_state["round_active"] and waiting:
+        # The choice deadline passed
+        for player_id in waiting:
+            await run_table_action(table, {"action": "player_choice", "player_id": player_id, "choice": "surrender"})
+    elif game_state["players"]:
+        if game_state["round_active"] or game_state["dealer_card"] is not None:
+            await run_table_action(table, {"action": "clear_round"})
+        # Room for the burn card, a card each, the dealer's, and a war for everyone
+        if len(game_state["deck"]) < 2 * (len(game_state["players"]) + 2):
+            await run_table_action(table, {"action": "shuffle_deck"})
+        await run_table_action(table, {"action": "start_auto_round"})
+    choosing = any(player["status"] == "waiting_choice" for player in game_state["players"].values())
+    schedule_auto_step(table, game_state["auto_choice_delay"] if game_state["round_active"] and choosing
+                       else game_state["auto_round_delay"])
+
+def resume_auto_play():
+    """Restarts automatic play on the tables that had it on before a restart."""
+    for table in table_manager:
+        if table.game_state.get("auto_play"):
+            schedule_auto_step(table, table.game_state["auto_round_delay"])
+
+async def handle_reset_game(table):
     """Resets the entire game state, deck, and session stats."""
+    game_state = table.game_state
     game_state.update({
-        "deck": create_deck(),  # Always reset to 312 cards
+        "deck": create_deck(table),  # Always reset to 312 cards
         "burned_cards": [],
         "dealer_card": None,
         "players": {},
@@ -744,41 +1336,45 @@ async def handle_reset_game():
         "shoe_first_card_burned": False,  # Reset shoe reader flag
     })
     # Clear session stats as well
-    session_stats.clear()
-    await broadcast_to_all({
+    table.session_stats.clear()
+    table.stats_version += 1
+    await broadcast_to_all(table, {
         "action": "game_reset",
-        "game_state": game_state,
-        "stats": dict(session_stats)  # Send cleared stats to all clients
+        "game_state": build_state_view(table),
+        "stats": dict(table.session_stats)  # Send cleared stats to all clients
     })
 
-async def handle_change_bets(min_bet, max_bet):
+async def handle_change_bets(table, min_bet, max_bet):
     """Changes the betting limits."""
+    game_state = table.game_state
     game_state["min_bet"] = min_bet
     game_state["max_bet"] = max_bet
     
-    await broadcast_to_all({
+    await broadcast_to_all(table, {
         "action": "bets_changed",
         "min_bet": min_bet,
         "max_bet": max_bet
     })
 
-async def handle_change_table(table_number):
-    """Changes the table number."""
-    game_state["table_number"] = table_number
+async def handle_change_table(websocket, table, table_number, open_table=False):
+    """Switches the client over to another table (each table number is its own table)."""
+    table = await move_client(websocket, table, table_number, open_table)
     
-    await broadcast_to_all({
+    send(websocket, {
         "action": "table_changed",
-        "table_number": table_number
+        "table_number": table.game_state["table_number"]
     })
+    return table
 
-async def handle_undo_last_card():
+async def handle_undo_last_card(table):
     """Undoes the last dealt card (dealer or any player), based on true assignment order. Now also supports war round assignments."""
+    game_state = table.game_state
     if "assignment_order" not in game_state:
-        await broadcast_to_dealers({"action": "error", "message": "No assignment order to undo."})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No assignment order to undo."})
         return
 
     if not game_state["assignment_order"]:
-        await broadcast_to_dealers({"action": "error", "message": "No assignments to undo."})
+        await broadcast_to_dealers(table, {"action": "error", "message": "No assignments to undo."})
         return
 
     last = game_state["assignment_order"].pop()
@@ -795,20 +1391,20 @@ async def handle_undo_last_card():
         # Undo war round assignment
         war = game_state.get("war_round")
         if not war:
-            await broadcast_to_dealers({"action": "error", "message": "No active war round to undo."})
+            await broadcast_to_dealers(table, {"action": "error", "message": "No active war round to undo."})
             return
         if last_type == "dealer":
             last_card = war.get("dealer_card")
             if last_card:
                 war["dealer_card"] = None
-                game_state["deck"].insert(0, last_card)
+                game_state["deck"].put_back(last_card)
         elif last_type == "player" and last_player_id:
             last_card = war["players"].get(last_player_id)
             if last_card:
                 war["players"][last_player_id] = None
-                game_state["deck"].insert(0, last_card)
+                game_state["deck"].put_back(last_card)
         # PATCH: Always broadcast updated war_round
-        await broadcast_to_all({
+        await broadcast_to_all(table, {
             "action": "cards_undone",
             "deck_count": len(game_state["deck"]),
             "players": game_state["players"],
@@ -824,7 +1420,7 @@ async def handle_undo_last_card():
             last_card = game_state["dealer_card"]
             if last_card:
                 game_state["dealer_card"] = None
-                game_state["deck"].insert(0, last_card)
+                game_state["deck"].put_back(last_card)
         elif last_type == "player" and last_player_id:
             last_card = game_state["players"][last_player_id]["card"]
             if last_card:
@@ -832,8 +1428,8 @@ async def handle_undo_last_card():
                 game_state["players"][last_player_id]["status"] = "active"
                 game_state["players"][last_player_id]["result"] = None
                 game_state["players"][last_player_id]["war_card"] = None
-                game_state["deck"].insert(0, last_card)
-        await broadcast_to_all({
+                game_state["deck"].put_back(last_card)
+        await broadcast_to_all(table, {
             "action": "cards_undone",
             "deck_count": len(game_state["deck"]),
             "players": game_state["players"],
@@ -844,34 +1440,39 @@ async def handle_undo_last_card():
         })
         return
 
-async def handle_add_card_manual(card):
+async def handle_add_card_manual(table, card):
     """Manually adds a card (for testing purposes)."""
-    game_state["deck"].insert(0, card)
+    game_state = table.game_state
+    try:
+        game_state["deck"].put_back(card)
+    except ValueError:
+        await broadcast_to_dealers(table, {"action": "error", "message": f"Invalid card: {card}"})
+        return
     
-    await broadcast_to_dealers({
+    await broadcast_to_dealers(table, {
         "action": "card_added_manually",
         "card": card,
         "deck_count": len(game_state["deck"])
     })
 
-async def handle_set_game_mode(mode):
+async def handle_set_game_mode(table, mode):
     """Sets the game mode and ensures deck is initialized if needed."""
+    game_state = table.game_state
     game_state["game_mode"] = mode
     # If starting fresh, initialize the deck
     if game_state.get("round_number", 0) == 0 or not game_state.get("deck"):
-        game_state["deck"] = create_deck()
+        game_state["deck"] = create_deck(table)
     # Stop any running automatic mode
-    if hasattr(game_state, 'auto_task') and game_state['auto_task']:
-        game_state['auto_task'].cancel()
-        game_state['auto_task'] = None
-    await broadcast_to_all({
+    stop_auto_play(table)
+    await broadcast_to_all(table, {
         "action": "game_mode_changed",
         "mode": mode,
         "deck_count": len(game_state["deck"])
     })
 
-def get_next_card_assignment_target():
+def get_next_card_assignment_target(table):
     """Returns the next assignment target: (target_type, player_id or None)."""
+    game_state = table.game_state
     # Find lowest-numbered active player without a card
     active_players = [pid for pid, pdata in game_state["players"].items() if pdata["status"] == "active" and pdata["card"] is None]
     if active_players:
@@ -887,8 +1488,9 @@ def get_next_card_assignment_target():
     # All assigned
     return (None, None)
 
-def is_card_available(card):
+def is_card_available(table, card):
     """Returns True if at least one copy of the card is left in the deck (max 6 per unique card in 312)."""
+    game_state = table.game_state
     return card in game_state["deck"]
 
 
@@ -915,8 +1517,9 @@ import re
 #     return (None, None)
 
 # Helper to get next war card assignment target
-def get_next_war_card_assignment_target():
+def get_next_war_card_assignment_target(table):
     """Returns the next war card assignment target: (target_type, player_id or None)."""
+    game_state = table.game_state
     war = game_state.get("war_round", {})
     if not war:
         return (None, None)
@@ -1012,10 +1615,11 @@ def get_next_war_card_assignment_target():
 #             "card": card
 #         })
 
-def assign_card_if_available(card, error_context="assignment"):
+def assign_card_if_available(table, card, error_context="assignment"):
     """Remove card from deck if available, else return False and send error."""
+    game_state = table.game_state
     if card not in game_state["deck"]:
-        asyncio.create_task(broadcast_to_dealers({
+        asyncio.create_task(broadcast_to_dealers(table, {
             "action": "error",
             "message": f"Card {card} cannot be used for {error_context}: all 6 copies have already been assigned or burned."
         }))
@@ -1024,38 +1628,39 @@ def assign_card_if_available(card, error_context="assignment"):
     return True
 
 # PATCH: handle_manual_deal_card (covers manual override and live/shoereader)
-async def handle_manual_deal_card(target, card, player_id=None):
+async def handle_manual_deal_card(table, target, card, player_id=None):
+    game_state = table.game_state
     if game_state["game_mode"] != "live":
-        await broadcast_to_dealers({"action": "error", "message": "Manual card assignment allowed only in live mode"})
+        await broadcast_to_dealers(table, {"action": "error", "message": "Manual card assignment allowed only in live mode"})
         return
     # Allow assignment to any unassigned player or dealer (not just next in order)
-    if not assign_card_if_available(card, "manual assignment"):
+    if not assign_card_if_available(table, card, "manual assignment"):
         return
     if target == "dealer":
         if game_state["dealer_card"] is not None:
-            await broadcast_to_dealers({
+            await broadcast_to_dealers(table, {
                 "action": "error",
                 "message": "Dealer already has a card assigned."
             })
             return
         game_state["dealer_card"] = card
         game_state.setdefault("assignment_order", []).append({"card": card, "type": "dealer"})
-        await broadcast_to_all({
+        await broadcast_to_all(table, {
             "action": "dealer_card_set",
             "card": card,
             "message": "Dealer card manually set",
-            "game_state": game_state,
+            "game_state": build_state_view(table),
             "deck_count": len(game_state["deck"])
         })
     elif target == "player":
         if not player_id or player_id not in game_state["players"]:
-            await broadcast_to_dealers({
+            await broadcast_to_dealers(table, {
                 "action": "error",
                 "message": f"Player {player_id} not found."
             })
             return
         if game_state["players"][player_id]["card"] is not None:
-            await broadcast_to_dealers({
+            await broadcast_to_dealers(table, {
                 "action": "error",
                 "message": f"Player {player_id} already has a card assigned."
             })
@@ -1063,56 +1668,78 @@ async def handle_manual_deal_card(target, card, player_id=None):
         game_state["players"][player_id]["card"] = card
         game_state["players"][player_id]["status"] = "active"
         game_state.setdefault("assignment_order", []).append({"player_id": player_id, "card": card, "type": "player"})
-        await broadcast_to_all({
+        await broadcast_to_all(table, {
             "action": "player_card_set",
             "player_id": player_id,
             "card": card,
             "message": f"Card manually assigned to player {player_id}",
-            "game_state": game_state,
+            "game_state": build_state_view(table),
             "deck_count": len(game_state["deck"])
         })
 
-async def broadcast_to_all(message):
-    """Broadcasts message to all connected clients."""
-    print(f"[BROADCAST_TO_ALL] {json.dumps(message)}")  # LOG every broadcast
-    if connected_clients:
-        await asyncio.gather(
-            *[client.send(json.dumps(message)) for client in connected_clients],
-            return_exceptions=True
-        )
-
-async def broadcast_to_dealers(message):
-    """Broadcasts message only to dealer clients."""
-    print(f"[BROADCAST_TO_DEALERS] {json.dumps(message)}")  # LOG every dealer broadcast
-    if dealer_clients:
-        await asyncio.gather(
-            *[client.send(json.dumps(message)) for client in dealer_clients],
-            return_exceptions=True
-        )
-
-async def broadcast_game_state_update():
-    # PATCH: Always include war round state if present
-    game_state_update = {
-        "deck_count": len(game_state["deck"]),
-        "burned_cards_count": len(game_state["burned_cards"]),
-        "dealer_card": game_state["dealer_card"],
-        "players": game_state["players"],
-        "round_active": game_state["round_active"],
-        "round_number": game_state["round_number"],
-        "game_mode": game_state["game_mode"],
-        "table_number": game_state["table_number"],
-        "min_bet": game_state["min_bet"],
-        "max_bet": game_state["max_bet"],
-        "player_results": game_state["player_results"]
-    }
-    if game_state.get("war_round_active") or (game_state.get("war_round") and game_state["war_round"]):
-        game_state_update["war_round_active"] = game_state.get("war_round_active", False)
-        game_state_update["war_round"] = game_state.get("war_round", None)
-    print(f"[GAME_STATE_UPDATE] {json.dumps(game_state_update)}")  # LOG every game state update
-    await broadcast_to_all({
-        "action": "game_state_update",
-        "game_state": game_state_update
-    })
+def broadcast_event(table, audience, clients, message, coalesce_key=None, merge=None):
+    """Numbers a table event (event_seq), sends it to clients and keeps it for resuming sessions."""
+    seq = message["event_seq"] = table.events.next_seq()
+    payload = broadcast(clients, message, coalesce_key, merge)  # serialized once for every client
+    table.events.append(seq, audience, payload)
+    return payload
+
+def broadcast_views(table, topic, message, exclude=(), coalesce_key=None):
+    """Sends the per-player views of an already numbered message to the topic's player clients."""
+    for player_ids, clients in table.subscriptions.views(topic, exclude).items():
+        broadcast(clients, player_view(message, player_ids), coalesce_key)
+
+async def broadcast_to_all(table, message):
+    """Broadcasts message to the table's clients subscribed to its topic (see subscriptions.py)."""
+    topic = event_topic(message)
+    subscriptions = table.subscriptions
+    if has_seats(message):
+        payload = broadcast_event(table, topic, subscriptions.full[topic], message)
+        broadcast_views(table, topic, message)
+    else:
+        clients = subscriptions.full[topic].union(subscriptions.viewers[topic])
+        payload = broadcast_event(table, topic, clients, message)
+    broadcast_log.debug("To all", extra={"table": table.table_id, "topic": topic, "payload": payload})
+
+async def broadcast_to_dealers(table, message):
+    """Broadcasts message only to the table's dealer clients."""
+    payload = broadcast_event(table, "dealers", table.dealer_clients, message)
+    broadcast_log.debug("To dealers", extra={"table": table.table_id, "payload": payload})
+
+def schedule_display_frame(table):
+    """Arms the table's next display feed frame: at once after a quiet spell, else one frame interval after the last."""
+    if table.frame_timer is not None:
+        return  # the pending frame will show this change too
+    delay = 0.0
+    if table.frame_sent_at is not None and DISPLAY_FEED_FPS > 0:
+        delay = table.frame_sent_at + 1 / DISPLAY_FEED_FPS - asyncio.get_running_loop().time()
+    table.frame_timer = auto_timers.call_later(delay, display_frame, table)
+
+def display_frame(table):
+    """Sends feed displays the latest state (the cached game_state_update), if it changed since their last frame."""
+    table.frame_timer = None
+    clients = table.subscriptions.full[FEED]
+    versions = (table.state_version, table.stats_version)
+    if not clients or versions == table.frame_versions:
+        return
+    payloads = {}  # codec -> payload
+    for websocket in clients:
+        codec = codec_of(websocket)
+        if codec not in payloads:
+            payloads[codec] = state_payload(table, codec=codec)
+        client_queue(websocket).push(payloads[codec], "game_state_update")
+    table.frame_versions = versions
+    table.frame_sent_at = asyncio.get_running_loop().time()
+    DISPLAY_FRAMES.inc()
+
+async def broadcast_game_state_update(table):
+    """Sends the full state view to snapshot clients and only the changes to delta clients."""
+    await publish_state(table)
+    message = state_message(table)
+    payload = broadcast_event(table, "snapshot", table.subscriptions.full["state"] - table.delta_clients,
+                              message, coalesce_key="game_state_update")
+    broadcast_views(table, "state", message, exclude=table.delta_clients, coalesce_key="game_state_update")
+    broadcast_log.debug("State to all", extra={"table": table.table_id, "payload": payload})
 
 # DELETE DATA FROM MONGODB
 async def delete_recent_result():
@@ -1121,13 +1748,14 @@ async def delete_recent_result():
     if last_result:
         result = await results_collection.delete_one({"_id": last_result["_id"]})
         if result.deleted_count > 0:
-            pass
+            await increment_player_stats(stats_collection, [last_result], direction=-1)
 
-async def delete_all_results():
+async def delete_all_results(table):
     """Deletes all game results from MongoDB."""
     result = await results_collection.delete_many({})
+    await stats_collection.delete_many({})
     if result.deleted_count > 0:
-        await broadcast_to_dealers({
+        await broadcast_to_dealers(table, {
             "action": "all_results_deleted",
             "deleted_count": result.deleted_count
         })
@@ -1169,53 +1797,75 @@ def extract_card_value(input_string):
     """
     Extract the card value from the input string formatted like:
     [Manual Burn Cards]<Card:{data}>
+    Returns None unless the line is a well-formed frame with a valid card (see shoe_reader.decode_frame).
     """
-    match = re.search(r"<Card:(.*?)>", input_string)
-    return match.group(1) if match else None
+    try:
+        return decode_frame(input_string.encode("utf-8"))
+    except (FrameError, UnicodeEncodeError):
+        return None
+
+async def handle_shoe_card(table, card):
+    """Applies one card from a shoe reader and publishes the change to delta clients."""
+    await table.executor.run(apply_shoe_card, table, card)
+
+async def apply_shoe_card(table, card):
+    async with journal.action(table.table_id, {"action": "shoe_card", "card": card}):
+        await handle_card_from_shoe(table, card)
+    await publish_state(table)
+
+async def handle_device_card(table_id, card):
+    """ShoeService callback: routes a card from a shoe reader to its table."""
+    await handle_shoe_card(table_manager.open_table(table_id), card)
+
+shoe_service = ShoeService(SHOE_DEVICES, handle_device_card, recording_dir=SHOE_RECORDING_DIR)
 
 # Unified handler for shoe reader cards (assigns to main or war round as needed)
-async def handle_card_from_shoe(card):
+async def handle_card_from_shoe(table, card):
+    game_state = table.game_state
     try:
         if game_state.get("war_round_active"):
             # War round: assign to next war target
-            target, player_id = get_next_war_card_assignment_target()
+            target, player_id = get_next_war_card_assignment_target(table)
             if target == "player":
-                await handle_assign_war_card("player", card, player_id)
+                await handle_assign_war_card(table, "player", card, player_id)
             elif target == "dealer":
-                await handle_assign_war_card("dealer", card)
+                await handle_assign_war_card(table, "dealer", card)
             else:
-                print("[SHOE] All war cards assigned.")
+                shoe_log.info("All war cards assigned, ignoring card", extra={"table": table.table_id, "card": card})
         else:
             # Main round: assign to next available player or dealer
-            target, player_id = get_next_card_assignment_target()
+            target, player_id = get_next_card_assignment_target(table)
             if target == "player":
-                await handle_manual_deal_card("player", card, player_id)
+                await handle_manual_deal_card(table, "player", card, player_id)
             elif target == "dealer":
-                await handle_manual_deal_card("dealer", card)
+                await handle_manual_deal_card(table, "dealer", card)
             else:
-                print("[SHOE] All main round cards assigned.")
-    except Exception as e:
-        print(f"[SHOE HANDLER ERROR] {e}")
+                shoe_log.info("All main round cards assigned, ignoring card", extra={"table": table.table_id, "card": card})
+    except Exception:
+        shoe_log.exception("Handling card failed", extra={"table": table.table_id, "card": card})
         # Optionally: await broadcast_to_dealers({"action": "error", "message": f"Shoe handler error: {e}"})
 
-# Clean serial reading logic: only reads and calls the handler
-async def read_from_serial(ser):
+# Event-driven serial reading: frames are read and decoded on the reader's thread, cards arrive here as they complete
+async def read_from_serial(table, ser, recorder=None):
     """
-    Continuously reads card values from the casino shoe reader and passes them to the backend handler.
+    Continuously reads card values from the table's casino shoe reader and passes them to the backend handler.
+    Every raw frame also goes to recorder (a shoe_recording.ShoeRecorder) when one is given.
     """
-    while True:
-        try:
-            if ser.in_waiting > 0:
-                raw_data = ser.readline().decode("utf-8").strip()
-                card = extract_card_value(raw_data)
-                print("card:", card)
-                if card:
-                    await handle_card_from_shoe(card)
-            await asyncio.sleep(0.1)  # Adjust delay if necessary
-        except Exception as e:
-            print(f"[SERIAL ERROR] {e}")
-            # Optionally: await broadcast_to_dealers({"action": "error", "message": f"Serial error: {e}"})
-            await asyncio.sleep(1)  # Prevent tight error loop
+    reader = ShoeReader(ser, asyncio.Queue(), recorder=recorder)
+    reader.start()
+    try:
+        while True:
+            # Raises the reader's error once the device is gone
+            shoe_card = await reader.get()
+            if shoe_card is None:
+                return
+            shoe_log.debug("Card", extra={"table": table.table_id, "card": shoe_card.card})
+            try:
+                await handle_shoe_card(table, shoe_card.card)
+            except Exception:
+                shoe_log.exception("Serial card failed", extra={"table": table.table_id, "card": shoe_card.card})
+    finally:
+        reader.stop()
 
 # async def main():
 #     print("Connected to:", ser.name)
@@ -1234,11 +1884,97 @@ async def read_from_serial(ser):
 
 # MY FUNCSSS
 
+def snapshot_tables():
+    """The state of every table as JSON-able data, for journal snapshots."""
+    tables = []
+    for table in table_manager:
+        game_state = {key: value for key, value in table.game_state.items() if key not in ("deck", "auto_task")}
+        tables.append({
+            "table_id": table.table_id,
+            "game_state": game_state,
+            "deck": table.game_state["deck"].to_codes(),
+            "session_stats": table.session_stats,
+        })
+    return tables
+
+journal.snapshot_source = snapshot_tables
+
+def restore_tables(tables):
+    """Puts snapshot_tables() data (freshly parsed, so not shared with anything) back into the tables."""
+    for data in tables:
+        table = table_manager.open_table(data["table_id"])
+        table.game_state.update(data["game_state"])
+        table.game_state["deck"] = Shoe.from_codes(data["deck"])
+        table.session_stats.clear()
+        table.session_stats.update(data["session_stats"])
+        table.stats_version += 1
+
+async def recover_tables():
+    """Rebuilds every table from the journal's snapshot and the entries after it."""
+    start = time.perf_counter()
+    snapshot, entries = journal.load()
+    if snapshot:
+        restore_tables(snapshot["tables"])
+    # What a table did before it was closed is gone with it
+    closed_at = {entry["table"]: entry["seq"] for entry in entries if entry["action"]["action"] == "close_table"}
+    journal.replaying = True
+    try:
+        for entry in entries:
+            if entry["seq"] < closed_at.get(entry["table"], 0):
+                continue
+            if entry["action"]["action"] == "close_table":
+                table = table_manager.tables.get(entry["table"])  # from the snapshot, if it was in it
+                if table is not None:
+                    table_manager.close_table(table)
+                continue
+            table = table_manager.open_table(entry["table"])
+            journal.replay_decks(entry)
+            try:
+                if entry["action"]["action"] == "shoe_card":
+                    await handle_card_from_shoe(table, entry["action"]["card"])
+                else:
+                    await apply_table_action(table, entry["action"])
+            except Exception as e:
+                journal_log.error("Replaying entry %s failed: %s", entry["seq"], e)
+    finally:
+        journal.replaying = False
+    for table in table_manager:
+        await publish_state(table)  # restored tables skipped the executor commands that publish
+        close_when_idle(table)
+    if snapshot or entries:
+        journal_log.info("Recovered %d tables from %s%d entries in %.3fs", len(table_manager),
+                         "a snapshot and " if snapshot else "", len(entries), time.perf_counter() - start)
+
 async def main():
     """Starts the WebSocket server."""
-    async with websockets.serve(handle_connection, "localhost", 6790):
-        print("WebSocket server running on ws://localhost:6790")
-        await asyncio.Future()
+    log.configure(LOG_LEVEL, levels=LOG_LEVELS, sample=LOG_SAMPLE, fmt=LOG_FORMAT)
+    metrics_server = None
+    try:
+        if JOURNAL_DIR:
+            await recover_tables()
+            journal.open()
+            resume_auto_play()
+        # Only the server audits its shoes, not the tools and benchmarks that import this module
+        shoe_pool.audit_path = SHOE_AUDIT_LOG
+        shoe_pool.start()
+        if METRICS_PORT:
+            metrics_server = await metrics.serve("localhost", METRICS_PORT)
+        async with websockets.serve(handle_connection, "localhost", 6790, max_size=MAX_FRAME_SIZE):
+            server_log.info("WebSocket server running on ws://localhost:6790")
+            shoe_service.start()
+            await asyncio.Future()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await shoe_service.stop()
+        await auto_timers.stop()
+        await shoe_pool.close()
+        for table in table_manager:
+            await table.executor.stop()
+        await journal.close()
+        # Flush queued round results before exiting
+        await result_writer.stop()
+        log.shutdown()
 
 # --- MAIN ENTRY POINT ---
 if __name__ == "__main__":
@@ -1248,6 +1984,12 @@ if __name__ == "__main__":
     asyncio.run(main())
 
 # Usage:
-#   - For main round: await read_from_serial(ser, war_mode=False)
-#   - For war round:  await read_from_serial(ser, war_mode=True)
-# Replace 'ser' with your serial.Serial instance.
\ No newline at end of file
+#   SHOE_DEVICES="/dev/ttyUSB0=1,/dev/ttyUSB1=2" python casino_war_backend.py
+# starts one shoe reader per device (see shoe_service.py). For a single shoe outside the service:
+#   await read_from_serial(table_manager.open_table(1), ser)
+# Replace 'ser' with your serial.Serial instance; main and war rounds are handled automatically.
+# Every table action is journaled to JOURNAL_DIR (default ./journal) and replayed on the next start;
+#   JOURNAL_DIR="" python casino_war_backend.py
+# starts with empty tables and no journal.
+# Metrics (action latency, broadcasts, MongoDB calls, shoe cards, clients) are served on METRICS_PORT:
+#   curl http://localhost:9100/metrics
@@ -0,0 +1,185 @@
+"""
+Wire encodings, negotiated per connection.
+
+JSON text is the default. A client can ask for MessagePack when it connects:
+
+    ws://localhost:6790/?table=3&codec=msgpack
+
+and then sends and receives binary MessagePack frames in which the action
+name is a small integer (ACTIONS below; names not in it stay strings) and
+every card is its integer code from shoe.py (rank index * 4 + suit index,
+"AS" is 0). Cards are recognized by where they appear: the "card",
+"dealer_card", "burned_card" and "war_card" fields of the message, of its
+"game_state" and of every seat in a "players" map, the "dealer_card" of
+"war_round" and "original_cards" and the values of their "players" maps; in
+state_delta ops by the op's path. Everything else (field names, player ids,
+results, card fields anywhere else) is unchanged. If msgpack is not installed the server falls back to JSON; the
+"session" message names the codec in use.
+
+ACTIONS is append-only: a code, once given out, keeps its meaning.
+"""
+import json
+
+from shoe import CARD_CODES, CARD_NAMES
+
+try:
+    import orjson  # optional, noticeably faster than the json module for our payloads
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # optional; without it every connection uses JSON
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+CODECS = (JSON, MSGPACK) if msgpack is not None else (JSON,)
+
+ACTIONS = [
+    None,  # 0 is not used
+    # server to client
+    "game_state_update", "state_snapshot", "state_delta", "session", "error",
+    "dealer_registered", "display_registered", "player_registered", "all_player_stats", "table_changed",
+    "shoe_status", "deck_shuffled", "card_burned", "player_added", "player_removed",
+    "round_dealt", "player_choice_made", "war_round_started", "war_card_assigned", "war_round_evaluated",
+    "round_completed", "cards_undone", "dealer_card_set", "player_card_set", "card_added_manually",
+    "game_mode_changed", "bets_changed", "game_reset", "auto_play_changed", "all_results_deleted",
+    # client to server
+    "register_dealer", "register_display", "register_player", "subscribe_deltas", "request_snapshot",
+    "get_shoe_status", "get_all_player_stats", "change_table", "shuffle_deck", "burn_card",
+    "add_player", "remove_player", "deal_cards", "reset_game", "change_bets",
+    "undo_last_card", "add_card_manual", "player_choice", "set_game_mode", "assign_war_card",
+    "evaluate_war_round", "manual_deal_card", "start_auto_round", "clear_round", "start_auto_play",
+    "stop_auto_play",
+]
+ACTION_CODES = {name: code for code, name in enumerate(ACTIONS) if name is not None}
+
+CARD_FIELDS = frozenset({"card", "dealer_card", "burned_card", "war_card"})
+
+# Where cards can sit, as a table of transitions: container kind -> {field: kind of its value}. A message,
+# its "game_state" and every seat in a "players" map hold card fields; "war_round" and "original_cards"
+# hold the dealer's card and a "players" map of cards. Subtrees that cannot hold cards (stats, results,
+# messages) are never visited, and nothing is copied that has no card in it.
+_CARD, _HOLDER, _SEATS, _WAR, _WAR_PLAYERS = "card", "holder", "seats", "war", "war_players"
+_FIELDS = {
+    _HOLDER: {**dict.fromkeys(CARD_FIELDS, _CARD),
+              "game_state": _HOLDER, "players": _SEATS, "war_round": _WAR, "original_cards": _WAR},
+    _WAR: {**dict.fromkeys(CARD_FIELDS, _CARD), "players": _WAR_PLAYERS, "original_cards": _WAR},
+}
+_ANY_KEY = {_SEATS: _HOLDER, _WAR_PLAYERS: _CARD}  # maps keyed by player id
+
+
+def _path_kind(path):
+    """The kind of value at a state_delta op's path (relative to the game state), None if it holds no cards."""
+    kind = _HOLDER
+    for key in path:
+        kind = _ANY_KEY.get(kind) or _FIELDS[kind].get(key)
+        if kind is None or kind is _CARD:
+            return kind
+    return kind
+
+
+def _convert(value, kind, cards, card_type):
+    """value, a kind of container, with its cards of card_type mapped through cards; value itself if it has none."""
+    # Hot for every MessagePack message: card leaves are looked up inline instead of by a call each
+    if kind is _CARD:
+        return cards.get(value, value) if type(value) is card_type else value
+    if kind is None or not isinstance(value, dict):
+        return value
+    item_kind = _ANY_KEY.get(kind)
+    if item_kind is not None:
+        return {key: _convert(item, item_kind, cards, card_type) for key, item in value.items()}
+    fields = _FIELDS[kind]
+    converted = value
+    for key, item in value.items():
+        item_kind = fields.get(key)
+        if item_kind is None:
+            continue
+        if item_kind is _CARD:
+            new = cards.get(item, item) if type(item) is card_type else item
+        else:
+            new = _convert(item, item_kind, cards, card_type)
+        if new is not item:
+            if converted is value:
+                converted = dict(value)
+            converted[key] = new
+    return converted
+
+
+def _convert_message(message, cards, card_type, action):
+    converted = _convert(message, _HOLDER, cards, card_type)
+    if converted is message:
+        converted = dict(message)
+    if "action" in message:
+        converted["action"] = action(message["action"])
+    ops = message.get("ops")
+    if isinstance(ops, list):
+        converted["ops"] = converted_ops = []
+        for op in ops:
+            kind = _path_kind(op[0]) if len(op) == 2 else None
+            if kind is not None:
+                value = _convert(op[1], kind, cards, card_type)
+                if value is not op[1]:
+                    op = [op[0], value]
+            converted_ops.append(op)
+    return converted
+
+
+_CARD_NAMES_BY_CODE = dict(enumerate(CARD_NAMES))
+
+
+def _action_code(value):
+    return ACTION_CODES.get(value, value)
+
+
+def _action_name(value):
+    if isinstance(value, int) and not isinstance(value, bool) and 0 < value < len(ACTIONS):
+        return ACTIONS[value]
+    return value
+
+
+def compact(message):
+    """The MessagePack form of a message before packing: integer action and cards."""
+    return _convert_message(message, CARD_CODES, str, _action_code)
+
+
+def expand(message):
+    """Inverse of compact()."""
+    return _convert_message(message, _CARD_NAMES_BY_CODE, int, _action_name)
+
+
+def negotiate(requested):
+    """The codec to use for a connection that asked for requested (None: the default)."""
+    return requested if requested in CODECS else JSON
+
+
+def encode_message(message, codec=JSON):
+    """Serializes a message: JSON text (orjson when it is installed) or MessagePack bytes."""
+    if codec == MSGPACK:
+        return msgpack.packb(compact(message))
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(message)
+
+
+def decode_message(data, codec=JSON):
+    """Parses a message from a client; ValueError if it is not valid in codec."""
+    if codec == MSGPACK:
+        if isinstance(data, str):
+            raise ValueError("Expected a binary MessagePack frame")
+        try:
+            message = msgpack.unpackb(data, strict_map_key=False)
+        except Exception as e:  # msgpack raises several unrelated types for bad input
+            raise ValueError(str(e)) from None
+        return expand(message) if isinstance(message, dict) else message
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def transcode(payload, codec):
+    """A JSON payload (as kept in the event log) re-encoded for a connection using codec."""
+    if codec == JSON:
+        return payload
+    return encode_message(decode_message(payload), codec)
@@ -0,0 +1,203 @@
+"""
+Registry-based dispatch of websocket messages.
+
+Every action a client may send is registered once, with its handler and the
+fields it needs:
+
+    dispatcher.register("player_choice", handler, player_id=str, choice={"war", "surrender"})
+
+A field spec is a type or tuple of types (bool never counts as int), or a
+set of allowed values; a name ending in "?" is optional. Each schema is
+compiled into a validator when it is registered, so checking a message is a
+dict lookup for the action plus one test per declared field, whatever the
+number of actions.
+
+dispatch() takes a raw message through: size limit, per-connection rate
+limit (token bucket), decoding (JSON, or the codec the connection
+negotiated; see codec.py), action lookup, validation, the before
+hooks (authorization and routing; raise Reject to refuse), the handler, and
+the after hooks (timing). A message that fails any step, or whose handler
+raises, is answered with {"action": "error", "message": ...} and dropped;
+the connection stays open. Unknown actions, and messages over the rate limit
+after the first, are dropped without an answer.
+"""
+import time
+
+import log
+import metrics
+from codec import JSON, decode_message
+from fanout import send
+
+MAX_MESSAGE_SIZE = 4096  # bytes (or characters); real messages are well under 200
+MAX_STRING_LENGTH = 64  # longest accepted string field (player ids, cards, modes)
+MESSAGE_RATE = 100.0  # sustained messages per second per connection; 0 turns the limit off
+MESSAGE_BURST = 200  # messages a connection may send at once
+
+logger = log.get_logger("messages")
+
+REJECTED_MESSAGES = metrics.Counter("casino_war_rejected_messages_total",
+                                    "Messages refused before reaching a handler", labels=("reason",))
+
+
+class Reject(Exception):
+    """Refuses a message: reason is the metrics label, message the error sent back (None: no answer)."""
+
+    def __init__(self, reason, message=None):
+        super().__init__(message or reason)
+        self.reason = reason
+        self.message = message
+
+
+def _describe(spec):
+    if isinstance(spec, (set, frozenset)):
+        return "one of " + ", ".join(sorted(map(str, spec)))
+    types = spec if isinstance(spec, tuple) else (spec,)
+    return " or ".join(t.__name__ for t in types)
+
+
+def _compile_test(spec):
+    if isinstance(spec, (set, frozenset)):
+        choices = frozenset(spec)
+        return lambda value: isinstance(value, (str, int)) and value in choices
+    types = spec if isinstance(spec, tuple) else (spec,)
+    rejects_bool = bool not in types
+
+    def test(value):
+        if not isinstance(value, types) or (rejects_bool and (value is True or value is False)):
+            return False
+        return not isinstance(value, str) or len(value) <= MAX_STRING_LENGTH
+
+    return test
+
+
+def compile_validator(fields):
+    """Returns validate(data) -> None, or the reason data does not match fields."""
+    checks = []
+    for name, spec in fields.items():
+        optional = name.endswith("?")
+        key = name.rstrip("?")
+        checks.append((key, optional, _compile_test(spec), _describe(spec)))
+    checks = tuple(checks)
+
+    def validate(data):
+        for key, optional, test, expected in checks:
+            value = data.get(key)
+            if value is None:
+                if optional:
+                    continue
+                return f"Missing '{key}'"
+            if not test(value):
+                return f"'{key}' must be {expected}"
+        return None
+
+    return validate
+
+
+class ActionSpec:
+    __slots__ = ("name", "handler", "fields", "validate", "options")
+
+    def __init__(self, name, handler, fields, options):
+        self.name = name
+        self.handler = handler
+        self.fields = fields
+        self.validate = compile_validator(fields)
+        self.options = options  # free-form metadata for hooks, e.g. {"dealer_only": True}
+
+
+class Connection:
+    """Per-connection dispatch state: the websocket, the table it talks to, its rate limit bucket and codec."""
+
+    def __init__(self, websocket, table=None, rate=MESSAGE_RATE, burst=MESSAGE_BURST, codec=JSON):
+        self.websocket = websocket
+        self.table = table
+        self.codec = codec
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.limited = False  # over the limit and already told so
+
+    def take_token(self):
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.limited = False
+            return True
+        return False
+
+
+class Dispatcher:
+    """The action registry and the pipeline every incoming message goes through (see module docstring)."""
+
+    def __init__(self, common_fields=None, max_message_size=MAX_MESSAGE_SIZE):
+        self.actions = {}
+        self.common_fields = dict(common_fields or {})  # accepted (and checked) on every action
+        self.max_message_size = max_message_size
+        self.before = []  # async hook(conn, spec, data); raise Reject to refuse the message
+        self.after = []  # hook(conn, action name, seconds, reject reason or None)
+
+    def register(self, name, handler, options=None, **fields):
+        """Registers async handler(conn, data) for name; fields as in the module docstring."""
+        if name in self.actions:
+            raise ValueError(f"Action {name!r} is already registered")
+        self.actions[name] = ActionSpec(name, handler, {**self.common_fields, **fields}, options or {})
+
+    def action(self, name, options=None, **fields):
+        """Decorator form of register()."""
+        def decorate(handler):
+            self.register(name, handler, options, **fields)
+            return handler
+        return decorate
+
+    def accept(self, conn, message):
+        """Returns (spec, data) for a message that may be handled, or raises Reject."""
+        if len(message) > self.max_message_size:
+            raise Reject("too_large", f"Message too large ({len(message)} > {self.max_message_size})")
+        if not conn.take_token():
+            if conn.limited:
+                raise Reject("rate_limited")
+            conn.limited = True
+            raise Reject("rate_limited", "Too many messages; slow down")
+        try:
+            data = decode_message(message, conn.codec)
+        except ValueError:
+            raise Reject("invalid_json", f"Message is not valid {conn.codec}")
+        if not isinstance(data, dict):
+            raise Reject("invalid_message", f"Message must be a {conn.codec} object")
+        action = data.get("action")
+        spec = self.actions.get(action) if isinstance(action, str) else None
+        if spec is None:
+            raise Reject("unknown_action")
+        error = spec.validate(data)
+        if error is not None:
+            raise Reject("invalid_fields", f"{action}: {error}")
+        return spec, data
+
+    async def dispatch(self, conn, message):
+        """Handles one raw message; never raises for bad input."""
+        start = time.perf_counter()
+        name = "unknown"
+        reason = None
+        try:
+            spec, data = self.accept(conn, message)
+            name = spec.name
+            for hook in self.before:
+                await hook(conn, spec, data)
+            await spec.handler(conn, data)
+        except Reject as e:
+            reason = e.reason
+            REJECTED_MESSAGES.inc(reason)
+            if e.message is not None:
+                logger.info("Rejected: %s", e.message, extra={"reason": reason, "address": conn.websocket.remote_address})
+                send(conn.websocket, {"action": "error", "message": e.message})
+        except Exception as e:
+            reason = "handler_error"
+            logger.exception("Handling %s failed", name, extra={"address": conn.websocket.remote_address})
+            send(conn.websocket, {"action": "error", "message": f"{name} failed: {e}"})
+        elapsed = time.perf_counter() - start
+        for hook in self.after:
+            hook(conn, name, elapsed, reason)
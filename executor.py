@@ -0,0 +1,96 @@
+"""
+Per-table serialized execution of commands.
+
+Handlers change a table's game_state across await points (complete_round
+waits whenever the result writer's queue is full, broadcasts may yield), so
+two clients acting on the same table could interleave halfway through each
+other's changes. Every command that reads or changes a table's state runs on
+that table's TableExecutor instead: a queue with a single consumer task, so
+a table's commands apply one at a time in the order they were submitted.
+Different tables have their own executors and never wait for each other, and
+what happens after a command (the fan-out writer tasks, the result writer)
+runs outside it.
+
+    result = await table.executor.run(handle_deal_cards, table)
+
+A command keeps running when the caller that submitted it goes away (a
+client that disconnects mid-action), so a table is never left with half an
+action applied. A command that submits another command to its own table
+runs it inline instead of deadlocking on itself.
+"""
+import asyncio
+import time
+
+import log
+import metrics
+
+logger = log.get_logger("executor")
+
+QUEUE_SECONDS = metrics.Histogram("casino_war_table_queue_seconds",
+                                  "Time a table command waited for the commands before it")
+RUN_SECONDS = metrics.Histogram("casino_war_table_command_seconds", "Time a table command held its table")
+
+
+class TableExecutor:
+    """Runs one table's commands one at a time, in submission order (see module docstring)."""
+
+    def __init__(self, name):
+        self.name = name
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        """Starts the consumer task on the running loop; called on the first run()."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"table-{self.name}")
+
+    async def run(self, command, *args):
+        """Runs await command(*args) after the commands submitted before it and returns its result."""
+        if self._task is not None and asyncio.current_task() is self._task:
+            return await command(*args)
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((command, args, future, time.perf_counter()))
+        return await future
+
+    def submit(self, command, *args):
+        """Queues await command(*args) without waiting for it (for timer callbacks); failures are logged."""
+        self.start()
+        self._queue.put_nowait((command, args, None, time.perf_counter()))
+
+    def pending(self):
+        """Commands waiting for their turn (not counting the one running)."""
+        return self._queue.qsize()
+
+    async def stop(self):
+        """Runs the commands already submitted, then stops the consumer task; call on shutdown."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            command, args, future, queued = await self._queue.get()
+            start = time.perf_counter()
+            QUEUE_SECONDS.observe(start - queued)
+            try:
+                result = await command(*args)
+            except Exception as e:
+                if future is None or future.done():  # nobody is waiting for the error
+                    logger.exception("Table %s command %s failed", self.name, command.__name__)
+                else:
+                    future.set_exception(e)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(result)
+            finally:
+                if future is not None and not future.done():  # the command was cancelled
+                    future.cancel()
+                RUN_SECONDS.observe(time.perf_counter() - start)
+                self._queue.task_done()
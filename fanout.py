@@ -0,0 +1,193 @@
+"""
+Broadcast fan-out.
+
+Every message is serialized exactly once and the same payload is queued for
+each recipient. Each connection has its own bounded outbound queue drained by
+its own writer task, so a slow display or a flaky tablet only delays itself:
+broadcasting never awaits a socket.
+
+Messages sent with a coalesce key replace a still-queued message with the same
+key (optionally merged with it), so a client that falls behind skips superseded
+state updates instead of replaying all of them. A client that stays more than
+SEND_QUEUE_LIMIT messages behind for SLOW_CLIENT_TIMEOUT seconds, or falls
+behind by SEND_QUEUE_HARD_LIMIT messages, is disconnected.
+
+Connections that negotiated another codec (codec.py) get the message
+encoded for them once per broadcast as well.
+"""
+import asyncio
+import time
+from collections import deque
+
+import websockets
+
+import log
+import metrics
+from codec import JSON, encode_message
+
+SEND_QUEUE_LIMIT = 100  # queued messages before a client counts as behind
+SEND_QUEUE_HARD_LIMIT = 400  # queued messages before a client is dropped immediately
+SLOW_CLIENT_TIMEOUT = 5.0  # seconds a client may stay behind before it is dropped
+SLOW_CLIENT_CLOSE_CODE = 1008
+
+logger = log.get_logger("fanout")
+
+BROADCAST_SECONDS = metrics.Histogram("casino_war_broadcast_seconds", "Time to encode a broadcast and queue it for every recipient")
+BROADCAST_RECIPIENTS = metrics.Histogram("casino_war_broadcast_recipients", "Recipients per broadcast",
+                                         buckets=metrics.COUNT_BUCKETS)
+SLOW_CLIENT_DISCONNECTS = metrics.Counter("casino_war_slow_client_disconnects_total",
+                                          "Clients dropped for falling too far behind")
+COALESCED_MESSAGES = metrics.Counter("casino_war_coalesced_messages_total",
+                                     "Queued messages replaced by a newer one before being sent")
+
+
+class ClientQueue:
+    """Outbound queue and writer task for one websocket connection."""
+
+    def __init__(self, websocket, codec=JSON, limit=SEND_QUEUE_LIMIT, hard_limit=SEND_QUEUE_HARD_LIMIT,
+                 slow_timeout=SLOW_CLIENT_TIMEOUT):
+        self.websocket = websocket
+        self.codec = codec
+        self.limit = limit
+        self.hard_limit = hard_limit
+        self.slow_timeout = slow_timeout
+        self._entries = deque()  # [payload, coalesce_key, message]; payload is None once superseded
+        self._latest = {}  # coalesce_key -> its entry still waiting in _entries
+        self._size = 0  # entries still to be sent
+        self._ready = asyncio.Event()
+        self.behind_since = None
+        self.closed = False
+        self.coalesced = 0
+        self._task = asyncio.create_task(self._run())
+
+    def __len__(self):
+        return self._size
+
+    def push(self, payload, coalesce_key=None, message=None, merge=None):
+        """Queues a payload without waiting; see the module docstring for coalescing."""
+        if self.closed:
+            return
+        if coalesce_key is not None:
+            previous = self._latest.pop(coalesce_key, None)
+            if previous is not None:
+                if merge is not None:
+                    message = merge(previous[2], message)
+                    payload = encode_message(message, self.codec)
+                previous[0] = None
+                self._size -= 1
+                self.coalesced += 1
+                COALESCED_MESSAGES.inc()
+        entry = [payload, coalesce_key, message]
+        self._entries.append(entry)
+        self._size += 1
+        if coalesce_key is not None:
+            self._latest[coalesce_key] = entry
+        self._ready.set()
+        self._check_lag()
+
+    def _check_lag(self):
+        if self._size < self.limit:
+            self.behind_since = None
+            return
+        now = time.monotonic()
+        if self.behind_since is None:
+            self.behind_since = now
+        if self._size >= self.hard_limit or now - self.behind_since > self.slow_timeout:
+            self.disconnect()
+
+    def disconnect(self):
+        """Drops everything queued and closes the connection of a client that cannot keep up."""
+        if self.closed:
+            return
+        logger.warning("Disconnecting slow client", extra={"address": self.websocket.remote_address, "behind": self._size})
+        SLOW_CLIENT_DISCONNECTS.inc()
+        self.close()
+        asyncio.create_task(self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE, reason="client too slow"))
+
+    def close(self):
+        self.closed = True
+        self._entries.clear()
+        self._latest.clear()
+        self._size = 0
+        self._task.cancel()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._entries:
+                    entry = self._entries.popleft()
+                    payload, coalesce_key = entry[0], entry[1]
+                    if payload is None:
+                        continue
+                    self._size -= 1
+                    if coalesce_key is not None and self._latest.get(coalesce_key) is entry:
+                        del self._latest[coalesce_key]
+                    await self.websocket.send(payload)
+                    if self._size < self.limit:
+                        self.behind_since = None
+                self._ready.clear()
+        except websockets.ConnectionClosed:
+            self.closed = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Send failed: %s", e, extra={"address": self.websocket.remote_address})
+            self.closed = True
+
+
+_queues = {}  # {websocket: ClientQueue}
+_codecs = {}  # {websocket: codec} for connections not using JSON
+
+
+def set_codec(websocket, codec):
+    """Makes everything sent to websocket use codec; call it before anything is queued."""
+    if codec == JSON:
+        _codecs.pop(websocket, None)
+    else:
+        _codecs[websocket] = codec
+
+
+def codec_of(websocket):
+    return _codecs.get(websocket, JSON)
+
+
+def client_queue(websocket):
+    """Returns the websocket's outbound queue, creating it on first use."""
+    queue = _queues.get(websocket)
+    if queue is None:
+        queue = _queues[websocket] = ClientQueue(websocket, codec_of(websocket))
+    return queue
+
+
+def detach(websocket):
+    """Stops the writer of a disconnected websocket and forgets its queue."""
+    _codecs.pop(websocket, None)
+    queue = _queues.pop(websocket, None)
+    if queue is not None:
+        queue.close()
+
+
+def send(websocket, message):
+    """Queues one message for a single client and returns the encoded payload."""
+    payload = encode_message(message, codec_of(websocket))
+    client_queue(websocket).push(payload)
+    return payload
+
+
+def broadcast(clients, message, coalesce_key=None, merge=None):
+    """Queues one message for every client in clients and returns the JSON payload."""
+    start = time.perf_counter()
+    payload = encode_message(message)
+    payloads = {JSON: payload}  # codec -> payload, each encoded on first use
+    recipients = 0
+    for websocket in clients:
+        codec = _codecs.get(websocket, JSON)
+        encoded = payloads.get(codec)
+        if encoded is None:
+            encoded = payloads[codec] = encode_message(message, codec)
+        client_queue(websocket).push(encoded, coalesce_key, message, merge)
+        recipients += 1
+    BROADCAST_SECONDS.observe(time.perf_counter() - start)
+    BROADCAST_RECIPIENTS.observe(recipients)
+    return payload
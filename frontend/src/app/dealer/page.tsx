@@ -2,6 +2,7 @@
 import { useState, useEffect, useRef, useMemo } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
 import { FaBars, FaTimes, FaMoneyBillWave } from 'react-icons/fa'
+import { SessionState, sessionUrl, trackSession } from '@/app/session'
 
 // Use FaBars, FaTimes, and FaMoneyBillWave as JSX components with .default if needed
 // @ts-ignore
@@ -75,6 +76,7 @@ export default function DealerPage() {
   const [pendingTableNumber, setPendingTableNumber] = useState(gameState.table_number)
   
   const wsRef = useRef<WebSocket | null>(null)
+  const sessionRef = useRef<SessionState>({ token: null, seq: null }) // to resume after a reconnect
   const prevPlayerStatusesRef = useRef<Record<string, string>>({});
 
   useEffect(() => {
@@ -88,11 +90,10 @@ export default function DealerPage() {
 
   const connectWebSocket = () => {
     try {
-      wsRef.current = new WebSocket('ws://localhost:6789')
+      wsRef.current = new WebSocket(sessionUrl('ws://localhost:6789', sessionRef.current))
       
       wsRef.current.onopen = () => {
         setConnected(true)
-        sendMessage({ action: 'register_dealer' })
         addNotification('Connected to game server')
       }
       
@@ -105,6 +106,7 @@ export default function DealerPage() {
       
       wsRef.current.onmessage = (event) => {
         const data = JSON.parse(event.data)
+        trackSession(sessionRef.current, data)
         handleServerMessage(data)
       }
     } catch (error) {
@@ -131,7 +133,12 @@ export default function DealerPage() {
   }
 
   const handleServerMessage = (data: any) => {
-    switch (data.action) {      case 'game_state_update':
+    switch (data.action) {
+      case 'session':
+        // A resumed session is still registered; a new one (or one the server forgot) registers again
+        if (!data.resumed) sendMessage({ action: 'register_dealer' })
+        break
+      case 'game_state_update':
         setGameState(data.game_state)
         break
       case 'deck_shuffled':
@@ -2,6 +2,7 @@
 'use client'
 import { useState, useEffect, useRef } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
+import { applyDelta } from '@/app/stateDelta'
 
 interface GameState {
   deck_count: number
@@ -66,6 +67,7 @@ export default function DisplayPage() {
   const [sessionStats, setSessionStats] = useState<Record<string, any>>({});
 
   const wsRef = useRef<WebSocket | null>(null)
+  const stateSeqRef = useRef<number | null>(null) // version of gameState, from state_snapshot / state_delta
 
   useEffect(() => {
     connectWebSocket()
@@ -85,6 +87,14 @@ export default function DisplayPage() {
       
       wsRef.current.onopen = () => {
         setConnected(true)
+        // /display?feed=1: at most a few state frames a second instead of every table event
+        const feed = new URLSearchParams(window.location.search).get('feed') === '1'
+        wsRef.current?.send(JSON.stringify({ action: 'register_display', ...(feed ? { feed: true } : {}) }))
+        if (!feed) {
+          // Only what changed instead of the whole state on every update
+          stateSeqRef.current = null
+          wsRef.current?.send(JSON.stringify({ action: 'subscribe_deltas' }))
+        }
       }
       
       wsRef.current.onclose = () => {
@@ -120,6 +130,21 @@ export default function DisplayPage() {
         setGameState(data.game_state);
         if (data.stats) setSessionStats(data.stats);
         break;
+      case 'state_snapshot':
+        stateSeqRef.current = data.seq;
+        setGameState(data.game_state);
+        if (data.stats) setSessionStats(data.stats);
+        break;
+      case 'state_delta':
+        if (stateSeqRef.current === null) break; // a snapshot is on its way
+        if (data.base !== stateSeqRef.current) {
+          stateSeqRef.current = null;
+          wsRef.current?.send(JSON.stringify({ action: 'request_snapshot' }));
+          break;
+        }
+        stateSeqRef.current = data.seq;
+        setGameState(prev => applyDelta(prev, data.ops));
+        break;
       case 'round_completed':
         setGameState(prev => ({
           ...prev,
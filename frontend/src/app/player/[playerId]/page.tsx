@@ -3,6 +3,8 @@
 import { useState, useEffect, useRef } from 'react'
 import { useParams } from 'next/navigation'
 import { motion, AnimatePresence } from 'framer-motion'
+import { applyDelta } from '@/app/stateDelta'
+import { SessionState, sessionUrl, trackSession } from '@/app/session'
 
 interface GameState {
   deck_count: number
@@ -54,6 +56,8 @@ export default function PlayerPage() {
   const [sessionStats, setSessionStats] = useState<Record<string, { wins: number; losses: number; ties: number; surrenders: number }>>({})
   
   const wsRef = useRef<WebSocket | null>(null)
+  const stateSeqRef = useRef<number | null>(null) // version of gameState, from state_snapshot / state_delta
+  const sessionRef = useRef<SessionState>({ token: null, seq: null }) // to resume after a reconnect
 
   useEffect(() => {
     if (playerId) {
@@ -68,11 +72,10 @@ export default function PlayerPage() {
 
   const connectWebSocket = () => {
     try {
-      wsRef.current = new WebSocket('ws://localhost:6789')
+      wsRef.current = new WebSocket(sessionUrl('ws://localhost:6789', sessionRef.current))
       
       wsRef.current.onopen = () => {
         setConnected(true)
-        sendMessage({ action: 'register_player', player_id: playerId })
         addNotification('Connected to game')
       }
       
@@ -84,6 +87,7 @@ export default function PlayerPage() {
       
       wsRef.current.onmessage = (event) => {
         const data = JSON.parse(event.data)
+        trackSession(sessionRef.current, data)
         handleServerMessage(data)
       }
     } catch (error) {
@@ -110,10 +114,33 @@ export default function PlayerPage() {
 
   const handleServerMessage = (data: any) => {
     switch (data.action) {
+      case 'session':
+        // A resumed session keeps its registration and delta subscription, and gets the deltas it missed
+        if (data.resumed) break
+        sendMessage({ action: 'register_player', player_id: playerId })
+        // Only what changed (in this player's view) instead of the whole state on every update
+        stateSeqRef.current = null
+        sendMessage({ action: 'subscribe_deltas' })
+        break
       case 'game_state_update':
         setGameState(data.game_state)
         if (data.stats) setSessionStats(data.stats) // Always overwrite
         break
+      case 'state_snapshot':
+        stateSeqRef.current = data.seq
+        setGameState(data.game_state)
+        if (data.stats) setSessionStats(data.stats)
+        break
+      case 'state_delta':
+        if (stateSeqRef.current === null) break // a snapshot is on its way
+        if (data.base !== stateSeqRef.current) {
+          stateSeqRef.current = null
+          sendMessage({ action: 'request_snapshot' })
+          break
+        }
+        stateSeqRef.current = data.seq
+        setGameState(prev => applyDelta(prev, data.ops))
+        break
       case 'player_registered':
         addNotification(`Registered as ${data.player_id}`)
         // Do NOT update sessionStats here; wait for game_state_update or round_completed
@@ -0,0 +1,24 @@
+// Resumable sessions (see sessions.py on the server). Every connection gets { action: 'session', token, ... }
+// and every table event carries event_seq. Reconnecting with the token and the last event_seq seen gets the
+// connection's registrations back and only the events it missed; the session message then says resumed: true.
+// If the server could not resume (unknown or expired token), it answers resumed: false like a new connection,
+// and the page has to register again.
+
+export interface SessionState {
+  token: string | null
+  seq: number | null
+}
+
+// The URL to connect to: base, or base resuming the session
+export function sessionUrl(base: string, session: SessionState): string {
+  if (!session.token) return base
+  const params = new URLSearchParams({ resume: session.token })
+  if (session.seq !== null) params.set('seq', String(session.seq))
+  return `${base}/?${params}`
+}
+
+// Remembers the token and the last event_seq of every message received
+export function trackSession(session: SessionState, data: any) {
+  if (data.action === 'session') session.token = data.token
+  if (typeof data.event_seq === 'number') session.seq = data.event_seq
+}
@@ -0,0 +1,25 @@
+// Versioned state deltas (see state_sync.py on the server). After { action: 'subscribe_deltas' } a page gets
+// one state_snapshot, then state_delta messages whose ops patch it: [path, value] sets, [path] deletes.
+// A delta whose base is not the seq the page holds means one was missed: ask for a new snapshot.
+
+export type DeltaOp = [string[]] | [string[], any]
+
+// Returns a copy of state with the ops applied; only the objects along each op's path are copied
+export function applyDelta<T extends object>(state: T, ops: DeltaOp[]): T {
+  const next = { ...state } as Record<string, any>
+  for (const op of ops) {
+    const path = op[0]
+    let target = next
+    for (const key of path.slice(0, -1)) {
+      target[key] = { ...(target[key] ?? {}) }
+      target = target[key]
+    }
+    const last = path[path.length - 1]
+    if (op.length === 1) {
+      delete target[last]
+    } else {
+      target[last] = op[1]
+    }
+  }
+  return next as T
+}
@@ -0,0 +1,227 @@
+"""
+Append-only action journal for crash recovery.
+
+Every state-changing action is appended, after it has been handled, as one
+JSON line to the current journal segment:
+
+    {"seq": 812, "table": 3, "action": {"action": "deal_cards"}}
+    {"seq": 813, "table": 3, "action": {"action": "shuffle_deck"}, "decks": [[17, 4, 51, ...]]}
+
+Shuffles are the only randomness in a table, so the shoe orders an action
+created are stored with it ("decks", card codes top first) and handed back
+instead of shuffling again on replay. A table closed for being idle gets a
+{"action": "close_table"} entry; recovery skips everything before it for
+that table, so a closed table does not come back with its old state. Lines are written to the file as soon
+as they are appended, so a crashed process loses nothing; fsync is batched
+every fsync_interval seconds, so a power cut loses at most that much.
+
+Every snapshot_every entries, at the first moment no action is half done,
+the whole floor is written to snapshot.json (atomically, with the seq it
+covers) and a new segment is started; segments the snapshot covers are
+deleted. Recovery loads the snapshot and replays only
+the entries after it, so restart time stays bounded. Every start opens a new
+segment, so a torn last line from a crash is never appended to (and is
+skipped when read).
+
+    journal-00000000000000000001.jsonl
+    journal-00000000000000001001.jsonl
+    snapshot.json
+"""
+import asyncio
+import contextlib
+import contextvars
+import glob
+import json
+import os
+import time
+
+import log
+from shoe import Shoe
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PATTERN = "journal-*.jsonl"
+
+logger = log.get_logger("journal")
+
+# Shoe orders created by the action the current task is handling (connections handle actions concurrently)
+_action_decks = contextvars.ContextVar("journal_action_decks", default=None)
+
+
+class Journal:
+    def __init__(self, directory, fsync_interval=0.05, snapshot_every=1000):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_source = None  # callable returning the JSON-able state of every table
+        self.seq = 0
+        self.replaying = False
+        self.entries_since_snapshot = 0
+        self._file = None
+        self._dirty = False
+        self._flusher = None
+        self._snapshotting = None
+        self._in_flight = 0  # actions started and not yet recorded
+        self._replay_decks = []
+
+    @property
+    def enabled(self):
+        return self._file is not None
+
+    # --- recovery ---
+
+    def load(self):
+        """Returns (snapshot dict or None, list of entries after it), reading the directory as left by the last run."""
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = None
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot = json.load(f)
+        covered = snapshot["seq"] if snapshot else 0
+        entries = []
+        for path in self._segments():
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write at a crash; nothing valid can follow it in this segment
+                        logger.warning("Skipping incomplete entry at the end of %s", os.path.basename(path))
+                        break
+                    if entry["seq"] > covered:
+                        entries.append(entry)
+        self.seq = entries[-1]["seq"] if entries else covered
+        self.entries_since_snapshot = len(entries)
+        return snapshot, entries
+
+    def replay_decks(self, entry):
+        """Makes the shoe orders recorded with entry the ones create_deck returns while it is replayed."""
+        self._replay_decks = [list(codes) for codes in entry.get("decks", [])]
+
+    # --- recording ---
+
+    def open(self):
+        """Starts a new segment after load(); call from the running event loop."""
+        path = os.path.join(self.directory, f"journal-{self.seq + 1:020d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    def deck(self, shuffle):
+        """
+        Returns shuffle() and remembers its card codes for the action being
+        handled; while replaying, returns the recorded order instead.
+        """
+        if self.replaying:
+            return Shoe.from_codes(self._replay_decks.pop(0))
+        shoe = shuffle()
+        decks = _action_decks.get()
+        if decks is not None:
+            decks.append(shoe.to_codes())
+        return shoe
+
+    @contextlib.asynccontextmanager
+    async def action(self, table_id, action):
+        """
+        Wraps the handling of one state-changing action, which is recorded when
+        it is done. An action that fails halfway is recorded too: replaying it
+        fails at the same point and leaves the same state.
+        """
+        if not self.enabled or self.replaying:
+            yield
+            return
+        self._in_flight += 1
+        token = _action_decks.set([])
+        try:
+            yield
+        finally:
+            decks = _action_decks.get()
+            _action_decks.reset(token)
+            self._in_flight -= 1
+            self._record(table_id, action, decks)
+
+    def record(self, table_id, action):
+        """Records an action that is done in one step outside action(), like closing a table."""
+        if self.enabled and not self.replaying:
+            self._record(table_id, action, None)
+
+    def _record(self, table_id, action, decks):
+        self.seq += 1
+        entry = {"seq": self.seq, "table": table_id, "action": action}
+        if decks:
+            entry["decks"] = decks
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()  # to the OS now: survives a process crash; fsync follows in the batch
+        self._dirty = True
+        self.entries_since_snapshot += 1
+        # A snapshot must not catch an action halfway (it would be replayed on top of its own effects)
+        if self.entries_since_snapshot >= self.snapshot_every and self._in_flight == 0 and self._snapshotting is None:
+            self.snapshot()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self._dirty:
+                self._dirty = False
+                try:
+                    await asyncio.to_thread(os.fsync, self._file.fileno())
+                except (OSError, ValueError):
+                    pass  # the segment was closed by a snapshot, which fsyncs it itself
+
+    # --- snapshots ---
+
+    def snapshot(self):
+        """
+        Takes the state of every table as of the current seq and starts a new
+        segment; writing the snapshot and dropping covered segments happens in
+        a thread. Call only when no action is in flight.
+        """
+        try:
+            data = json.dumps({"seq": self.seq, "time": time.time(), "tables": self.snapshot_source()},
+                              separators=(",", ":"))
+        except Exception as e:
+            logger.error("Snapshot failed: %s", e)
+            return
+        old_segments = self._segments()
+        old_file = self._file
+        self._file = open(os.path.join(self.directory, f"journal-{self.seq + 1:020d}.jsonl"), "a", encoding="utf-8")
+        self.entries_since_snapshot = 0
+        self._snapshotting = asyncio.create_task(self._write_snapshot(self.seq, data, old_file, old_segments))
+
+    async def _write_snapshot(self, seq, data, old_file, old_segments):
+        try:
+            await asyncio.to_thread(self._write_snapshot_file, data, old_file, old_segments)
+            logger.info("Snapshot at seq %d (%d bytes)", seq, len(data))
+        except Exception as e:
+            logger.error("Snapshot failed: %s", e)
+        finally:
+            self._snapshotting = None
+
+    def _write_snapshot_file(self, data, old_file, old_segments):
+        os.fsync(old_file.fileno())
+        old_file.close()
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        # Only once the snapshot is durable are the segments it covers redundant
+        for segment in old_segments:
+            os.remove(segment)
+
+    async def close(self):
+        """Waits for a running snapshot, then fsyncs and closes the current segment."""
+        if self._snapshotting is not None:
+            await self._snapshotting
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
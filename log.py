@@ -0,0 +1,201 @@
+"""
+Structured logging for the server, on top of the standard logging module.
+
+Each subsystem logs to its own category (logger "casino_war.<category>"):
+
+    logger = log.get_logger("broadcast")
+    logger.debug("to all", extra={"table": table.table_id, "payload": payload})
+
+Nothing is formatted or written on the event loop. Records go through a
+bounded queue to a QueueListener thread, which merges the message arguments,
+renders the extra fields (key=value text, or one JSON object per line) and
+writes them out. Level and sampling are checked before a record is even
+created, so a disabled or sampled-out debug call costs a level check and an
+addition. If the writer falls behind, records are dropped and counted
+instead of blocking the server.
+
+Arguments and extra fields are read later, in the listener thread, so pass
+values that are not changed afterwards: ids, numbers, already-encoded
+payloads, the raw message text.
+
+Configuration (see configure(), and the LOG_* settings in casino_war_backend.py):
+    level     default level of every category, e.g. "INFO"
+    levels    per-category levels: {"broadcast": "DEBUG"} or "broadcast=DEBUG,messages=DEBUG"
+    sample    per-category share of sub-WARNING records kept: {"broadcast": 0.01}
+    fmt       "text" or "json"
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+ROOT = "casino_war"
+QUEUE_SIZE = 10000  # records waiting for the writer thread before new ones are dropped
+PAYLOAD_LIMIT = 500  # characters of a payload field shown in the log
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+_handler = None
+_loggers = {}
+
+
+class CategoryLogger(logging.LoggerAdapter):
+    """
+    The logger of one category. Below WARNING only an even share (sample_rate)
+    of the calls produce a record; warnings and errors are never sampled.
+    """
+
+    def __init__(self, category):
+        super().__init__(logging.getLogger(f"{ROOT}.{category}"), None)
+        self.sample_rate = 1.0
+        self._credit = 0.0
+
+    def isEnabledFor(self, level):
+        if not self.logger.isEnabledFor(level):
+            return False
+        if level >= logging.WARNING or self.sample_rate >= 1.0:
+            return True
+        self._credit += self.sample_rate
+        if self._credit >= 1.0:
+            self._credit -= 1.0
+            return True
+        return False
+
+    # The hot calls, without LoggerAdapter.log() in between
+    def debug(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.DEBUG):
+            self.logger.debug(msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self.isEnabledFor(logging.INFO):
+            self.logger.info(msg, *args, **kwargs)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs  # keep the caller's extra= as it is
+
+
+def get_logger(category):
+    logger = _loggers.get(category)
+    if logger is None:
+        logger = _loggers[category] = CategoryLogger(category)
+    return logger
+
+
+def parse_pairs(text):
+    """Parses "key=value,key=value" settings into a dict."""
+    pairs = {}
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        key, sep, value = entry.partition("=")
+        if not sep or not key.strip() or not value.strip():
+            raise ValueError(f"Invalid log setting {entry!r}, expected category=value")
+        pairs[key.strip()] = value.strip()
+    return pairs
+
+
+def _fields(record):
+    fields = {}
+    for key, value in vars(record).items():
+        if key not in _RECORD_ATTRIBUTES:
+            if isinstance(value, (bytes, str)) and len(value) > PAYLOAD_LIMIT:
+                value = f"{value[:PAYLOAD_LIMIT]}... ({len(value)} chars)"
+            fields[key] = value
+    return fields
+
+
+class TextFormatter(logging.Formatter):
+    """2025-01-01 20:00:00.123 INFO [clients] connected table=3 address=('127.0.0.1', 50000)"""
+
+    def format(self, record):
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        category = record.name[len(ROOT) + 1:] or ROOT
+        line = f"{created}.{int(record.msecs):03d} {record.levelname} [{category}] {record.getMessage()}"
+        for key, value in _fields(record).items():
+            line += f" {key}={value}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, category, message and the extra fields."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "category": record.name[len(ROOT) + 1:] or ROOT,
+            "message": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records untouched (the stock QueueHandler formats them in the
+    caller's thread) and drops them when the queue is full.
+    """
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener whose stop() waits for room in a full queue instead of failing."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def configure(level="INFO", levels=None, sample=None, fmt="text", stream=None):
+    """Routes every category through the queue to stream (stdout by default); safe to call again."""
+    global _listener, _handler
+    shutdown()
+    if isinstance(levels, str):
+        levels = parse_pairs(levels)
+    if isinstance(sample, str):
+        sample = {category: float(rate) for category, rate in parse_pairs(sample).items()}
+
+    output = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    _handler = DeferredQueueHandler(queue.Queue(QUEUE_SIZE))
+    _listener = DrainingQueueListener(_handler.queue, output)
+
+    root = logging.getLogger(ROOT)
+    root.handlers = [_handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+    for category, category_level in (levels or {}).items():
+        get_logger(category).logger.setLevel(category_level.upper())
+    for category, rate in (sample or {}).items():
+        get_logger(category).sample_rate = rate
+    _listener.start()
+
+
+def dropped():
+    """Records dropped because the writer thread fell behind."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def shutdown():
+    """Writes out everything still queued and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
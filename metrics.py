@@ -0,0 +1,189 @@
+"""
+In-process metrics: counters, gauges and latency histograms, served as
+Prometheus text from a small HTTP endpoint on the server's event loop.
+
+    curl http://localhost:9100/metrics
+
+Metrics are created once, at import time, next to the code they measure:
+
+    BROADCAST_SECONDS = metrics.Histogram("casino_war_broadcast_seconds", "Time to queue one broadcast")
+    ...
+    BROADCAST_SECONDS.observe(time.perf_counter() - start)
+
+Recording is a dict lookup, a bisect and two additions, with no locks (the
+server is single-threaded); all formatting happens when the endpoint is
+scraped. Label values are passed positionally in the order of `labels`;
+keep them to small, fixed sets (action names, not player ids).
+"""
+import asyncio
+import contextlib
+import time
+from bisect import bisect_left
+
+import log
+
+# Seconds; covers sub-millisecond in-memory handling up to slow MongoDB calls
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_registry = []
+
+logger = log.get_logger("metrics")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def samples(self):
+        for label_values, value in sorted(self._values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Gauge:
+    """
+    A value read when the endpoint is scraped: collect() returns a number, or
+    {label values tuple: number} when the gauge has labels.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, collect, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        _registry.append(self)
+
+    def samples(self):
+        values = self.collect()
+        if not self.labels:
+            yield self.name, "", values
+            return
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Observations counted into fixed buckets (plus their sum) per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [count per bucket (last is +Inf)..., sum]
+        _registry.append(self)
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        bounds = self.buckets + (float("inf"),)
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield self.name + "_bucket", _format_labels(self.labels, label_values, le), cumulative
+            labels = _format_labels(self.labels, label_values)
+            yield self.name + "_sum", labels, series[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+@contextlib.contextmanager
+def timer(histogram, *label_values):
+    """Observes the time the with block took, also when it raises (for calls that are slow anyway, like MongoDB)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *label_values)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        except Exception as e:
+            logger.error("Collecting %s failed: %s", metric.name, e)
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_request(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Skip the headers; nothing in them matters here
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, body = "200 OK", render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"Not found; metrics are at /metrics\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    """Starts the /metrics endpoint on the running loop; returns the asyncio server (close() it on shutdown)."""
+    server = await asyncio.start_server(_handle_request, host, port)
+    logger.info("Serving http://%s:%d/metrics", host, port)
+    return server
+
+
+# Shared by every module that talks to MongoDB (result_writer.py, player_stats.py)
+MONGO_SECONDS = Histogram("casino_war_mongo_seconds", "MongoDB call latency", labels=("operation",))
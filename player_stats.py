@@ -0,0 +1,101 @@
+"""
+Materialized per-player stats.
+
+One document per player in the player_stats collection, keyed by player id:
+    {"_id": player_id, "wins": 3, "losses": 5, "ties": 1, "surrenders": 0, "total_games": 9}
+The counters are bumped with $inc upserts whenever results are persisted, so
+reading a player's stats is a single _id lookup no matter how long their history is.
+
+Rebuild the counters from game_results (run with the server stopped):
+    python player_stats.py backfill
+"""
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+import metrics
+from metrics import MONGO_SECONDS
+
+# game_results "result" value -> counter field
+RESULT_FIELDS = {"win": "wins", "lose": "losses", "tie": "ties", "surrender": "surrenders"}
+
+def empty_stats():
+    return {"wins": 0, "losses": 0, "ties": 0, "surrenders": 0, "total_games": 0}
+
+def stats_from_doc(doc):
+    """Turns a player_stats document (or None) into the stats dict sent to clients."""
+    stats = empty_stats()
+    if doc:
+        for field in stats:
+            stats[field] = doc.get(field, 0)
+    return stats
+
+def count_results(docs, direction=1):
+    """Sums game_results documents into {player_id: {counter_field: delta}}."""
+    increments = {}
+    for doc in docs:
+        field = RESULT_FIELDS.get(doc.get("result"))
+        if field is None:
+            continue
+        counters = increments.setdefault(doc["player_id"], {})
+        counters[field] = counters.get(field, 0) + direction
+        counters["total_games"] = counters.get("total_games", 0) + direction
+    return increments
+
+async def increment_player_stats(stats_collection, docs, direction=1):
+    """Applies persisted (direction=1) or deleted (direction=-1) results to the counters."""
+    increments = count_results(docs, direction)
+    if not increments:
+        return
+    with metrics.timer(MONGO_SECONDS, "bulk_write"):
+        await stats_collection.bulk_write([
+            UpdateOne({"_id": player_id}, {"$inc": counters}, upsert=True)
+            for player_id, counters in increments.items()
+        ], ordered=False)
+
+async def get_player_stats(stats_collection, player_id):
+    """O(1) read of one player's stats."""
+    with metrics.timer(MONGO_SECONDS, "find_one"):
+        doc = await stats_collection.find_one({"_id": player_id})
+    return stats_from_doc(doc)
+
+async def get_bulk_player_stats(stats_collection, player_ids):
+    """Stats for many players with one indexed $in lookup: {player_id: stats}."""
+    player_ids = list(player_ids)
+    stats = {player_id: empty_stats() for player_id in player_ids}
+    if not player_ids:
+        return stats
+    with metrics.timer(MONGO_SECONDS, "find"):
+        async for doc in stats_collection.find({"_id": {"$in": player_ids}}):
+            stats[doc["_id"]] = stats_from_doc(doc)
+    return stats
+
+async def rebuild_player_stats(results_collection, stats_collection):
+    """Recomputes every player's counters from game_results and atomically replaces player_stats."""
+    pipeline = [
+        {"$group": {
+            "_id": "$player_id",
+            "wins": {"$sum": {"$cond": [{"$eq": ["$result", "win"]}, 1, 0]}},
+            "losses": {"$sum": {"$cond": [{"$eq": ["$result", "lose"]}, 1, 0]}},
+            "ties": {"$sum": {"$cond": [{"$eq": ["$result", "tie"]}, 1, 0]}},
+            "surrenders": {"$sum": {"$cond": [{"$eq": ["$result", "surrender"]}, 1, 0]}},
+            "total_games": {"$sum": 1}
+        }},
+        {"$out": stats_collection.name},
+    ]
+    with metrics.timer(MONGO_SECONDS, "aggregate"):
+        cursor = results_collection.aggregate(pipeline)
+        await cursor.to_list(length=None)
+    return await stats_collection.count_documents({})
+
+async def backfill():
+    from casino_war_backend import results_collection, stats_collection
+    count = await rebuild_player_stats(results_collection, stats_collection)
+    print(f"[MONGODB] Rebuilt stats for {count} players into '{stats_collection.name}'")
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python player_stats.py backfill")
+        sys.exit(1)
+    asyncio.run(backfill())
@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+from pymongo.errors import BulkWriteError
+
+import log
+import metrics
+from metrics import MONGO_SECONDS
+
+# MongoDB duplicate key error; seen when a retried batch was partly written already
+DUPLICATE_KEY_ERROR = 11000
+
+logger = log.get_logger("mongodb")
+
+RESULTS_WRITTEN = metrics.Counter("casino_war_results_written_total", "Round results stored in MongoDB")
+RESULTS_DROPPED = metrics.Counter("casino_war_results_dropped_total", "Round results given up on")
+INSERT_RETRIES = metrics.Counter("casino_war_results_insert_retries_total", "Failed insert_many calls that were retried")
+
+
+class ResultWriter:
+    """
+    Write-behind persistence for round results.
+
+    Results are queued in memory and written with insert_many once batch_size
+    documents are waiting or flush_interval seconds have passed since the first
+    one arrived. The queue is bounded: when MongoDB falls behind, submit() waits
+    for room instead of letting memory grow (backpressure).
+    """
+
+    def __init__(self, collection, batch_size=100, flush_interval=0.25, max_queue=5000,
+                 write_concern=None, max_retries=5, retry_delay=0.1):
+        if write_concern is not None:
+            collection = collection.with_options(write_concern=write_concern)
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.on_written = []  # async callbacks, called with each batch of documents once it is stored
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        """Starts the background flush task on the running loop (safe to call repeatedly)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, docs):
+        """Queues documents for writing; only waits when the queue is full."""
+        self.start()
+        for doc in docs:
+            await self._queue.put(doc)
+
+    async def flush(self):
+        """Waits until everything submitted so far has been written (or given up on)."""
+        if self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def stop(self):
+        """Flushes the queue and stops the background task; call on shutdown."""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch):
+        failed = set()
+        for attempt in range(self.max_retries + 1):
+            try:
+                # insert_many sets _id on the documents, so a retry cannot insert duplicates
+                with metrics.timer(MONGO_SECONDS, "insert_many"):
+                    await self.collection.insert_many(batch, ordered=False)
+                break
+            except BulkWriteError as e:
+                errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+                if errors:
+                    logger.error("Failed to insert %d of %d results: %s", len(errors), len(batch), errors[0].get("errmsg"))
+                failed = {err.get("index") for err in errors}
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error("Giving up on %d results after %d attempts: %s", len(batch), attempt + 1, e)
+                    failed = set(range(len(batch)))
+                    break
+                logger.warning("Insert of %d results failed, retrying: %s", len(batch), e)
+                INSERT_RETRIES.inc()
+                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+        written = [doc for index, doc in enumerate(batch) if index not in failed]
+        self.dropped += len(failed)
+        self.written += len(written)
+        RESULTS_DROPPED.inc(amount=len(failed))
+        RESULTS_WRITTEN.inc(amount=len(written))
+        logger.debug("Inserted %d documents", len(written))
+        for callback in self.on_written:
+            try:
+                await callback(written)
+            except Exception as e:
+                logger.error("Post-insert update failed: %s", e)
@@ -0,0 +1,31 @@
+"""
+Casino War card rules, shared by the table server and simulation.py.
+
+Only card ranks matter (Ace is highest, suits never break ties). Round flow
+(burns, war/surrender choices) lives in casino_war_backend.py; the simulator
+mirrors it and takes every card comparison from compare_cards below.
+"""
+
+# Card values for comparison (Ace is highest)
+CARD_VALUES = {
+    'A': 14, 'K': 13, 'Q': 12, 'J': 11, 'T': 10,
+    '9': 9, '8': 8, '7': 7, '6': 6, '5': 5, '4': 4, '3': 3, '2': 2
+}
+
+def get_card_value(card):
+    """Returns the numerical value of a card for comparison."""
+    if not card or len(card) < 2:
+        return 0
+    return CARD_VALUES.get(card[0], 0)
+
+def compare_cards(player_card, dealer_card):
+    """Compares two cards and returns result."""
+    player_val = get_card_value(player_card)
+    dealer_val = get_card_value(dealer_card)
+
+    if player_val > dealer_val:
+        return "win"
+    elif player_val < dealer_val:
+        return "lose"
+    else:
+        return "tie"
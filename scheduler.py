@@ -0,0 +1,160 @@
+"""
+A hashed timer wheel: every deadline in the process on one task.
+
+Automatic tables each wait for something (the choice deadline, the pause
+between rounds). One sleeping task per table would work, but that means
+hundreds of tasks and timer handles churning every few seconds. The wheel
+instead keeps timers in `slots` buckets by the tick they fall due in and
+sleeps until the earliest deadline in the first bucket that has a timer due
+(looking at most a rotation ahead), then fires what is due:
+
+    wheel = TimerWheel(tick=0.01)
+    timer = wheel.call_later(3.0, table.executor.submit, auto_step, table)
+    ...
+    timer.cancel()
+
+A timer fires at its deadline, never before it, as late as a loop.call_at
+handle would; the tick only sets how timers are bucketed, not how precise
+they are. Empty ticks are slept through. Adding and cancelling a timer is
+O(1); a wakeup costs the timers in the due buckets plus a scan for the
+next one, so a coarser tick means fewer buckets to scan. Callbacks run on the wheel's task and must
+not block; hand real work to a task or a table executor.
+"""
+import asyncio
+import math
+
+import log
+import metrics
+
+TICK = 0.01  # seconds per tick (the bucket width)
+SLOTS = 512  # buckets; timers further out than TICK * SLOTS stay in their bucket for more rotations
+
+logger = log.get_logger("scheduler")
+
+TIMER_LATENESS = metrics.Histogram("casino_war_timer_lateness_seconds",
+                                   "How long after its deadline a timer fired",
+                                   buckets=(0.001, 0.005, 0.01, 0.02, 0.03, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+
+class Timer:
+    """A pending call_later(); cancel() it to keep it from firing."""
+
+    __slots__ = ("deadline", "tick", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, tick, callback, args):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Runs callbacks after a delay, all from one task (see module docstring)."""
+
+    def __init__(self, tick=TICK, slots=SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.pending = 0  # timers in the wheel, including cancelled ones not swept yet
+        self._origin = None  # loop time of tick 0
+        self._current = 0  # last tick whose bucket was fired
+        self._sleep = None  # future the task waits on; resolved at _wake_at or by an earlier timer
+        self._wake_at = math.inf
+        self._task = None
+
+    def _now(self):
+        return asyncio.get_running_loop().time()
+
+    def start(self):
+        """Starts the wheel's task on the running loop; call_later() does this on first use."""
+        if self._task is None or self._task.done():
+            if self._origin is None:
+                self._origin = self._now()
+            self._task = asyncio.create_task(self._run(), name="timer-wheel")
+
+    async def stop(self):
+        """Stops the task; pending timers stay in the wheel and fire if it is started again."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def call_later(self, delay, callback, *args):
+        """Calls callback(*args) from the wheel's task once delay seconds have passed; returns the Timer."""
+        self.start()
+        now = self._now()
+        if not self.pending:  # the wheel was idle: catch up without firing anything
+            self._current = max(self._current, math.floor((now - self._origin) / self.tick))
+        deadline = now + max(0.0, delay)
+        # The first tick that starts at or after the deadline, and not one already fired
+        tick = max(self._current + 1, math.ceil((deadline - self._origin) / self.tick))
+        timer = Timer(deadline, tick, callback, args)
+        self.slots[tick % len(self.slots)].append(timer)
+        self.pending += 1
+        if deadline < self._wake_at:
+            _wake(self._sleep)  # due before the task means to wake up
+        return timer
+
+    def _next_deadline(self):
+        """The earliest deadline in the first bucket with a timer due, looking at most a rotation ahead."""
+        slots = self.slots
+        for tick in range(self._current + 1, self._current + len(slots) + 1):
+            bucket = slots[tick % len(slots)]
+            if bucket:
+                due = [timer.deadline for timer in bucket if timer.tick <= tick]
+                if due:
+                    return min(due)
+        return self._origin + (self._current + len(slots)) * self.tick
+
+    def _fire(self, tick, now):
+        bucket = self.slots[tick % len(self.slots)]
+        due = [timer for timer in bucket if timer.tick <= tick and timer.deadline <= now]
+        if not due:
+            return
+        bucket[:] = [timer for timer in bucket if timer.tick > tick or timer.deadline > now]
+        self.pending -= len(due)
+        for timer in due:
+            if timer.cancelled:
+                continue
+            TIMER_LATENESS.observe(now - timer.deadline)
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                logger.exception("Timer callback %s failed", getattr(timer.callback, "__name__", timer.callback))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        slots = self.slots
+        while True:
+            self._sleep = loop.create_future()
+            handle = None
+            if self.pending:
+                self._wake_at = self._next_deadline()
+                handle = loop.call_at(self._wake_at, _wake, self._sleep)
+            else:
+                self._wake_at = math.inf  # until call_later
+            try:
+                await self._sleep
+            finally:
+                if handle is not None:
+                    handle.cancel()
+            now = self._now()
+            # Ticks that are over, and the one in progress for the timers already due in it
+            target = math.floor((now - self._origin) / self.tick)
+            # After a stall longer than a rotation every bucket is due once; visit each only once
+            first = max(self._current + 1, target - len(slots) + 2)
+            for tick in range(first, target + 2):
+                if slots[tick % len(slots)]:
+                    self._fire(tick, now)
+            self._current = max(self._current, target)
+
+
+def _wake(future):
+    if future is not None and not future.done():
+        future.set_result(None)
@@ -0,0 +1,145 @@
+"""
+Resumable client sessions and per-table event logs.
+
+Every table event a client can receive (broadcasts to everyone or to the
+dealers, game_state_update, state_delta) carries the table's "event_seq",
+and its payload is kept in the table's EventLog, a ring bounded by count and
+bytes. Every connection gets a session token:
+
+    {"action": "session", "token": "kq3...", "event_seq": 812, "resumed": false}
+
+When a connection drops, its session (table, dealer/player/delta
+registrations and topic subscriptions) is kept for SESSION_TTL seconds. A client that reconnects
+with its token and the last event_seq it received,
+
+    ws://localhost:6790/?resume=kq3...&seq=812
+
+gets its registrations back without re-registering (no player stats
+lookup), then only the events it missed, then a "session" message with
+"resumed": true. If the events are no longer all in the log, if they add
+up to more bytes than the state snapshot they lead to, or if the seq is
+unknown (the server restarted), it gets a full state snapshot instead, the
+way a new connection does. Of the missed game_state_update snapshots only
+the latest is kept and sent, since each one supersedes the ones before it.
+
+A token that is still attached to an open connection (the server has not
+noticed the drop yet) is taken over; the old connection is closed.
+"""
+import collections
+import secrets
+import time
+
+import metrics
+
+EVENT_LOG_EVENTS = 256  # events kept per table for resuming clients
+EVENT_LOG_BYTES = 128 * 1024  # and at most this much payload
+SESSION_TTL = 300.0  # seconds a dropped connection's session can be resumed
+
+SESSION_RESUMES = metrics.Counter("casino_war_session_resumes_total",
+                                  "Reconnects with a session token, by how they were served",
+                                  labels=("result",))
+EVENTS_REPLAYED = metrics.Counter("casino_war_events_replayed_total", "Missed events sent to resuming clients")
+
+
+class EventLog:
+    """The recent events of one table: [seq, audience, payload], oldest first."""
+
+    def __init__(self, max_events=EVENT_LOG_EVENTS, max_bytes=EVENT_LOG_BYTES):
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.seq = 0  # seq of the last event
+        self._entries = collections.deque()
+        self._bytes = 0
+        self._evicted = 0  # seq of the last event no longer in the log
+        self._snapshot = None  # entry of the latest "snapshot" event
+
+    def next_seq(self):
+        """Numbers the next event; append() it once it is encoded."""
+        self.seq += 1
+        return self.seq
+
+    def append(self, seq, audience, payload):
+        entry = [seq, audience, payload]
+        if audience == "snapshot":
+            # A newer full state makes the older one useless to a resuming client
+            if self._snapshot is not None and self._snapshot[2] is not None:
+                self._bytes -= len(self._snapshot[2])
+                self._snapshot[2] = None
+            self._snapshot = entry
+        self._entries.append(entry)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_events or (self._bytes > self.max_bytes and len(self._entries) > 1):
+            evicted = self._entries.popleft()
+            self._evicted = evicted[0]
+            if evicted[2] is not None:
+                self._bytes -= len(evicted[2])
+
+    def since(self, seq, audiences):
+        """(seq, payload) of the events for audiences after seq, in order; None if some are gone (or seq is unknown)."""
+        if seq > self.seq or seq < self._evicted:
+            return None
+        return [(entry_seq, payload) for entry_seq, audience, payload in self._entries
+                if entry_seq > seq and payload is not None and audience in audiences]
+
+
+class Session:
+    __slots__ = ("token", "conn", "table_id", "registrations", "expires")
+
+    def __init__(self, token, conn):
+        self.token = token
+        self.conn = conn  # the dispatch Connection while attached, None while waiting to be resumed
+        self.table_id = None
+        self.registrations = None  # what the connection had registered for at its table, while detached
+        self.expires = None
+
+
+class SessionStore:
+    """Session tokens of current and recently dropped connections (see module docstring)."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}  # token -> Session
+        self._detached = collections.OrderedDict()  # token -> Session, in order of expiry
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def create(self, conn):
+        self._expire()
+        session = Session(secrets.token_urlsafe(16), conn)
+        self._sessions[session.token] = session
+        return session
+
+    def claim(self, token, conn):
+        """
+        Attaches the session of token to conn. Returns (session, the connection it
+        was still attached to or None), or (None, None) if the token is unknown or expired.
+        """
+        self._expire()
+        session = self._sessions.get(token)
+        if session is None:
+            return None, None
+        self._detached.pop(token, None)
+        session.expires = None
+        previous, session.conn = session.conn, conn
+        return session, previous
+
+    def detach(self, session, conn, table_id, registrations):
+        """Keeps a dropped connection's session, with its registrations, for ttl seconds."""
+        if session.conn is not conn:
+            return  # already resumed on another connection
+        session.conn = None
+        session.table_id = table_id
+        session.registrations = registrations
+        session.expires = time.monotonic() + self.ttl
+        self._detached[session.token] = session
+        self._expire()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._detached:
+            token, session = next(iter(self._detached.items()))
+            if session.expires > now:
+                break
+            del self._detached[token]
+            del self._sessions[token]
@@ -0,0 +1,123 @@
+"""
+The dealing shoe.
+
+Every operation the table needs:
+
+    draw()          take the top card                      (was deck.pop(0))
+    put_back(card)  return a card to the top, e.g. on undo  (was deck.insert(0, card))
+    card in shoe    is at least one copy left?              (was card in deck)
+    remove(card)    take the first copy from anywhere       (was deck.remove(card))
+
+Cards are compact integer codes (rank index * 4 + suit index) in a deque,
+top first, so draw() and put_back() are a popleft() and an appendleft(). A
+52-entry array keeps the copies left of each code, so "card in shoe" and
+count() are O(1). remove() is the one linear operation, a scan for a small
+int done in C that stops at the first copy; live play only ever removes
+cards it found with "in" first. The order is exactly what the list
+operations produced, which undo relies on.
+"""
+import random
+from collections import deque
+
+RANKS = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K"]
+SUITS = ["S", "D", "C", "H"]
+DECKS_PER_SHOE = 6
+
+CARD_NAMES = [rank + suit for rank in RANKS for suit in SUITS]  # code -> "AS"
+CARD_CODES = {name: code for code, name in enumerate(CARD_NAMES)}  # "AS" -> code
+
+
+def encode_card(card):
+    """Returns the integer code of a card string, raising ValueError for anything else."""
+    try:
+        return CARD_CODES[card]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid card: {card!r}") from None
+
+
+def decode_card(code):
+    return CARD_NAMES[code]
+
+
+class Shoe:
+    """A shoe of cards, top first. See the module docstring for the operations."""
+
+    __slots__ = ("_cards", "_counts")
+
+    def __init__(self, cards=()):
+        self._cards = deque()  # card codes, top first
+        self._counts = [0] * len(CARD_NAMES)  # per code, copies left
+        self._extend(map(encode_card, cards))
+
+    @classmethod
+    def from_codes(cls, codes, decks=None):
+        """A shoe of codes, top first; decks says they are that many complete decks, which saves counting them."""
+        shoe = cls()
+        if decks is None:
+            shoe._extend(codes)
+        else:
+            shoe._cards.extend(codes)
+            shoe._counts = [decks] * len(CARD_NAMES)
+        return shoe
+
+    def _extend(self, codes):
+        """Adds codes under the cards of a new shoe."""
+        cards = self._cards
+        cards.extend(codes)
+        counts = self._counts
+        for code in cards:
+            counts[code] += 1
+
+    @classmethod
+    def shuffled(cls, decks=DECKS_PER_SHOE, rng=random):
+        """A freshly shuffled shoe of `decks` standard 52-card decks."""
+        codes = list(range(len(CARD_NAMES))) * decks
+        rng.shuffle(codes)
+        return cls.from_codes(codes, decks)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __contains__(self, card):
+        code = CARD_CODES.get(card)
+        return code is not None and self._counts[code] > 0
+
+    def __iter__(self):
+        return map(CARD_NAMES.__getitem__, self._cards)
+
+    def __repr__(self):
+        return f"Shoe({len(self)} cards)"
+
+    def count(self, card):
+        code = CARD_CODES.get(card)
+        return 0 if code is None else self._counts[code]
+
+    def draw(self):
+        """Removes and returns the top card; raises IndexError when the shoe is empty."""
+        try:
+            code = self._cards.popleft()
+        except IndexError:
+            raise IndexError("draw from an empty shoe") from None
+        self._counts[code] -= 1
+        return CARD_NAMES[code]
+
+    def put_back(self, card):
+        """Puts a card back on top of the shoe."""
+        code = encode_card(card)
+        self._cards.appendleft(code)
+        self._counts[code] += 1
+
+    def remove(self, card):
+        """Takes the topmost copy of card out of the shoe; raises ValueError if none is left."""
+        code = CARD_CODES.get(card)
+        if code is None or not self._counts[code]:
+            raise ValueError(f"{card!r} is not in the shoe")
+        self._cards.remove(code)
+        self._counts[code] -= 1
+
+    def to_list(self):
+        return list(self)
+
+    def to_codes(self):
+        """The remaining cards as integer codes, top first (Shoe.from_codes restores the same shoe)."""
+        return list(self._cards)
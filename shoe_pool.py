@@ -0,0 +1,191 @@
+"""
+Pre-shuffled shoes with auditable seeds.
+
+Every shoe is the Fisher-Yates shuffle of DECKS_PER_SHOE ordered decks,
+driven by SHAKE-256 of a 32-byte seed from the secrets module (the OS
+CSPRNG) instead of the Mersenne Twister. The seed alone determines the
+order, so it is all an auditor needs to reproduce a shoe:
+
+    python shoe_pool.py reproduce 9f86d081884c7d65...
+    python shoe_pool.py verify shoe_audit.jsonl
+
+ShoePool keeps a few shoes shuffled ahead of time, refilled by a background
+task that runs each shuffle in a worker thread (asyncio.to_thread), so the
+event loop never waits for one and take() at shuffle_deck costs building a
+Shoe from a ready list. When a burst of shuffles empties the pool, take()
+shuffles inline. Every shoe put in play is appended to the audit log as one
+JSON line: time, table, seed, algorithm, decks and the SHA-256 of the
+resulting card order. The log reveals the order of every shoe it lists,
+including the ones still being dealt, so it is created readable by its
+owner only.
+"""
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import secrets
+import struct
+import sys
+import time
+
+import log
+import metrics
+from shoe import CARD_NAMES, DECKS_PER_SHOE, Shoe
+
+ALGORITHM = "shake256-fisher-yates-v1"  # recorded with every seed; change it if the shuffle ever changes
+SEED_BYTES = 32
+POOL_SIZE = 4  # shoes kept shuffled ahead of time
+
+logger = log.get_logger("shoe")
+
+SHOES_ISSUED = metrics.Counter("casino_war_shoes_issued_total", "Shoes put in play, from the pool or shuffled inline",
+                               labels=("source",))
+
+
+def new_seed():
+    return secrets.token_bytes(SEED_BYTES)
+
+
+def shuffled_codes(seed, decks=DECKS_PER_SHOE):
+    """The card codes of the shoe `seed` stands for, top first."""
+    codes = list(range(len(CARD_NAMES))) * decks
+    # 32-bit draws from the SHAKE-256 stream; rejection sampling keeps every index equally likely.
+    # About one draw in 10^7 is rejected, so the stream is almost never extended.
+    shake = hashlib.shake_256(seed)
+    count = len(codes) + 16
+    draws = struct.unpack(f">{count}I", shake.digest(4 * count))
+    used = 0
+    for i in range(len(codes) - 1, 0, -1):
+        bound = i + 1
+        limit = (1 << 32) - (1 << 32) % bound
+        while True:
+            if used == len(draws):
+                count *= 2
+                draws = struct.unpack(f">{count}I", shake.digest(4 * count))  # same prefix, longer
+            value = draws[used]
+            used += 1
+            if value < limit:
+                break
+        j = value % bound
+        codes[i], codes[j] = codes[j], codes[i]
+    return codes
+
+
+def order_digest(codes):
+    """SHA-256 of a card order, as stored in the audit log."""
+    return hashlib.sha256(bytes(codes)).hexdigest()
+
+
+class ShoePool:
+    """Shoes shuffled ahead of time, each recorded in the audit log when it is taken (see module docstring)."""
+
+    def __init__(self, size=POOL_SIZE, decks=DECKS_PER_SHOE, audit_path=None):
+        self.size = size
+        self.decks = decks
+        self.audit_path = audit_path
+        self._ready = collections.deque()  # (seed, codes)
+        self._audit = None
+        self._task = None
+
+    def start(self):
+        """Starts filling the pool in the background on the running loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._fill())
+
+    def ready(self):
+        return len(self._ready)
+
+    def take(self, table_id=None):
+        """Returns a freshly shuffled Shoe for table_id and records it in the audit log."""
+        if self._ready:
+            seed, codes = self._ready.popleft()
+            SHOES_ISSUED.inc("pool")
+        else:
+            seed = new_seed()
+            codes = shuffled_codes(seed, self.decks)
+            SHOES_ISSUED.inc("inline")
+        self._record(seed, codes, table_id)
+        try:
+            self.start()
+        except RuntimeError:  # no running loop (tools and scripts): nothing to refill in the background
+            pass
+        return Shoe.from_codes(codes, self.decks)
+
+    def _record(self, seed, codes, table_id):
+        if not self.audit_path:
+            return
+        if self._audit is None:
+            fd = os.open(self.audit_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            self._audit = os.fdopen(fd, "a", encoding="utf-8")
+        self._audit.write(json.dumps({
+            "time": round(time.time(), 3),
+            "table": table_id,
+            "seed": seed.hex(),
+            "algorithm": ALGORITHM,
+            "decks": self.decks,
+            "digest": order_digest(codes),
+        }) + "\n")
+        self._audit.flush()
+
+    async def _fill(self):
+        while len(self._ready) < self.size:
+            seed = new_seed()
+            codes = await asyncio.to_thread(shuffled_codes, seed, self.decks)
+            self._ready.append((seed, codes))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._audit is not None:
+            self._audit.close()
+            self._audit = None
+
+
+def reproduce(seed_hex, decks):
+    codes = shuffled_codes(bytes.fromhex(seed_hex), decks)
+    names = [CARD_NAMES[code] for code in codes]
+    for start in range(0, len(names), 13):
+        print(" ".join(names[start:start + 13]))
+    print(f"digest {order_digest(codes)}")
+
+
+def verify(path):
+    """Recomputes every shoe in an audit log from its seed; returns the number of mismatches."""
+    shoes = mismatches = 0
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            shoes += 1
+            if entry["algorithm"] != ALGORITHM:
+                print(f"line {line_number}: unknown algorithm {entry['algorithm']!r}")
+                mismatches += 1
+            elif order_digest(shuffled_codes(bytes.fromhex(entry["seed"]), entry["decks"])) != entry["digest"]:
+                print(f"line {line_number}: shoe for table {entry['table']} does not match its seed")
+                mismatches += 1
+    print(f"{path}: {shoes} shoes, {mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shoe audit tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reproduce_parser = commands.add_parser("reproduce", help="print the card order of a seed, top first")
+    reproduce_parser.add_argument("seed", help="hex seed from the audit log")
+    reproduce_parser.add_argument("--decks", type=int, default=DECKS_PER_SHOE)
+    verify_parser = commands.add_parser("verify", help="check every shoe in an audit log against its seed")
+    verify_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "reproduce":
+        reproduce(args.seed, args.decks)
+    else:
+        sys.exit(1 if verify(args.path) else 0)
@@ -0,0 +1,278 @@
+"""
+Shoe reader ingestion.
+
+A card shoe reader sends one line per card over serial, e.g.
+    [Manual Burn Cards]<Card:AS>\\r\\n
+ShoeReader reads the port on its own thread, so a slow or half-received line
+never blocks the event loop, and hands each card over as soon as its line is
+complete (no polling interval). Lines are decoded strictly: an optional
+bracketed label followed by exactly one <Card:XX> with a valid card code.
+Anything else is counted and reported, never passed on.
+
+On the event loop cards arrive through an asyncio.Queue as ShoeCard tuples,
+for read_from_serial in casino_war_backend.py to feed handle_card_from_shoe.
+
+ShoeSimulator is a pseudo-terminal stand-in for the hardware (POSIX only):
+    python shoe_reader.py simulate --interval 0.5
+prints a port name that serial.Serial() and the server can open.
+"""
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+
+import log
+from shoe import RANKS, SUITS, Shoe
+
+MAX_FRAME_LENGTH = 128  # longest line accepted; anything longer is dropped as garbage
+READ_TIMEOUT = 0.2  # serial read timeout, only bounds how quickly stop() is noticed
+
+logger = log.get_logger("shoe")
+
+FRAME_PATTERN = re.compile(
+    rb"(?:\[[\x20-\x5a\x5e-\x7e]*\])?<Card:([" + "".join(RANKS).encode() + rb"][" + "".join(SUITS).encode() + rb"])>"
+)
+
+ShoeCard = namedtuple("ShoeCard", ["card", "frame", "received"])  # received: time.monotonic() at decode
+
+
+class FrameError(ValueError):
+    pass
+
+
+def decode_frame(frame):
+    """Returns the card in one frame (bytes, without the line ending); raises FrameError if it is malformed."""
+    frame = frame.rstrip(b"\r")
+    match = FRAME_PATTERN.fullmatch(frame)
+    if match is None:
+        raise FrameError(f"Malformed shoe frame: {frame!r}")
+    return match.group(1).decode("ascii")
+
+
+class FrameDecoder:
+    """Splits a byte stream into newline-terminated frames, dropping lines longer than max_length."""
+
+    def __init__(self, max_length=MAX_FRAME_LENGTH):
+        self.max_length = max_length
+        self.overlong = 0
+        self._buffer = bytearray()
+        self._discarding = False
+
+    def feed(self, data):
+        """Adds received bytes and returns the frames they completed (possibly none)."""
+        frames = []
+        self._buffer += data
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                if len(self._buffer) > self.max_length:
+                    # No line ending in sight: drop what we have and skip up to the next newline
+                    self._buffer.clear()
+                    if not self._discarding:
+                        self._discarding = True
+                        self.overlong += 1
+                return frames
+            frame = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+            if self._discarding:
+                self._discarding = False
+                continue
+            if len(frame) > self.max_length:
+                self.overlong += 1
+                continue
+            if frame.strip():
+                frames.append(frame)
+
+
+class ShoeReader:
+    """
+    Reads one serial shoe on a background thread and delivers decoded cards
+    to an asyncio.Queue. `done` is a future that resolves when the reader
+    stops: with None after stop(), or with the exception that ended it (the
+    device went away, for example).
+    """
+
+    def __init__(self, ser, queue, name=None, decoder=None, recorder=None):
+        self.serial = ser
+        self.queue = queue
+        self.name = name or getattr(ser, "port", "shoe")
+        self.decoder = decoder or FrameDecoder()
+        self.recorder = recorder  # a shoe_recording.ShoeRecorder that gets every raw frame
+        self.bytes = 0
+        self.frames = 0
+        self.cards = 0
+        self.errors = 0
+        self.done = None
+        self._loop = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Starts the reader thread; call from the event loop that consumes the queue."""
+        self._loop = asyncio.get_running_loop()
+        self.done = self._loop.create_future()
+        self._thread = threading.Thread(target=self._run, name=f"shoe-reader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        cancel_read = getattr(self.serial, "cancel_read", None)
+        if cancel_read is not None:
+            cancel_read()
+
+    async def wait_closed(self):
+        """Waits for the reader thread to exit after stop()."""
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+
+    async def get(self):
+        """
+        Returns the next ShoeCard. Once the reader has ended and every card it
+        decoded has been taken, returns None after stop() or raises the error that ended it.
+        """
+        while self.queue.empty():
+            if self.done.done():
+                return self.done.result()
+            getter = asyncio.ensure_future(self.queue.get())
+            await asyncio.wait([getter, self.done], return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                return getter.result()
+            getter.cancel()
+        return self.queue.get_nowait()
+
+    def _run(self):
+        error = None
+        try:
+            while not self._stopping.is_set():
+                # Blocks until at least one byte (or the timeout), then takes whatever else has arrived
+                data = self.serial.read(self.serial.in_waiting or 1)
+                if data:
+                    self._handle_bytes(data)
+        except Exception as e:
+            error = e
+        if self._stopping.is_set():
+            error = None  # errors from cancelling the read on the way out do not count
+        elif error is None:
+            error = EOFError("shoe reader stopped")
+        self._loop.call_soon_threadsafe(self._finish, error)
+
+    def _handle_bytes(self, data):
+        self.bytes += len(data)
+        overlong = self.decoder.overlong
+        for frame in self.decoder.feed(data):
+            self.frames += 1
+            if self.recorder is not None:
+                self.recorder.write(frame)
+            try:
+                card = decode_frame(frame)
+            except FrameError as e:
+                self.errors += 1
+                logger.warning("Bad frame: %s", e, extra={"port": self.name})
+                continue
+            self.cards += 1
+            self._loop.call_soon_threadsafe(self.queue.put_nowait, ShoeCard(card, frame, time.monotonic()))
+        if self.decoder.overlong != overlong:
+            self.errors += self.decoder.overlong - overlong
+            logger.warning("Dropped an overlong frame", extra={"port": self.name})
+
+    def _finish(self, error):
+        if self.done.done():
+            return
+        if error is None:
+            self.done.set_result(None)
+        else:
+            self.done.set_exception(error)
+            # Nobody may be awaiting done; do not let asyncio log it as never retrieved
+            self.done.exception()
+
+
+def open_serial(port, baudrate=9600):
+    import serial
+    return serial.Serial(port, baudrate, timeout=READ_TIMEOUT)
+
+
+def format_frame(card, label="Manual Burn Cards"):
+    return f"[{label}]<Card:{card}>\r\n".encode("ascii")
+
+
+class ShoeSimulator:
+    """
+    A pseudo-terminal that behaves like a shoe reader; open `port` with
+    serial.Serial (POSIX only). With `link`, port is a symlink that stays the
+    same across unplug()/replug(), like a device name does.
+    """
+
+    def __init__(self, link=None):
+        self.link = link
+        self.master = self._slave = None
+        self.replug()
+
+    def replug(self):
+        import pty  # POSIX only
+        import tty
+        self.master, self._slave = pty.openpty()
+        tty.setraw(self._slave)  # no echo or newline translation, like a real serial line
+        self.device = os.ttyname(self._slave)
+        if self.link:
+            temporary = f"{self.link}.new"
+            os.symlink(self.device, temporary)
+            os.replace(temporary, self.link)
+        self.port = self.link or self.device
+
+    def unplug(self):
+        """Closes the terminal (readers see the device vanish) and removes the link."""
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except (OSError, TypeError):
+                pass
+        self.master = self._slave = None
+        if self.link and os.path.lexists(self.link):
+            os.unlink(self.link)
+
+    def write(self, data):
+        os.write(self.master, data)
+
+    def send_card(self, card, label="Manual Burn Cards"):
+        self.write(format_frame(card, label))
+
+    async def deal(self, cards, interval=0.0):
+        """Sends cards one frame at a time, interval seconds apart."""
+        for card in cards:
+            self.send_card(card)
+            await asyncio.sleep(interval)
+
+    def close(self):
+        self.unplug()
+
+
+async def simulate(interval, count):
+    simulator = ShoeSimulator()
+    print(f"Simulated shoe on {simulator.port} (Ctrl+C to stop)", flush=True)
+    try:
+        sent = 0
+        while count is None or sent < count:
+            shoe = Shoe.shuffled(rng=random)
+            while shoe and (count is None or sent < count):
+                simulator.send_card(shoe.draw())
+                sent += 1
+                await asyncio.sleep(interval)
+    finally:
+        simulator.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shoe reader tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sim = commands.add_parser("simulate", help="run a pseudo-terminal shoe that deals shuffled shoes")
+    sim.add_argument("--interval", type=float, default=1.0, help="seconds between cards")
+    sim.add_argument("--count", type=int, default=None, help="stop after this many cards")
+    args = parser.parse_args()
+    try:
+        asyncio.run(simulate(args.interval, args.count))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,272 @@
+"""
+Recording and replay of shoe reader traffic.
+
+A recording is an append-only binary file of the raw frames one shoe sent,
+malformed ones included, with the time each arrived:
+
+    header  b"SHOEREC1", <d start time (epoch s)>, <H name length>, name (utf-8)
+    record  <Q microseconds since start>, <H frame length>, frame bytes
+
+ShoeReader writes one when it is given a ShoeRecorder (the server does this
+for every device when SHOE_RECORDING_DIR is set). A partly written last
+record, e.g. after a crash, is ignored on reading.
+
+replay() feeds a recording back to a card handler at the recorded pace, N
+times faster, or as fast as possible. From the command line it drives a
+fresh in-process table through the live-mode assignment path
+(handle_card_from_shoe), standing in for the dealer where the recording has
+no frames: evaluating complete rounds, answering ties, evaluating wars and
+clearing finished rounds, and shuffling a new shoe when a card is no
+longer in the current one.
+
+    python shoe_recording.py info recordings/ttyUSB0-20250101-200000.shoerec
+    python shoe_recording.py replay recordings/ttyUSB0-20250101-200000.shoerec --speed 10
+    python shoe_recording.py replay FILE --speed max --players 6 --dump-state
+    python shoe_recording.py synth FILE --cards 5000 --interval 1.5
+"""
+import asyncio
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+from shoe_reader import FrameError, decode_frame
+
+MAGIC = b"SHOEREC1"
+HEADER = struct.Struct("<dH")
+RECORD = struct.Struct("<QH")
+
+
+class ShoeRecorder:
+    """Appends frames to a recording; write() is safe to call from the reader thread."""
+
+    def __init__(self, path, name="shoe"):
+        self.path = path
+        self.frames = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        self._start_monotonic = time.monotonic()
+        start = time.time()
+        if self._file.tell() == 0:
+            encoded = name.encode("utf-8")
+            self._file.write(MAGIC + HEADER.pack(start, len(encoded)) + encoded)
+            self._file.flush()
+            self._offset = 0.0
+        else:
+            # Appending to an existing recording: keep its clock
+            with open(path, "rb") as existing:
+                recorded_start = read_header(existing)[0]
+            self._offset = start - recorded_start
+
+    @classmethod
+    def in_directory(cls, directory, port):
+        """A new recording in directory, named after the port and the current time."""
+        os.makedirs(directory, exist_ok=True)
+        safe_port = re.sub(r"[^A-Za-z0-9_.-]+", "_", os.path.basename(port)) or "shoe"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return cls(os.path.join(directory, f"{safe_port}-{stamp}.shoerec"), name=port)
+
+    def write(self, frame, received=None):
+        """Records one raw frame (bytes without the newline); received is a time.monotonic() value."""
+        elapsed = (received if received is not None else time.monotonic()) - self._start_monotonic
+        micros = max(int((elapsed + self._offset) * 1_000_000), 0)
+        frame = frame[:0xFFFF]
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(RECORD.pack(micros, len(frame)) + frame)
+            # Frames are rare and small; flushing each one keeps the file useful after a crash
+            self._file.flush()
+            self.frames += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_header(f):
+    """Returns (start epoch seconds, name) and leaves f at the first record."""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a shoe recording")
+    start, name_length = HEADER.unpack(f.read(HEADER.size))
+    return start, f.read(name_length).decode("utf-8")
+
+
+def read_recording(path):
+    """Yields (seconds since start, frame) for every complete record."""
+    with open(path, "rb") as f:
+        read_header(f)
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            micros, length = RECORD.unpack(head)
+            frame = f.read(length)
+            if len(frame) < length:
+                return
+            yield micros / 1_000_000, frame
+
+
+async def replay(path, on_card, speed=1.0):
+    """
+    Feeds every valid frame's card to `await on_card(card)`. speed is a
+    multiplier of the recorded pace; None or 0 replays as fast as possible.
+    Returns counts and timing.
+    """
+    stats = {"frames": 0, "cards": 0, "errors": 0}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for offset, frame in read_recording(path):
+        stats["frames"] += 1
+        if speed:
+            # Scheduled against the start, so handler time does not accumulate as drift
+            delay = start + offset / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        try:
+            card = decode_frame(frame)
+        except FrameError:
+            stats["errors"] += 1
+            continue
+        await on_card(card)
+        stats["cards"] += 1
+    stats["elapsed_s"] = loop.time() - start
+    return stats
+
+
+async def settle_live_round(backend, table, tie_choice="war"):
+    """
+    The dealer's part of a live round, which the shoe does not send: evaluate
+    once every card is in, answer ties, evaluate the war once its cards are in,
+    and clear a finished round.
+    """
+    game_state = table.game_state
+    players = game_state["players"]
+    if not players:
+        return
+    if game_state.get("war_round_active"):
+        war = game_state["war_round"]
+        if war.get("dealer_card") is None or any(card is None for card in war["players"].values()):
+            return
+        await backend.evaluate_war_round(table)
+    elif game_state["dealer_card"] and all(p["card"] and p["status"] == "active" for p in players.values()):
+        await backend.evaluate_round(table)
+    for player_id, player in list(players.items()):
+        if player["status"] == "waiting_choice":
+            await backend.handle_player_choice(table, player_id, tie_choice)
+    if game_state["dealer_card"] and all(p["status"] == "finished" for p in players.values()):
+        await backend.handle_clear_round(table)
+
+
+async def replay_into_table(path, speed, players, tie_choice, dump_state):
+    import contextlib
+    import json
+
+    import casino_war_backend as backend
+    from result_writer import ResultWriter
+
+    class DiscardedResults:
+        async def insert_many(self, docs, ordered=True):
+            return None
+
+    # Only the in-memory table is exercised; round results are not stored anywhere
+    backend.result_writer = ResultWriter(DiscardedResults())
+    table = backend.table_manager.get_table(backend.DEFAULT_TABLE_ID)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        await backend.handle_set_game_mode(table, "live")
+        for player_id in range(1, players + 1):
+            await backend.handle_add_player(table, str(player_id))
+        rounds = 0
+
+        async def on_card(card):
+            nonlocal rounds
+            if card not in table.game_state["deck"]:
+                # The recording has moved on to a new shoe
+                await backend.handle_shuffle_deck(table)
+            await backend.handle_shoe_card(table, card)
+            round_number = table.game_state["round_number"]
+            await settle_live_round(backend, table, tie_choice)
+            rounds += table.game_state["round_number"] != round_number
+
+        stats = await replay(path, on_card, speed)
+        await backend.result_writer.stop()
+    stats["rounds"] = rounds
+    stats["cards_per_sec"] = stats["cards"] / stats["elapsed_s"] if stats["elapsed_s"] else 0.0
+    # With --dump-state stdout is only the state, so two replays can be diffed
+    print(f"{stats['frames']} frames ({stats['errors']} malformed), {stats['cards']} cards, {rounds} rounds "
+          f"in {stats['elapsed_s']:.3f}s: {stats['cards_per_sec']:.0f} cards/s",
+          file=sys.stderr if dump_state else sys.stdout)
+    if dump_state:
+        state = backend.build_state_view(table)
+        state["session_stats"] = table.session_stats
+        print(json.dumps(state, indent=2, sort_keys=True))
+
+
+def synthesize(path, cards, interval, seed):
+    """Writes a recording of shuffled shoes dealt every ~interval seconds (about 1% of frames malformed)."""
+    import random
+
+    from shoe import Shoe
+    from shoe_reader import format_frame
+
+    rng = random.Random(seed)
+    recorder = ShoeRecorder(path, name="synthetic")
+    now = recorder._start_monotonic
+    shoe = Shoe.shuffled(rng=rng)
+    for _ in range(cards):
+        if not shoe:
+            shoe = Shoe.shuffled(rng=rng)
+            now += 30.0  # reshuffle break
+        now += interval * rng.uniform(0.5, 1.5)
+        frame = format_frame(shoe.draw()).rstrip(b"\r\n")
+        if rng.random() < 0.01:
+            frame = frame[:-3]
+        recorder.write(frame, received=now)
+    recorder.close()
+    print(f"wrote {cards} frames to {path}")
+
+
+def info(path):
+    with open(path, "rb") as f:
+        start, name = read_header(f)
+    frames = errors = 0
+    last = 0.0
+    for offset, frame in read_recording(path):
+        frames += 1
+        last = offset
+        try:
+            decode_frame(frame)
+        except FrameError:
+            errors += 1
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start))
+    print(f"{path}: shoe {name}, started {started}, {frames} frames ({errors} malformed) over {last:.1f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shoe recording tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info_parser = commands.add_parser("info", help="summarize a recording")
+    info_parser.add_argument("path")
+    replay_parser = commands.add_parser("replay", help="replay a recording into a live-mode table")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", default="1", help="pace multiplier, or 'max' for as fast as possible")
+    replay_parser.add_argument("--players", type=int, default=6)
+    replay_parser.add_argument("--tie-choice", choices=["war", "surrender"], default="war")
+    replay_parser.add_argument("--dump-state", action="store_true", help="print the final table state as JSON")
+    synth_parser = commands.add_parser("synth", help="write a synthetic recording")
+    synth_parser.add_argument("path")
+    synth_parser.add_argument("--cards", type=int, default=1000)
+    synth_parser.add_argument("--interval", type=float, default=1.5, help="mean seconds between cards")
+    synth_parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        info(args.path)
+    elif args.command == "synth":
+        synthesize(args.path, args.cards, args.interval, args.seed)
+    else:
+        speed = None if args.speed == "max" else float(args.speed)
+        asyncio.run(replay_into_table(args.path, speed, args.players, args.tie_choice, args.dump_state))
@@ -0,0 +1,191 @@
+"""
+Shoe ingestion for a whole floor: one service, many serial shoe readers.
+
+Each device (serial port) is mapped to a table. Every device gets a
+ShoeReader thread and a consumer task that hands its cards, in order, to the
+card handler (the server passes one that routes to the table). A device that
+cannot be opened or goes away is retried with exponential backoff (with
+jitter, capped at max_backoff) until the service is stopped; other devices
+are never affected.
+
+Per-device counters (see ShoeDevice.status()): state, bytes, frames, cards,
+parse errors, reconnects, cards per second since connecting, and the time from
+a decoded frame to the handler being done (mean and max).
+
+Device maps come from the SHOE_DEVICES setting in casino_war_backend.py or
+the environment, written as port=table pairs:
+    SHOE_DEVICES="/dev/ttyUSB0=1,/dev/ttyUSB1=2,COM7=3"
+With a recording_dir, every connection of every device is recorded to its
+own file there (see shoe_recording.py).
+"""
+import asyncio
+import random
+import time
+
+import log
+import metrics
+from shoe_reader import ShoeReader, open_serial
+from shoe_recording import ShoeRecorder
+
+INITIAL_BACKOFF = 0.5  # seconds before the first reconnect attempt
+MAX_BACKOFF = 30.0
+STABLE_CONNECTION = 10.0  # a connection that lasted this long resets the backoff
+
+logger = log.get_logger("shoe")
+
+SHOE_CARD_SECONDS = metrics.Histogram("casino_war_shoe_card_seconds",
+                                      "Time from a shoe frame arriving to its card being handled and broadcast",
+                                      labels=("port",))
+SHOE_RECONNECTS = metrics.Counter("casino_war_shoe_reconnects_total", "Shoe reconnect attempts", labels=("port",))
+
+
+def parse_device_map(text, table_id=int):
+    """
+    Parses "port=table,port=table" into {port: table_id(table)}. ValueError for
+    an entry that is not port=table or whose table table_id() refuses.
+    """
+    devices = {}
+    for entry in filter(None, (part.strip() for part in text.split(","))):
+        port, sep, table = entry.rpartition("=")
+        if not sep or not port.strip() or not table.strip():
+            raise ValueError(f"Invalid shoe device entry {entry!r}, expected port=table")
+        try:
+            devices[port.strip()] = table_id(table.strip())
+        except ValueError as e:
+            raise ValueError(f"Invalid shoe device entry {entry!r}: {e}") from None
+    return devices
+
+
+class ShoeDevice:
+    """Connection state and counters of one shoe reader."""
+
+    def __init__(self, port, table_id):
+        self.port = port
+        self.table_id = table_id
+        self.state = "connecting"
+        self.reader = None
+        self.connected_at = None
+        self.last_error = None
+        self.reconnects = 0
+        self.cards = 0  # cards handled, across reconnects
+        self.handler_errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        # Totals of readers that are gone; the live reader's counts are added in status()
+        self._bytes = 0
+        self._frames = 0
+        self._parse_errors = 0
+
+    def retire_reader(self):
+        if self.reader is not None:
+            self._bytes += self.reader.bytes
+            self._frames += self.reader.frames
+            self._parse_errors += self.reader.errors
+            self.reader = None
+
+    def status(self):
+        reader = self.reader
+        uptime = time.monotonic() - self.connected_at if self.state == "connected" else 0.0
+        return {
+            "port": self.port,
+            "table_id": self.table_id,
+            "state": self.state,
+            "bytes": self._bytes + (reader.bytes if reader else 0),
+            "frames": self._frames + (reader.frames if reader else 0),
+            "cards": self.cards,
+            "parse_errors": self._parse_errors + (reader.errors if reader else 0),
+            "handler_errors": self.handler_errors,
+            "reconnects": self.reconnects,
+            "uptime_s": round(uptime, 1),
+            "cards_per_sec": round((reader.cards if reader else 0) / uptime, 3) if uptime else 0.0,
+            "latency_mean_ms": round(self.latency_total / self.cards * 1000, 3) if self.cards else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 3),
+            "last_error": self.last_error,
+        }
+
+
+class ShoeService:
+    """
+    Runs one reader per device and delivers every card with
+    `await on_card(table_id, card)`. start() on the running loop, stop() on shutdown.
+    """
+
+    def __init__(self, devices, on_card, open_port=open_serial, initial_backoff=INITIAL_BACKOFF,
+                 max_backoff=MAX_BACKOFF, recording_dir=None):
+        self.devices = {port: ShoeDevice(port, table_id) for port, table_id in devices.items()}
+        self.on_card = on_card
+        self.open_port = open_port
+        self.recording_dir = recording_dir
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._tasks = []
+
+    def start(self):
+        for device in self.devices.values():
+            self._tasks.append(asyncio.create_task(self._run_device(device)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self):
+        return [device.status() for device in self.devices.values()]
+
+    async def _run_device(self, device):
+        backoff = self.initial_backoff
+        while True:
+            try:
+                ser = await asyncio.to_thread(self.open_port, device.port)
+            except Exception as e:
+                device.state = "disconnected"
+                device.last_error = str(e)
+            else:
+                logger.info("Connected", extra={"port": device.port, "table": device.table_id})
+                device.state = "connected"
+                device.connected_at = time.monotonic()
+                try:
+                    await self._consume(device, ser)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    device.last_error = str(e)
+                finally:
+                    device.state = "disconnected"
+                    device.retire_reader()
+                    ser.close()
+                logger.warning("Disconnected: %s", device.last_error, extra={"port": device.port, "table": device.table_id})
+                if time.monotonic() - device.connected_at >= STABLE_CONNECTION:
+                    backoff = self.initial_backoff
+            # Jitter keeps a floor of shoes that lost power together from retrying in lockstep
+            await asyncio.sleep(backoff * random.uniform(0.8, 1.2))
+            backoff = min(backoff * 2, self.max_backoff)
+            device.reconnects += 1
+            SHOE_RECONNECTS.inc(device.port)
+
+    async def _consume(self, device, ser):
+        recorder = ShoeRecorder.in_directory(self.recording_dir, device.port) if self.recording_dir else None
+        reader = device.reader = ShoeReader(ser, asyncio.Queue(), name=device.port, recorder=recorder)
+        reader.start()
+        try:
+            while True:
+                shoe_card = await reader.get()
+                if shoe_card is None:
+                    return
+                try:
+                    await self.on_card(device.table_id, shoe_card.card)
+                except Exception:
+                    device.handler_errors += 1
+                    logger.exception("Handler failed", extra={"port": device.port, "table": device.table_id})
+                latency = time.monotonic() - shoe_card.received
+                SHOE_CARD_SECONDS.observe(latency, device.port)
+                device.cards += 1
+                device.latency_total += latency
+                device.latency_max = max(device.latency_max, latency)
+        finally:
+            reader.stop()
+            if recorder is not None:
+                # The reader thread may still be writing its last frame
+                await reader.wait_closed()
+                recorder.close()
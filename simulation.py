@@ -0,0 +1,331 @@
+"""
+Monte Carlo simulation of our Casino War table.
+
+Plays millions of rounds with the table's rules to estimate house edge, tie
+frequency against shoe penetration and the outcome of wars. Round flow
+follows automatic mode in casino_war_backend.py: optional burn, one card per
+player then the dealer, ties go to war or surrender, war cards are dealt to
+the war players in seat order and then the dealer, and the war is decided by
+comparing those two cards. Every comparison comes from rules.compare_cards
+through a card-code lookup table, so changing the rules there changes the
+simulation too.
+
+Shoes are simulated in batches as NumPy arrays, one shuffled shoe per row,
+all rows stepping through their rounds together. Batches run on a process
+pool. Estimates are ratios over whole shoes (rounds within a shoe are not
+independent), with 95% confidence intervals from the ratio estimator's
+standard error across shoes.
+
+Payouts are in units of the initial bet; the server does not track bets, so
+the table below is the usual casino one:
+
+    win +1, lose -1, surrender -0.5
+    war: raise an equal bet; win +1 (raise paid, bet pushes), lose -2,
+         tie pays --war-tie-payout (default +1, some houses pay a +2 bonus)
+
+    python simulation.py --rounds 2000000 --players 6 --decks 6 --strategy war
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rules import compare_cards
+from shoe import CARD_NAMES, DECKS_PER_SHOE
+
+WIN, TIE, LOSE = 1, 0, -1
+PENETRATION_BUCKETS = 10
+Z_95 = 1.959963984540054
+
+DEFAULT_CONFIG = {
+    "decks": DECKS_PER_SHOE,
+    "players": 6,
+    "penetration": 1.0,  # fraction of the shoe dealt before it is reshuffled
+    "burn_per_round": 1,  # automatic mode burns one card before every deal
+    "burn_before_war": 0,  # cards burned before war cards (our table burns none)
+    "war_probability": 1.0,  # chance a tied player goes to war instead of surrendering
+    "payout_win": 1.0,
+    "payout_lose": -1.0,
+    "payout_surrender": -0.5,
+    "payout_war_win": 1.0,
+    "payout_war_lose": -2.0,
+    "payout_war_tie": 1.0,
+}
+
+# Ratio metrics: name -> (numerator counter, denominator counter)
+METRICS = {
+    "expected_value_per_hand": ("net", "hands"),
+    "house_edge_per_wager": ("house_net", "wagered"),
+    "initial_win_rate": ("wins", "hands"),
+    "initial_lose_rate": ("losses", "hands"),
+    "tie_rate": ("ties", "hands"),
+    "surrender_rate": ("surrenders", "hands"),
+    "war_win_rate": ("war_wins", "wars"),
+    "war_lose_rate": ("war_losses", "wars"),
+    "war_tie_rate": ("war_ties", "wars"),
+}
+COUNTERS = ["rounds", "hands", "net", "house_net", "wagered", "wins", "losses", "ties",
+            "surrenders", "wars", "war_wins", "war_losses", "war_ties"]
+
+
+def outcome_table():
+    """52x52 table of WIN/TIE/LOSE for (player card code, dealer card code), taken from compare_cards."""
+    results = {"win": WIN, "tie": TIE, "lose": LOSE}
+    table = np.empty((len(CARD_NAMES), len(CARD_NAMES)), dtype=np.int8)
+    for player_code, player_card in enumerate(CARD_NAMES):
+        for dealer_code, dealer_card in enumerate(CARD_NAMES):
+            table[player_code, dealer_code] = results[compare_cards(player_card, dealer_card)]
+    return table
+
+
+def make_config(**overrides):
+    unknown = set(overrides) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown simulation settings: {sorted(unknown)}")
+    config = dict(DEFAULT_CONFIG, **overrides)
+    if not 1 <= config["players"] <= 6:
+        raise ValueError("players must be between 1 and 6")
+    if not 0 < config["penetration"] <= 1:
+        raise ValueError("penetration must be in (0, 1]")
+    if not 0 <= config["war_probability"] <= 1:
+        raise ValueError("war_probability must be in [0, 1]")
+    return config
+
+
+def simulate_batch(config, num_shoes, seed):
+    """
+    Plays num_shoes shoes to the cut card and returns the ratio sums for each
+    metric (see merge_sums/summarize). Runs in the worker processes.
+    """
+    rng = np.random.default_rng(seed)
+    outcomes = outcome_table()
+    players = config["players"]
+    shoe_size = len(CARD_NAMES) * config["decks"]
+    shoes = rng.permuted(np.tile(np.arange(len(CARD_NAMES), dtype=np.int8), (num_shoes, config["decks"])), axis=1)
+    rows = np.arange(num_shoes)
+    seats = np.arange(players)
+
+    # A round is only started when the rest of the round fits even if every player goes to war
+    worst_case = config["burn_per_round"] + 2 * (players + 1) + config["burn_before_war"]
+    cut = int(shoe_size * config["penetration"])
+    position = np.zeros(num_shoes, dtype=np.int64)
+    active = np.full(num_shoes, worst_case <= shoe_size)
+
+    per_shoe = {name: np.zeros(num_shoes) for name in COUNTERS}
+    bucket_hands = np.zeros((num_shoes, PENETRATION_BUCKETS))
+    bucket_ties = np.zeros((num_shoes, PENETRATION_BUCKETS))
+
+    while active.any():
+        bucket = np.minimum(position * PENETRATION_BUCKETS // shoe_size, PENETRATION_BUCKETS - 1)
+        top = position + config["burn_per_round"]
+        # Finished shoes keep stepping with clipped indices; their results are masked out
+        player_cards = shoes[rows[:, None], np.minimum(top[:, None] + seats, shoe_size - 1)]
+        dealer_card = shoes[rows, np.minimum(top + players, shoe_size - 1)]
+        result = outcomes[player_cards, dealer_card[:, None]]
+
+        tied = (result == TIE) & active[:, None]
+        if config["war_probability"] >= 1:
+            to_war = tied
+        elif config["war_probability"] <= 0:
+            to_war = np.zeros_like(tied)
+        else:
+            to_war = tied & (rng.random(tied.shape) < config["war_probability"])
+        surrendered = tied & ~to_war
+        war_count = to_war.sum(axis=1)
+
+        war_start = top + players + 1 + np.where(war_count > 0, config["burn_before_war"], 0)
+        war_seat = np.cumsum(to_war, axis=1) - 1
+        war_cards = shoes[rows[:, None], np.minimum(war_start[:, None] + war_seat.clip(0), shoe_size - 1)]
+        dealer_war_card = shoes[rows, np.minimum(war_start + war_count, shoe_size - 1)]
+        war_result = outcomes[war_cards, dealer_war_card[:, None]]
+
+        won = (result == WIN) & active[:, None]
+        lost = (result == LOSE) & active[:, None]
+        war_won = to_war & (war_result == WIN)
+        war_lost = to_war & (war_result == LOSE)
+        war_tied = to_war & (war_result == TIE)
+        net = (won.sum(axis=1) * config["payout_win"]
+               + lost.sum(axis=1) * config["payout_lose"]
+               + surrendered.sum(axis=1) * config["payout_surrender"]
+               + war_won.sum(axis=1) * config["payout_war_win"]
+               + war_lost.sum(axis=1) * config["payout_war_lose"]
+               + war_tied.sum(axis=1) * config["payout_war_tie"])
+        hands = active * players
+
+        per_shoe["rounds"] += active
+        per_shoe["hands"] += hands
+        per_shoe["net"] += net
+        per_shoe["house_net"] -= net
+        per_shoe["wagered"] += hands + war_count
+        per_shoe["wins"] += won.sum(axis=1)
+        per_shoe["losses"] += lost.sum(axis=1)
+        per_shoe["ties"] += tied.sum(axis=1)
+        per_shoe["surrenders"] += surrendered.sum(axis=1)
+        per_shoe["wars"] += war_count
+        per_shoe["war_wins"] += war_won.sum(axis=1)
+        per_shoe["war_losses"] += war_lost.sum(axis=1)
+        per_shoe["war_ties"] += war_tied.sum(axis=1)
+        bucket_hands[rows, bucket] += hands
+        bucket_ties[rows, bucket] += tied.sum(axis=1)
+
+        position = np.where(active, war_start + np.where(war_count > 0, war_count + 1, 0), position)
+        active &= (position < cut) & (position + worst_case <= shoe_size)
+
+    sums = {"shoes": num_shoes}
+    for name, array in per_shoe.items():
+        sums[name] = float(array.sum())
+    for name, (numerator, denominator) in METRICS.items():
+        sums[name] = ratio_sums(per_shoe[numerator], per_shoe[denominator])
+    sums["tie_rate_by_penetration"] = [
+        ratio_sums(bucket_ties[:, b], bucket_hands[:, b]) for b in range(PENETRATION_BUCKETS)
+    ]
+    return sums
+
+
+def ratio_sums(x, n):
+    """The sums a ratio estimate sum(x)/sum(n) and its standard error need; they add across batches."""
+    return [float(x.sum()), float(n.sum()), float((x * x).sum()), float((n * n).sum()), float((x * n).sum())]
+
+
+def merge_sums(total, sums):
+    if total is None:
+        return sums
+    merged = {}
+    for key, value in total.items():
+        if key == "tie_rate_by_penetration":
+            merged[key] = [[a + b for a, b in zip(t, s)] for t, s in zip(value, sums[key])]
+        elif isinstance(value, list):
+            merged[key] = [a + b for a, b in zip(value, sums[key])]
+        else:
+            merged[key] = value + sums[key]
+    return merged
+
+
+def ratio_estimate(sums, shoes):
+    """Returns (estimate, ci_low, ci_high) for sum(x)/sum(n) across shoes, or Nones without data."""
+    sx, sn, sxx, snn, sxn = sums
+    if sn == 0:
+        return None, None, None
+    ratio = sx / sn
+    if shoes < 2:
+        return ratio, None, None
+    mean_n = sn / shoes
+    residual = max(sxx - 2 * ratio * sxn + ratio * ratio * snn, 0.0)
+    stderr = math.sqrt(residual / (shoes * (shoes - 1))) / mean_n
+    return ratio, ratio - Z_95 * stderr, ratio + Z_95 * stderr
+
+
+def summarize(config, sums):
+    shoes = sums["shoes"]
+    report = {
+        "config": config,
+        "shoes": shoes,
+        "rounds": int(sums["rounds"]),
+        "hands": int(sums["hands"]),
+        "metrics": {},
+        "tie_rate_by_penetration": [],
+    }
+    for name in METRICS:
+        estimate, low, high = ratio_estimate(sums[name], shoes)
+        report["metrics"][name] = {"estimate": estimate, "ci95": [low, high]}
+    for bucket, bucket_sums in enumerate(sums["tie_rate_by_penetration"]):
+        estimate, low, high = ratio_estimate(bucket_sums, shoes)
+        report["tie_rate_by_penetration"].append({
+            "penetration": [bucket / PENETRATION_BUCKETS, (bucket + 1) / PENETRATION_BUCKETS],
+            "hands": int(bucket_sums[1]),
+            "estimate": estimate,
+            "ci95": [low, high],
+        })
+    return report
+
+
+def run_simulation(rounds, workers=None, batch_shoes=2000, seed=None, **settings):
+    """
+    Simulates at least `rounds` rounds and returns the report dict from summarize().
+    A pilot batch sizes the run, so results depend only on the seed, not on the worker count.
+    """
+    config = make_config(**settings)
+    seeds = np.random.SeedSequence(seed)
+    sums = simulate_batch(config, batch_shoes, seeds.spawn(1)[0])
+    if sums["rounds"] == 0:
+        raise ValueError("The shoe is too small to deal a single round with these settings")
+    rounds_per_batch = sums["rounds"]
+    remaining_batches = max(math.ceil((rounds - rounds_per_batch) / rounds_per_batch), 0)
+    if remaining_batches:
+        batch_seeds = seeds.spawn(remaining_batches)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for batch_sums in pool.map(simulate_batch, [config] * remaining_batches,
+                                       [batch_shoes] * remaining_batches, batch_seeds):
+                sums = merge_sums(sums, batch_sums)
+    return summarize(config, sums)
+
+
+def format_value(value):
+    return "-" if value is None else f"{value:.5f}"
+
+
+def print_report(report, elapsed):
+    config = report["config"]
+    print(f"{report['rounds']:,} rounds, {report['hands']:,} hands, {report['shoes']:,} shoes in {elapsed:.1f}s")
+    print(f"decks={config['decks']} players={config['players']} penetration={config['penetration']} "
+          f"burn_per_round={config['burn_per_round']} burn_before_war={config['burn_before_war']} "
+          f"war_probability={config['war_probability']}")
+    print(f"{'metric':<26} {'estimate':>10} {'95% CI':>22}")
+    for name, metric in report["metrics"].items():
+        low, high = metric["ci95"]
+        print(f"{name:<26} {format_value(metric['estimate']):>10} {format_value(low):>10} .. {format_value(high):<10}")
+    print()
+    print(f"{'tie rate by penetration':<26} {'estimate':>10} {'95% CI':>22} {'hands':>12}")
+    for bucket in report["tie_rate_by_penetration"]:
+        start, end = bucket["penetration"]
+        low, high = bucket["ci95"]
+        label = f"{start:.0%}-{end:.0%}"
+        print(f"{label:<26} {format_value(bucket['estimate']):>10} {format_value(low):>10} .. "
+              f"{format_value(high):<10} {bucket['hands']:>12,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--decks", type=int, default=DEFAULT_CONFIG["decks"])
+    parser.add_argument("--players", type=int, default=DEFAULT_CONFIG["players"])
+    parser.add_argument("--penetration", type=float, default=DEFAULT_CONFIG["penetration"])
+    parser.add_argument("--burn-per-round", type=int, default=DEFAULT_CONFIG["burn_per_round"])
+    parser.add_argument("--burn-before-war", type=int, default=DEFAULT_CONFIG["burn_before_war"])
+    parser.add_argument("--strategy", default="war",
+                        help="'war', 'surrender', or the probability (0-1) that a tied player goes to war")
+    parser.add_argument("--war-tie-payout", type=float, default=DEFAULT_CONFIG["payout_war_tie"])
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--batch-shoes", type=int, default=2000, help="shoes simulated per batch")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    strategies = {"war": 1.0, "surrender": 0.0}
+    try:
+        war_probability = strategies[args.strategy] if args.strategy in strategies else float(args.strategy)
+    except ValueError:
+        parser.error(f"invalid --strategy: {args.strategy}")
+
+    start = time.perf_counter()
+    try:
+        report = run_simulation(
+            args.rounds, workers=args.workers, batch_shoes=args.batch_shoes, seed=args.seed,
+            decks=args.decks, players=args.players, penetration=args.penetration,
+            burn_per_round=args.burn_per_round, burn_before_war=args.burn_before_war,
+            war_probability=war_probability, payout_war_tie=args.war_tie_payout,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Versioned state deltas.
+
+Every table keeps a state version. When the table's state view changes, the
+server bumps the version and sends delta clients only what changed:
+
+    {"action": "state_delta", "base": 41, "seq": 42, "ops": [[["players", "3", "card"], "AS"], [["war_round"]]]}
+
+Each op is [path, value] (set the value at path) or [path] (delete path).
+A client applies the ops when base equals the seq it holds; otherwise it has
+missed something and sends {"action": "request_snapshot"} to get a full
+{"action": "state_snapshot", "seq": ..., "game_state": ...}.
+"""
+
+def diff_state(old, new, path=()):
+    """Returns the ops that turn old into new, recursing into nested dicts."""
+    ops = []
+    for key, value in new.items():
+        if key not in old:
+            ops.append([list(path + (key,)), value])
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            ops.extend(diff_state(old[key], value, path + (key,)))
+        elif old[key] != value:
+            ops.append([list(path + (key,)), value])
+    for key in old:
+        if key not in new:
+            ops.append([list(path + (key,))])
+    return ops
+
+def apply_delta(state, ops):
+    """Applies ops from diff_state to state in place and returns it."""
+    for op in ops:
+        path = op[0]
+        target = state
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        if len(op) == 1:
+            target.pop(path[-1], None)
+        else:
+            target[path[-1]] = op[1]
+    return state
+
+def merge_deltas(older, newer):
+    """Folds two consecutive state_delta messages into one (used when a slow client's queue coalesces them)."""
+    ops = {}
+    for op in older["ops"] + newer["ops"]:
+        path = tuple(op[0])
+        # A later op on a path makes earlier ops on that path or below it redundant
+        for earlier in [p for p in ops if p[:len(path)] == path]:
+            del ops[earlier]
+        ops[path] = op
+    merged = {
+        "action": "state_delta",
+        "base": older["base"],
+        "seq": newer["seq"],
+        "ops": list(ops.values())
+    }
+    if "event_seq" in newer:
+        merged["event_seq"] = newer["event_seq"]
+    return merged
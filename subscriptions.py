@@ -0,0 +1,179 @@
+"""
+Topic subscriptions: which table events a connection receives.
+
+Every event broadcast to a table's clients belongs to one topic
+(EVENT_TOPICS; game_state_update snapshots are "state"). A connection picks
+its topics when it registers, or gets the defaults of its role:
+
+    {"action": "register_display"}
+    {"action": "register_player", "player_id": "3", "topics": ["round", "players"]}
+
+    dealer   every topic (and the dealer-only messages, as before)
+    display  what a table display renders: no player choices, no deck chatter
+    player   like display plus the player choices, as a per-player view
+
+A connection that never registers keeps receiving every topic, so older
+clients work unchanged.
+
+"feed" is not an event topic: a display registered with "feed": true gets
+no events, only the table's latest game_state_update at most
+DISPLAY_FEED_FPS times a second (see display_frame in the backend).
+
+A per-player view keeps only the viewer's own entries of "players" and
+"player_results" (at the top level and in "game_state"); the other seats in
+"players" become empty objects, so seat counts stay right. Views are encoded
+once per distinct set of player ids; events without seat data go to player
+clients in the one encoding everybody gets. State snapshots are filtered the
+same way, and so are the ops of state_delta messages (delta_view): ops on
+another player's seat are left out, except that seats appear and disappear.
+Events replayed to a resumed session (sessions.py) are logged unfiltered
+and filtered again for its view when they are replayed.
+"""
+TOPICS = frozenset({"round", "choices", "undo", "players", "table", "control", "state"})
+FEED = "feed"
+
+EVENT_TOPICS = {
+    "round_dealt": "round",
+    "war_round_started": "round",
+    "war_round_evaluated": "round",
+    "war_card_assigned": "round",
+    "round_completed": "round",
+    "dealer_card_set": "round",
+    "player_card_set": "round",
+    "player_choice_made": "choices",
+    "cards_undone": "undo",
+    "player_added": "players",
+    "player_removed": "players",
+    "game_reset": "table",
+    "game_mode_changed": "table",
+    "bets_changed": "table",
+    "deck_shuffled": "control",
+    "card_burned": "control",
+    "auto_play_changed": "control",
+    "game_state_update": "state",
+}
+
+ROLE_TOPICS = {
+    "dealer": TOPICS,
+    "display": frozenset({"round", "undo", "players", "table", "state"}),
+    "player": frozenset({"round", "choices", "undo", "players", "table", "state"}),
+}
+
+
+def event_topic(message):
+    return EVENT_TOPICS.get(message["action"], "table")
+
+
+def parse_topics(topics, role):
+    """The topics a registration asked for (ROLE_TOPICS[role] when it did not); ValueError for unknown names."""
+    if topics is None:
+        return ROLE_TOPICS[role]
+    unknown = [topic for topic in topics if not isinstance(topic, str) or (topic not in TOPICS and topic != FEED)]
+    if unknown:
+        raise ValueError(f"Unknown topics {unknown}; choose from {', '.join(sorted(TOPICS | {FEED}))}")
+    return frozenset(topics)
+
+
+def _filter_seats(container, player_ids):
+    players = container.get("players")
+    if isinstance(players, dict):
+        container["players"] = {pid: player if pid in player_ids else {} for pid, player in players.items()}
+    results = container.get("player_results")
+    if isinstance(results, dict):
+        container["player_results"] = {pid: result for pid, result in results.items() if pid in player_ids}
+
+
+def has_seats(message):
+    """Whether player views of message differ from it (messages without seat data go to viewers as they are)."""
+    return "players" in message or "player_results" in message or "game_state" in message
+
+
+def player_view(message, player_ids):
+    """message as the players in player_ids see it (see module docstring)."""
+    view = dict(message)
+    _filter_seats(view, player_ids)
+    if isinstance(view.get("game_state"), dict):
+        view["game_state"] = dict(view["game_state"])
+        _filter_seats(view["game_state"], player_ids)
+    return view
+
+
+def _view_op(op, player_ids):
+    """A state_delta op as the players in player_ids see it, or None to leave it out."""
+    path = op[0]
+    if not path or path[0] not in ("players", "player_results"):
+        return op
+    if len(path) == 1:
+        if len(op) == 1:
+            return op
+        container = {path[0]: op[1]}
+        _filter_seats(container, player_ids)
+        return [path, container[path[0]]]
+    if path[1] in player_ids:
+        return op
+    if path[0] == "players" and len(path) == 2:
+        return op if len(op) == 1 else [path, {}]  # the seat, not what is on it
+    return None
+
+
+def delta_view(message, player_ids):
+    """A state_delta message as the players in player_ids see it (see module docstring)."""
+    view = dict(message)
+    view["ops"] = [op for op in (_view_op(op, player_ids) for op in message["ops"]) if op is not None]
+    return view
+
+
+class Subscriptions:
+    """
+    One table's subscriptions: per connection its topics, for player views its
+    player ids, and the role it registered as (None until it registers).
+    """
+
+    def __init__(self):
+        self.full = {topic: set() for topic in TOPICS | {FEED}}  # topic -> connections that get the whole event
+        self.viewers = {topic: {} for topic in TOPICS | {FEED}}  # topic -> {connection: player ids of its view}
+        self._of = {}  # connection -> (topics, player ids or None, role or None)
+
+    def subscribe(self, websocket, topics=TOPICS, view=None, role=None):
+        """Replaces the connection's subscription; view is the player ids to filter events for, or None."""
+        self.unsubscribe(websocket)
+        self._of[websocket] = (topics, view, role)
+        for topic in topics:
+            if view is None:
+                self.full[topic].add(websocket)
+            else:
+                self.viewers[topic][websocket] = view
+
+    def unsubscribe(self, websocket):
+        topics, view, role = self._of.pop(websocket, ((), None, None))
+        for topic in topics:
+            self.full[topic].discard(websocket)
+            self.viewers[topic].pop(websocket, None)
+
+    def get(self, websocket):
+        """(topics, view, role) of a connection, for subscribe() on another table."""
+        return self._of.get(websocket, (TOPICS, None, None))
+
+    def count(self, role):
+        """Connections registered as role."""
+        return sum(1 for _, _, registered in self._of.values() if registered == role)
+
+    def split(self, clients):
+        """clients divided into those that get whole messages and {player ids: [connections]} of views."""
+        full, views = [], {}
+        for websocket in clients:
+            player_ids = self._of.get(websocket, ((), None, None))[1]
+            if player_ids is None:
+                full.append(websocket)
+            else:
+                views.setdefault(player_ids, []).append(websocket)
+        return full, views
+
+    def views(self, topic, exclude=()):
+        """Viewers of topic grouped by player ids: {player ids: [connections]}."""
+        groups = {}
+        for websocket, player_ids in self.viewers[topic].items():
+            if websocket not in exclude:
+                groups.setdefault(player_ids, []).append(websocket)
+        return groups
+